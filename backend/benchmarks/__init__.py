@@ -0,0 +1,8 @@
+"""
+后端性能基准测试。在 backend 目录下运行，例如：
+
+    python -m benchmarks.parse_bench
+    python -m benchmarks.stage_bench --output results/stages.json
+    python -m benchmarks.load_bench --output results/load.json
+    python -m benchmarks.compare results/base.json results/stages.json
+"""
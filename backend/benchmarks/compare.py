@@ -0,0 +1,89 @@
+import argparse
+import json
+import sys
+
+from benchmarks.report import format_ms
+
+# 比较两次基准结果 (stage_bench / load_bench 的 JSON 输出)，
+# 任何一项比基线慢超过阈值时以非零状态退出，可用于部署前检查性能回退。
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_METRIC = "p95"
+
+# 小于该值 (秒) 的耗时只受噪声影响，不参与回退判断
+NOISE_FLOOR = 0.001
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def latency_rows(baseline, current, metric):
+    """
+    生成 (名称, 基线耗时, 当前耗时) 行，延迟越大越差
+    """
+    if "stages" in baseline:
+        for stage, stats in baseline["stages"].items():
+            yield f"stage {stage}", stats.get(metric), current.get("stages", {}).get(stage, {}).get(metric)
+        for kind, stages in baseline.get("kinds", {}).items():
+            before = stages.get("total", {}).get(metric)
+            after = current.get("kinds", {}).get(kind, {}).get("total", {}).get(metric)
+            yield f"kind {kind}", before, after
+    if "levels" in baseline:
+        current_levels = {level["concurrency"]: level for level in current.get("levels", [])}
+        for level in baseline["levels"]:
+            other = current_levels.get(level["concurrency"], {})
+            yield (f"c={level['concurrency']} latency", level["latency"].get(metric),
+                   other.get("latency", {}).get(metric))
+
+
+def compare(baseline, current, metric=DEFAULT_METRIC, threshold=DEFAULT_THRESHOLD):
+    """
+    打印比较结果，返回回退项的列表
+    """
+    regressions = []
+    print(f"{'':<28} {'base ms':>10} {'new ms':>10} {'change':>8}")
+    for name, before, after in latency_rows(baseline, current, metric):
+        if before is None or after is None:
+            print(f"{name:<28} {format_ms(before):>10} {format_ms(after):>10} {'-':>8}")
+            continue
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold and after > NOISE_FLOOR:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28} {format_ms(before):>10} {format_ms(after):>10} {change:>+8.0%}{flag}")
+
+    # 压测结果还要比较吞吐量，吞吐量越小越差
+    current_levels = {level["concurrency"]: level for level in current.get("levels", [])}
+    for level in baseline.get("levels", []):
+        other = current_levels.get(level["concurrency"])
+        if other is None or not level.get("rps") or other.get("rps") is None:
+            continue
+        change = (other["rps"] - level["rps"]) / level["rps"]
+        name = f"c={level['concurrency']} req/s"
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28} {level['rps']:>10.1f} {other['rps']:>10.1f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较两次基准结果")
+    parser.add_argument("baseline", help="基线结果 JSON")
+    parser.add_argument("current", help="本次结果 JSON")
+    parser.add_argument("--metric", default=DEFAULT_METRIC, choices=["p50", "p95", "p99", "mean"])
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允许的相对变慢比例")
+    args = parser.parse_args(argv)
+
+    regressions = compare(load(args.baseline), load(args.current), args.metric, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# 基准测试使用的题目集合，按题型分类，覆盖线上最常见的输入
+CORPUS = {
+    "linear": [
+        r"2x + 3 = 7",
+        r"5x - 4 = 3x + 6",
+        r"\frac{1}{2}x + 1 = 0",
+    ],
+    "quadratic": [
+        r"x^2 - 5x + 6 = 0",
+        r"2x^2 + 3x - 2 = 0",
+        r"x^2 + x + 1 = 0",
+    ],
+    "polynomial": [
+        r"x^3 - 6x^2 + 11x - 6 = 0",
+        r"x^4 - 1 = 0",
+    ],
+    "system": [
+        r"\begin{cases} x + y = 3 \\ x - y = 1 \end{cases}",
+        r"2x + 3y - z = 1, x - y + 2z = 3, 3x + y + z = 4",
+        r"x^2 + y^2 = 5, x - y = 1",
+        # 线性代数课程中常见的 10 元线性方程组
+        r"3a - 2b + c + 4d - f + 2g + h - 3k + m + n = 7 \\ a + 5b - 2c + d + 3f - g + 2h + k - m + 2n = -4 \\ "
+        r"2a - b + 6c - 3d + f + 4g - 2h + k + 3m - n = 12 \\ -a + 3b + c + 7d - 2f + g + 3h - 4k + m + n = 5 \\ "
+        r"4a + b - 3c + 2d + 8f - g + h + 2k - 2m + 3n = -9 \\ a - 2b + 4c - d + 2f + 9g - 3h + k + 4m - 2n = 15 \\ "
+        r"-2a + b + c + 3d - f + 2g + 7h - k + m + 4n = 3 \\ 3a + 2b - c + d + 4f - 3g + h + 6k - 2m + n = -2 \\ "
+        r"a + b + 2c - 2d + f + g - 4h + 3k + 8m - 3n = 10 \\ 2a - 3b + c + d - 2f + 3g + 2h - k + m + 5n = 1",
+    ],
+    "matrix": [
+        r"\det \begin{pmatrix} 2 & 1 & 3 \\ 0 & -1 & 4 \\ 1 & 2 & 5 \end{pmatrix}",
+        r"\begin{pmatrix} 1 & 2 & 0 \\ 3 & 1 & 1 \\ 0 & 2 & 1 \end{pmatrix}^{-1}",
+        r"\operatorname{rank} \begin{pmatrix} 1 & 2 & 3 \\ 2 & 4 & 6 \\ 1 & 0 & 1 \end{pmatrix}",
+        r"\operatorname{eig} \begin{pmatrix} 2 & 1 \\ 1 & 2 \end{pmatrix}",
+        r"\det \begin{pmatrix} a & 1 \\ 1 & a \end{pmatrix}",
+    ],
+    "limit": [
+        r"\lim_{x \to 0} \frac{\sin x}{x}",
+        r"\lim_{x \to 0} \frac{\tan x - \sin x}{x^3}",
+        r"\lim_{x \to 1} \frac{x^3 - 1}{x^2 - 1}",
+        r"\lim_{x \to \infty} \frac{3x^2 + 1}{2x^2 - x}",
+        r"\lim_{x \to \infty} \frac{x^2}{e^x}",
+        r"\lim_{x \to 0^+} x \ln x",
+    ],
+    "series": [
+        r"\operatorname{series}_{x=0}^{8} e^x \sin x",
+        r"\operatorname{taylor}_{x=1} \ln x",
+    ],
+    "integral_parts": [
+        r"\int x e^x dx",
+        r"\int x^2 \sin x dx",
+        r"\int \ln x dx",
+    ],
+    "integral_usub": [
+        r"\int x e^{x^2} dx",
+        r"\int 2x \cos(x^2) dx",
+        r"\int_0^1 x^2 dx",
+    ],
+    "derivative": [
+        r"\frac{d}{dx} x^2 \sin x",
+        r"\frac{d}{dx} \sin(x^2)",
+        r"\frac{d}{dx} e^{2x} \cos x",
+    ],
+    "trig": [
+        r"\sin^2 x + \cos^2 x",
+        r"\tan x \cos x",
+        r"\int \sin^2 x dx",
+    ],
+}
+
+
+def all_problems():
+    """
+    按顺序返回 (题型, LaTeX) 列表
+    """
+    return [(kind, latex) for kind, problems in CORPUS.items() for latex in problems]
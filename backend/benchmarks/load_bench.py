@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.corpus import all_problems
+from benchmarks.report import summarize, run_metadata, write_results, format_ms
+
+# 本地压测：在同一进程的后台线程中启动 uvicorn，再用多个线程并发请求 /solve，
+# 统计不同并发数下的吞吐量 (requests/s) 和延迟分布。
+# 默认关闭结果缓存，否则除第一轮外全部是缓存命中，测不到真实的计算开销。
+DEFAULT_CONCURRENCY = [1, 4, 16]
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    """
+    在后台线程中启动服务，等待其开始监听后返回 uvicorn.Server
+    """
+    import uvicorn
+    from main import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not server.started:
+        if not thread.is_alive() or time.time() > deadline:
+            raise RuntimeError("server failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def post_solve(url, latex_str, timeout):
+    """
+    发送一次请求，返回 (耗时, 状态码)
+    """
+    body = json.dumps({"latex": latex_str}).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = None
+    return time.perf_counter() - start, status
+
+
+def run_level(url, problems, concurrency, requests_count, timeout):
+    """
+    以给定并发数发送 requests_count 个请求 (循环使用题库)
+    """
+    inputs = [problems[i % len(problems)] for i in range(requests_count)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda latex_str: post_solve(url, latex_str, timeout), inputs))
+    elapsed = time.perf_counter() - start
+
+    latencies = [seconds for seconds, status in outcomes if status == 200]
+    errors = {}
+    for _, status in outcomes:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": requests_count,
+        "elapsed": elapsed,
+        "rps": requests_count / elapsed if elapsed else None,
+        "ok": len(latencies),
+        "errors": errors,
+        "latency": summarize(latencies),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="/solve 本地压测")
+    parser.add_argument("--concurrency", type=int, action="append", help="并发数，可重复 (默认 1、4、16)")
+    parser.add_argument("--requests", type=int, default=100, help="每个并发级别的请求数")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求的超时 (秒)")
+    parser.add_argument("--cache", action="store_true", help="保留结果缓存 (默认关闭)")
+    parser.add_argument("--url", help="压测已启动的服务 (例如 http://127.0.0.1:8000)，不在本进程中启动")
+    parser.add_argument("--output", help="结果 JSON 文件路径")
+    args = parser.parse_args(argv)
+
+    levels = args.concurrency or DEFAULT_CONCURRENCY
+    problems = [latex_str for _, latex_str in all_problems()]
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        if not args.cache:
+            # 必须在导入 main 之前设置
+            os.environ["FENG_MATH_CACHE_MB"] = "0"
+            os.environ["FENG_MATH_CACHE_PATH"] = ":memory:"
+        port = free_port()
+        server, thread = start_server(port)
+        base_url = f"http://127.0.0.1:{port}"
+
+    results = {
+        "meta": run_metadata(benchmark="load", requests=args.requests, cache=args.cache, url=args.url),
+        "levels": [],
+    }
+    try:
+        # 预热：让工作进程完成导入，避免第一个级别包含启动开销
+        for latex_str in problems:
+            post_solve(base_url + "/solve", latex_str, args.timeout)
+
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>7}")
+        for concurrency in levels:
+            level = run_level(base_url + "/solve", problems, concurrency, args.requests, args.timeout)
+            results["levels"].append(level)
+            latency = level["latency"]
+            print(f"{concurrency:>11} {level['rps']:>8.1f} {format_ms(latency.get('p50')):>10} "
+                  f"{format_ms(latency.get('p95')):>10} {format_ms(latency.get('p99')):>10} "
+                  f"{sum(level['errors'].values()):>7}")
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import time
+
+from parsing import parse_cached, parse_input, parse_stats, latex2sympy
+from solver import preprocess_latex
+from benchmarks.corpus import all_problems
+
+
+def split_sides(fixed_latex):
+    # 与 parse_input 相同的分割方式，用于模拟原来逐个调用 latex2sympy 的做法
+    parts = fixed_latex.split("=")
+    return parts if len(parts) == 2 else [fixed_latex]
+
+
+def bench(label, func, inputs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            func(item)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / (repeat * len(inputs)) * 1e6
+    print(f"{label:<28} {per_call:>12.1f} us/problem")
+
+
+def main(repeat=5):
+    inputs = [preprocess_latex(latex) for _, latex in all_problems()]
+
+    def baseline(fixed_latex):
+        for side in split_sides(fixed_latex):
+            latex2sympy(side.strip())
+
+    def cold(fixed_latex):
+        parse_cached.cache_clear()
+        parse_input(fixed_latex)
+
+    print(f"{len(inputs)} problems, {repeat} rounds")
+    bench("latex2sympy only", baseline, inputs, repeat)
+    bench("parse_input (no cache)", cold, inputs, repeat)
+    parse_cached.cache_clear()
+    parse_stats.update(fast=0, latex2sympy=0)
+    bench("parse_input (cached)", parse_input, inputs, repeat)
+    print(f"fast path: {parse_stats['fast']}, latex2sympy: {parse_stats['latex2sympy']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import json
+import os
+import platform
+import subprocess
+import time
+
+import sympy
+
+# 基准结果的统计和输出。结果统一写成 JSON，便于 compare.py 比较两次运行
+
+
+def percentile(sorted_values, q):
+    """
+    线性插值的百分位数，sorted_values 需已排序，q 取 0~100
+    """
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def summarize(values):
+    """
+    一组耗时 (秒) 的统计：样本数、均值、p50/p95/p99、最大值
+    """
+    values = sorted(values)
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1],
+    }
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_metadata(**extra):
+    """
+    本次运行的环境信息，写在结果文件开头
+    """
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "sympy": sympy.__version__,
+        "cpus": os.cpu_count(),
+    }
+    meta.update(extra)
+    return meta
+
+
+def write_results(path, results):
+    """
+    把结果写成 JSON。path 为 None 时只打印到标准输出
+    """
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if path is None:
+        print(text)
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+    print(f"Results written to {path}")
+
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1e3:.2f}"
@@ -0,0 +1,184 @@
+import argparse
+import time
+from collections import defaultdict
+
+from sympy import latex, Eq, Integral, Derivative, Limit
+from sympy.core.cache import clear_cache
+
+import integrals
+import limits
+from parsing import parse_cached, parse_input
+from solver import preprocess_latex
+from forms import lookup_integral, lookup_derivative
+from derivatives import derive
+from equations import polynomial_form, generate_equation_steps, solve_equation
+from systems import is_system, linear_form, generate_system_steps, solve_system, solution_latex
+from matrices import MatrixOperation, reduce_matrix
+from limits import TaylorSeries, evaluate_limit, expand_series
+from simplifier import tiered_simplify
+from budget import stage_budget
+from benchmarks.corpus import all_problems, CORPUS
+from benchmarks.report import summarize, run_metadata, write_results, format_ms
+
+# 分阶段计时：按 solve_expr 的流程逐个阶段单独计时 (parse、steps、solve/doit、simplify、latex)，
+# 统计每个阶段以及每种题型的 p50/p95/p99。
+# 这里不设置时间预算，测的是各阶段本身的耗时。
+STAGES = ["parse", "steps", "solve", "doit", "simplify", "latex"]
+
+
+def reset_caches():
+    # 默认测冷启动耗时：清空解析缓存、积分步骤缓存、标准展开式缓存和 SymPy 内部缓存
+    parse_cached.cache_clear()
+    integrals._render_cache.clear()
+    limits.elementary_series.cache_clear()
+    limits._formula.cache_clear()
+    limits._sympy_series.cache_clear()
+    clear_cache()
+
+
+def time_stages(fixed_latex):
+    """
+    按 solve_expr 的流程执行一次，返回 {阶段: 耗时 (秒)}，只包含实际执行的阶段
+    """
+    timings = {}
+
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        timings[stage] = time.perf_counter() - start
+        return value
+
+    expr = timed("parse", parse_input, fixed_latex)
+
+    if is_system(expr):
+        def system_steps():
+            form = linear_form(expr)
+            return form, generate_system_steps(expr, form)
+
+        form, _ = timed("steps", system_steps)
+        solutions = timed("solve", solve_system, expr, form)
+        timed("latex", solution_latex, solutions)
+        return timings
+
+    if isinstance(expr, MatrixOperation):
+        # 消元一次同时得到步骤和结果 LaTeX
+        timed("solve", reduce_matrix, expr)
+        return timings
+
+    if isinstance(expr, (Limit, TaylorSeries)):
+        # 步骤和结果一次得到，不再化简
+        timed("solve", evaluate_limit if isinstance(expr, Limit) else expand_series, expr)
+        return timings
+
+    if isinstance(expr, Eq):
+        def equation_steps():
+            form = polynomial_form(expr)
+            return form, generate_equation_steps(expr, form)
+
+        form, _ = timed("steps", equation_steps)
+        result = timed("solve", solve_equation, expr, form)
+    else:
+        rule = None
+        matched = None
+        derivation = None
+        if isinstance(expr, Integral):
+            def integral_steps():
+                matched = lookup_integral(expr)
+                if matched is not None:
+                    return matched, None
+                rule = integrals.integral_rule(expr)
+                integrals.generate_integral_steps(expr, rule)
+                return None, rule
+
+            matched, rule = timed("steps", integral_steps)
+        elif isinstance(expr, Derivative):
+            def derivative_steps():
+                matched = lookup_derivative(expr)
+                return matched, derive(expr) if matched is None else None
+
+            matched, derivation = timed("steps", derivative_steps)
+
+        def evaluate():
+            result = None
+            if matched is not None:
+                result = matched.result if isinstance(expr, Derivative) else integrals.apply_limits(expr, matched.result)
+            elif derivation is not None:
+                result = derivation.result
+            elif isinstance(expr, Integral):
+                result = integrals.evaluate_integral(expr, rule)
+            if result is None:
+                result = expr.doit()
+            return result
+
+        result = timed("doit", evaluate)
+        result, _ = timed("simplify", tiered_simplify, result, stage_budget("simplify"))
+
+    timed("latex", latex, result)
+    return timings
+
+
+def run(repeat=5, warm=False, kinds=None):
+    """
+    对题库中的每道题执行 repeat 次，返回按阶段和题型汇总的统计
+    """
+    per_stage = defaultdict(list)
+    per_kind = defaultdict(lambda: defaultdict(list))
+    failures = []
+
+    problems = [(kind, latex_str) for kind, latex_str in all_problems() if not kinds or kind in kinds]
+    for kind, latex_str in problems:
+        fixed_latex = preprocess_latex(latex_str)
+        for _ in range(repeat):
+            if not warm:
+                reset_caches()
+            try:
+                timings = time_stages(fixed_latex)
+            except Exception as e:
+                failures.append({"kind": kind, "latex": latex_str, "error": str(e)})
+                break
+            for stage, seconds in timings.items():
+                per_stage[stage].append(seconds)
+                per_kind[kind][stage].append(seconds)
+            per_kind[kind]["total"].append(sum(timings.values()))
+
+    return {
+        "stages": {stage: summarize(per_stage[stage]) for stage in STAGES if stage in per_stage},
+        "kinds": {
+            kind: {stage: summarize(values) for stage, values in stages.items()}
+            for kind, stages in per_kind.items()
+        },
+        "failures": failures,
+    }
+
+
+def print_table(results):
+    print(f"{'stage':<12} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for stage, stats in results["stages"].items():
+        print(f"{stage:<12} {stats['n']:>5} {format_ms(stats['p50']):>10} "
+              f"{format_ms(stats['p95']):>10} {format_ms(stats['p99']):>10}")
+    print()
+    print(f"{'kind':<16} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for kind, stages in results["kinds"].items():
+        stats = stages["total"]
+        print(f"{kind:<16} {format_ms(stats['p50']):>10} {format_ms(stats['p95']):>10} {format_ms(stats['p99']):>10}")
+    for failure in results["failures"]:
+        print(f"FAILED {failure['kind']}: {failure['latex']}: {failure['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分阶段计时基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每道题执行的次数")
+    parser.add_argument("--warm", action="store_true", help="不清空缓存 (测缓存命中后的耗时)")
+    parser.add_argument("--kind", action="append", choices=sorted(CORPUS), help="只运行指定题型，可重复")
+    parser.add_argument("--output", help="结果 JSON 文件路径")
+    args = parser.parse_args(argv)
+
+    results = {"meta": run_metadata(benchmark="stages", repeat=args.repeat, warm=args.warm)}
+    results.update(run(repeat=args.repeat, warm=args.warm, kinds=args.kind))
+    print_table(results)
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import logging
+import os
+import signal
+import threading
+from contextlib import contextmanager
+
+# 每个计算阶段的时间预算 (秒)。超时的阶段会被中断，接口返回已完成的部分结果。
+# 可通过环境变量 FENG_MATH_BUDGET_<STAGE> 覆盖，例如 FENG_MATH_BUDGET_SIMPLIFY=2
+DEFAULT_BUDGETS = {
+    "parse": 5.0,
+    "steps": 10.0,
+    "solve": 20.0,
+    "doit": 20.0,
+    "simplify": 5.0,
+    "numeric": 10.0,
+}
+
+# 工作进程没有响应中断时 (例如卡在 C 扩展中)，主进程额外等待的时间
+WATCHDOG_GRACE = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimeout(BaseException):
+    """
+    阶段超时。继承 BaseException，避免被 SymPy 内部或步骤生成中的
+    `except Exception` 吞掉。
+    """
+    def __init__(self, stage):
+        super().__init__(f"stage '{stage}' exceeded its time budget")
+        self.stage = stage
+
+
+def stage_budget(stage):
+    """
+    读取某个阶段的时间预算，<= 0 表示不限时
+    """
+    value = os.environ.get(f"FENG_MATH_BUDGET_{stage.upper()}")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            logger.warning("Invalid budget for stage %s: %r", stage, value)
+    return DEFAULT_BUDGETS.get(stage, 0.0)
+
+
+def total_budget():
+    """
+    所有阶段预算之和，加上宽限时间，作为主进程侧的看门狗超时
+    """
+    return sum(stage_budget(stage) for stage in DEFAULT_BUDGETS) + WATCHDOG_GRACE
+
+
+def _can_interrupt():
+    # SIGALRM 只能在主线程中处理，且 Windows 不支持 setitimer
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+@contextmanager
+def time_limit(stage, seconds=None):
+    """
+    在预算内执行一个阶段，超时则抛出 StageTimeout(stage)。
+    工作进程中任务运行在主线程，SymPy 是纯 Python 代码，因此 SIGALRM 能可靠地打断计算。
+    """
+    if seconds is None:
+        seconds = stage_budget(stage)
+    if seconds <= 0 or not _can_interrupt():
+        yield
+        return
+
+    def handler(signum, frame):
+        raise StageTimeout(stage)
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
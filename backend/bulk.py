@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import warmup
+from logs import setup_logging, stop_logging
+from solver import preprocess_latex, solve_job
+from budget import stage_budget, total_budget
+from cache import cache_from_env
+from encoding import dumps
+from singleflight import SingleFlight
+from worker import get_pool, shutdown_pool, run_in_pool, warm_pool, pool_size
+
+# 离线批量求解。
+# 题库预先生成答案时不必逐题调用 HTTP 接口，在 backend 目录下运行：
+#   python bulk.py problems.jsonl -o answers.jsonl
+# 从 JSONL (每行 {"id": ..., "latex": ...} 或一个 LaTeX 字符串) 或 CSV (latex 列，可选 id 列) 边读边算，
+# 在工作进程池中走与 /solve 相同的流程 (解析 → 步骤 → 求解/运算 → 化简)，每完成一题就追加一行结果。
+# 同时在途的题目数有上限，内存占用与题库大小无关；结果按完成顺序写出，每行带输入中的序号 index。
+# 输出文件同时是检查点：中断后加 --resume 重新运行，已有结果的题目被跳过。
+# 单题受各阶段的时间预算和看门狗约束 (见 budget.py、worker.py)，超时或出错只记为该题的错误；
+# 看门狗杀掉进程池或工作进程崩溃时，被连累的其他题目重新提交。
+
+# 每个工作进程对应的在途题目数
+IN_FLIGHT_PER_WORKER = 2
+# 进程池损坏时每题最多尝试的次数
+MAX_ATTEMPTS = 3
+# 进度日志的间隔 (秒)
+PROGRESS_INTERVAL = 10.0
+
+# 输出的每一行以 index 开头，恢复时只需匹配行首，不必解析整行
+_INDEX_RE = re.compile(rb'^\{"index":\s*(\d+)')
+
+logger = logging.getLogger(__name__)
+
+
+class Problem:
+    """
+    输入中的一道题。index 是 JSONL 的行号或 CSV 的数据行序号 (从 0 开始)，恢复时据此跳过；
+    输入本身有误时 latex 为 None，error 说明原因
+    """
+
+    def __init__(self, index, problem_id, latex, error=None):
+        self.index = index
+        self.id = problem_id
+        self.latex = latex
+        self.error = error
+
+
+def read_jsonl(handle, column, id_column):
+    for index, line in enumerate(handle):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            yield Problem(index, None, None, f"Invalid JSON: {e}")
+            continue
+        if isinstance(item, str):
+            yield Problem(index, None, item)
+        elif isinstance(item, dict) and isinstance(item.get(column), str):
+            yield Problem(index, item.get(id_column), item[column])
+        else:
+            yield Problem(index, None, None, f"Missing '{column}' field")
+
+
+def read_csv(handle, column, id_column):
+    reader = csv.DictReader(handle)
+    if reader.fieldnames is None or column not in reader.fieldnames:
+        raise ValueError(f"CSV input has no '{column}' column")
+    for index, row in enumerate(reader):
+        latex_str = row.get(column)
+        if not latex_str:
+            yield Problem(index, row.get(id_column), None, f"Empty '{column}' field")
+        else:
+            yield Problem(index, row.get(id_column), latex_str)
+
+
+def input_format(path, requested=None):
+    if requested:
+        return requested
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def completed_indices(path):
+    """
+    读取已有的输出文件，返回已完成题目的序号集合。
+    末尾不完整的一行 (上次写到一半时被中断) 会被截掉
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r+b") as handle:
+        valid = 0
+        for line in handle:
+            if not line.endswith(b"\n"):
+                break
+            match = _INDEX_RE.match(line)
+            if match:
+                done.add(int(match.group(1)))
+            valid += len(line)
+        handle.truncate(valid)
+    return done
+
+
+class BulkSolver:
+    """
+    批量求解的状态：结果缓存 (题库中重复的题目只算一次)、在途合并和计数
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.flights = SingleFlight("latex")
+        # 与服务端相同的看门狗：解析和求解在同一个任务中完成
+        self.timeout = stage_budget("parse") + total_budget()
+        self.solved = 0
+        self.failed = 0
+
+    async def solve(self, problem):
+        """
+        求解一道题，返回输出的一行 (dict)。出错时返回带 error 的行，不抛出异常
+        """
+        record = {"index": problem.index, "id": problem.id, "latex": problem.latex}
+        try:
+            if problem.error is not None:
+                raise ValueError(problem.error)
+            latex_key = preprocess_latex(problem.latex)
+            result = self.cache.get_latex(latex_key)
+            if result is None:
+                result = await self.flights.run(latex_key, lambda: self._compute(latex_key))
+        except Exception as e:
+            self.failed += 1
+            status = "timeout" if isinstance(e, TimeoutError) else "error"
+            return {**record, "status": status, "error": str(e)}
+        self.solved += 1
+        return {**record, **result}
+
+    async def _compute(self, latex_key):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                key, result = await run_in_pool(solve_job, latex_key, timeout=self.timeout)
+            except BrokenProcessPool:
+                # 可能只是被同一进程池中的另一道题连累，重新提交
+                if attempt == MAX_ATTEMPTS:
+                    raise RuntimeError("Worker process crashed")
+                logger.warning("Pool broke while solving %r, retrying (attempt %d)", latex_key, attempt + 1)
+                continue
+            # 部分结果依赖于时间预算，不缓存
+            if not result["partial"]:
+                self.cache.put(latex_key, key, result)
+            return result
+
+
+async def run(problems, output, solver, window):
+    """
+    边读边算：最多 window 道题在途，每完成一道立即写出并刷新到文件
+    """
+    start = last_report = time.perf_counter()
+    pending = set()
+
+    def write(done):
+        for task in done:
+            output.write(dumps(task.result()) + b"\n")
+        output.flush()
+
+    def report(final=False):
+        elapsed = time.perf_counter() - start
+        finished = solver.solved + solver.failed
+        logger.info("%s %d problems in %.1fs (%.1f/s), %d errors, %d cache hits",
+                    "Finished" if final else "Progress:", finished, elapsed,
+                    finished / elapsed if elapsed else 0.0, solver.failed, solver.cache.stats()["latex_hits"])
+
+    for problem in problems:
+        if len(pending) >= window:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            write(done)
+            if time.perf_counter() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.perf_counter()
+                report()
+        pending.add(asyncio.create_task(solver.solve(problem)))
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        write(done)
+    report(final=True)
+
+
+async def start_pool():
+    # 与服务启动相同：先在主进程中预热，fork 出的工作进程继承预热后的状态
+    if warmup.warmup_enabled():
+        warmup.warm_up()
+        workers = await warm_pool(timeout=total_budget())
+        logger.info("%d/%d workers warm", workers, pool_size())
+    else:
+        get_pool()
+
+
+async def main_async(args):
+    fmt = input_format(args.input, args.format)
+    done = completed_indices(args.output) if args.resume else set()
+    if done:
+        logger.info("Resuming: %d problems already solved", len(done))
+
+    cache = cache_from_env()
+    solver = BulkSolver(cache)
+    with open(args.input, newline="" if fmt == "csv" else None, encoding="utf-8") as source, \
+            open(args.output, "ab" if args.resume else "wb") as output:
+        reader = read_csv if fmt == "csv" else read_jsonl
+        problems = (problem for problem in reader(source, args.column, args.id_column) if problem.index not in done)
+        await start_pool()
+        try:
+            await run(problems, output, solver, pool_size() * IN_FLIGHT_PER_WORKER)
+        finally:
+            shutdown_pool()
+            cache.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线批量求解：读入 JSONL/CSV 题目，输出 JSONL 结果")
+    parser.add_argument("input", help="题目文件 (.jsonl 或 .csv)")
+    parser.add_argument("-o", "--output", required=True, help="结果 JSONL 文件路径")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="输入格式 (默认按扩展名判断)")
+    parser.add_argument("--column", default="latex", help="LaTeX 所在的字段/列名 (默认 latex)")
+    parser.add_argument("--id-column", default="id", help="题目 ID 所在的字段/列名 (默认 id)，原样写入结果")
+    parser.add_argument("--workers", type=int, help="工作进程数 (默认 FENG_MATH_WORKERS 或 CPU 核心数)")
+    parser.add_argument("--resume", action="store_true", help="从已有的输出文件继续，跳过已完成的题目")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        # 必须在创建进程池之前设置 (见 worker.pool_size)
+        os.environ["FENG_MATH_WORKERS"] = str(args.workers)
+    setup_logging()
+    try:
+        asyncio.run(main_async(args))
+    except ValueError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        logger.info("Interrupted; rerun with --resume to continue")
+        return 130
+    finally:
+        stop_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
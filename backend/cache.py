@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import sqlite3
+from collections import Counter, OrderedDict
+
+from store import ResultStore, DEFAULT_RESULTS_PATH, data_path
+
+# 求解结果缓存。
+# 一级：规范化后的 LaTeX 字符串 -> 表达式键；命中时不需要解析
+# 二级：表达式键 (srepr 的哈希) -> 结果；写法不同但含义相同的输入共享结果
+# 两级共用一个内存上限 (FENG_MATH_CACHE_MB)，按 LRU 淘汰。
+# 内存之下是持久化的结果存储 (见 store.py)：结果同时写入 FENG_MATH_CACHE_PATH 指定的 SQLite 文件，
+# 所有服务进程共用，重启后仍然可用；启动时把请求最多的 FENG_MATH_CACHE_PRELOAD 个结果载入内存。
+DEFAULT_CACHE_MB = 64
+DEFAULT_PRELOAD = 1000
+# 请求次数在内存中累积，达到这个数目时才写入存储
+HIT_FLUSH_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+
+def _entry_size(key, value):
+    # 粗略估算条目占用的内存 (按序列化后的长度)
+    if isinstance(value, str):
+        return len(key) + len(value)
+    return len(key) + len(json.dumps(value, ensure_ascii=False))
+
+
+class ResultCache:
+    """
+    两级 LRU 结果缓存，带命中/未命中计数和可选的持久化存储 (ResultStore)
+    """
+
+    def __init__(self, max_bytes, store=None):
+        self.max_bytes = max_bytes
+        self._latex = OrderedDict()  # latex -> (expr key, size)
+        self._results = OrderedDict()  # expr key -> (result, size)
+        self._bytes = 0
+        self._store = store
+        self._hits = Counter()  # 尚未写入存储的请求次数
+        self._pending_hits = 0
+        self.latex_hits = 0
+        self.expr_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.preloaded = 0
+
+    def _load(self, method, key):
+        # 内存未命中时回退到持久化存储
+        if self._store is None:
+            return None
+        try:
+            value = getattr(self._store, method)(key)
+        except sqlite3.Error as e:
+            logger.warning("Result store read error: %s", e)
+            return None
+        if value is not None:
+            self.disk_hits += 1
+        return value
+
+    def _save(self, method, *args):
+        # 存储的写入只是放入队列，由其后台线程执行 (见 store.py)
+        if self._store is None:
+            return
+        try:
+            getattr(self._store, method)(*args)
+        except sqlite3.Error as e:
+            logger.warning("Result store write error: %s", e)
+
+    def _count(self, key):
+        # 记录一次请求，累积到一定数目后写入存储
+        if self._store is None:
+            return
+        self._hits[key] += 1
+        self._pending_hits += 1
+        if self._pending_hits >= HIT_FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """
+        把累积的请求次数写入存储
+        """
+        if self._hits:
+            hits, self._hits, self._pending_hits = self._hits, Counter(), 0
+            self._save("add_hits", hits)
+
+    def preload(self, limit):
+        """
+        把存储中请求最多的 limit 个结果载入内存 (不超过内存上限)，返回载入的数目
+        """
+        if self._store is None or limit <= 0:
+            return 0
+        try:
+            entries = self._store.top(limit)
+        except sqlite3.Error as e:
+            logger.warning("Result store preload error: %s", e)
+            return 0
+        # 请求最多的最后插入，LRU 淘汰时最后被淘汰
+        for key, result, latex_keys in reversed(entries):
+            self._insert(self._results, key, result)
+            for latex_key in latex_keys:
+                self._insert(self._latex, latex_key, key)
+        self.preloaded = len(self._results)
+        return self.preloaded
+
+    def _insert(self, table, key, value):
+        if key in table:
+            self._bytes -= table.pop(key)[1]
+        size = _entry_size(key, value)
+        table[key] = (value, size)
+        self._bytes += size
+        self._evict()
+
+    def _evict(self):
+        # 先淘汰最久未使用的结果，再淘汰一级索引
+        while self._bytes > self.max_bytes and (self._results or self._latex):
+            table = self._results if self._results else self._latex
+            _, (_, size) = table.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def _get_result(self, key):
+        entry = self._results.get(key)
+        if entry is not None:
+            self._results.move_to_end(key)
+            return entry[0]
+        result = self._load("get", key)
+        if result is not None:
+            self._insert(self._results, key, result)
+        return result
+
+    def get_latex(self, latex_key):
+        """
+        一级查找：按规范化后的 LaTeX 字符串
+        """
+        entry = self._latex.get(latex_key)
+        if entry is not None:
+            self._latex.move_to_end(latex_key)
+            key = entry[0]
+        else:
+            key = self._load("get_key", latex_key)
+            if key is None:
+                return None
+            self._insert(self._latex, latex_key, key)
+        result = self._get_result(key)
+        if result is not None:
+            self.latex_hits += 1
+            self._count(key)
+        return result
+
+    def get_expr(self, latex_key, key):
+        """
+        二级查找：按解析后的表达式键。命中时把 LaTeX 键关联到该结果
+        """
+        result = self._get_result(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.expr_hits += 1
+        self._insert(self._latex, latex_key, key)
+        self._save("put_key", latex_key, key)
+        self._count(key)
+        return result
+
+    def put(self, latex_key, key, result):
+        self._insert(self._results, key, result)
+        self._insert(self._latex, latex_key, key)
+        self._save("put", key, result)
+        self._save("put_key", latex_key, key)
+        self._count(key)
+
+    def stats(self):
+        lookups = self.latex_hits + self.expr_hits + self.misses
+        return {
+            "latex_hits": self.latex_hits,
+            "expr_hits": self.expr_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.latex_hits + self.expr_hits) / lookups if lookups else 0.0,
+            "entries": len(self._results),
+            "latex_entries": len(self._latex),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "preloaded": self.preloaded,
+            "store_version": self._store.version if self._store is not None else None,
+        }
+
+    def close(self):
+        if self._store is not None:
+            self.flush()
+            self._store.close()
+            self._store = None
+
+
+def _env_number(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def cache_from_env():
+    """
+    按环境变量创建缓存：FENG_MATH_CACHE_MB 为内存上限，FENG_MATH_CACHE_PATH 为结果存储的路径
+    (未设置时放在 FENG_MATH_DATA_DIR 下，两者都未设置或为 ":memory:" 时不持久化)，
+    FENG_MATH_CACHE_PRELOAD 为启动时载入内存的结果数
+    """
+    max_mb = _env_number("FENG_MATH_CACHE_MB", DEFAULT_CACHE_MB)
+    path = data_path("FENG_MATH_CACHE_PATH", DEFAULT_RESULTS_PATH)
+    store = None
+    if path != ":memory:":
+        try:
+            store = ResultStore(path)
+        except sqlite3.Error as e:
+            logger.warning("Cannot open result store %s, results will not persist: %s", path, e)
+    cache = ResultCache(int(max_mb * 1024 * 1024), store)
+    preloaded = cache.preload(int(_env_number("FENG_MATH_CACHE_PRELOAD", DEFAULT_PRELOAD)))
+    if store is not None:
+        logger.info("Result store %s (version %s): %d results, %d preloaded",
+                    path, store.version, store.count(), preloaded)
+    return cache
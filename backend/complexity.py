@@ -0,0 +1,173 @@
+import logging
+import os
+
+from sympy import Symbol, Pow, Mul, Integer, Limit, exp, log, count_ops
+from sympy.functions.elementary.trigonometric import TrigonometricFunction, InverseTrigonometricFunction
+from sympy.functions.elementary.hyperbolic import HyperbolicFunction
+
+import metrics
+
+# 解析之后、求解之前的复杂度估计，用于准入控制和调度。
+# 从表达式树上取几个便宜的特征：运算数 (count_ops)、树深度、多项式次数、
+# 三角/指数/对数函数的嵌套层数、自由符号数，按题型加权合成一个代价分数。
+# 分数不超过 FAST_LANE_MAX_COST 的题目走快速通道，与普通请求一样直接排队等空闲的工作进程；
+# 更贵的题目走重通道，同时占用的工作进程数有上限 (见 worker.py)，总会给快速通道留出进程；
+# 超过 FENG_MATH_COST_CEILING 的题目不计算，直接返回 422。
+# 估计只用于排序和拒绝明显的"怪题"，不追求准确，阈值按 benchmarks/corpus.py 的题目校准。
+
+# 快速通道的代价上限，可通过环境变量 FENG_MATH_COST_FAST 覆盖
+FAST_LANE_MAX_COST = 200.0
+# 拒绝的代价上限，可通过环境变量 FENG_MATH_COST_CEILING 覆盖，<= 0 表示不拒绝
+DEFAULT_COST_CEILING = 20000.0
+
+# 各题型的权重：积分和极限的计算量远大于同样规模的方程
+KIND_WEIGHTS = {
+    "Integral": 4.0,
+    "Limit": 3.0,
+    "Series": 2.0,
+    "System": 2.0,
+    "Matrix": 2.0,
+    "Derivative": 1.0,
+    "Eq": 1.0,
+    "other": 1.0,
+}
+
+# 遍历的节点数上限，超过时不再继续分析，直接视为超过代价上限
+MAX_NODES = 20000
+# 次数的上限，避免 x^{10^{100}} 这样的指数参与后续计算
+MAX_DEGREE = 10 ** 6
+
+TRANSCENDENTAL = (TrigonometricFunction, InverseTrigonometricFunction, HyperbolicFunction, exp, log)
+
+logger = logging.getLogger(__name__)
+
+
+class TooComplex(ValueError):
+    """
+    估计代价超过上限，不予计算
+    """
+
+
+class Cost:
+    """
+    一道题的复杂度特征和代价分数。nodes 超过 MAX_NODES 时其余特征只统计了一部分，score 为无穷大
+    """
+
+    def __init__(self, kind, ops, nodes, depth, degree, nesting, symbols):
+        self.kind = kind
+        self.ops = ops
+        self.nodes = nodes
+        self.depth = depth
+        self.degree = degree
+        self.nesting = nesting
+        self.symbols = symbols
+        if nodes > MAX_NODES:
+            self.score = float("inf")
+        else:
+            self.score = (
+                (ops + depth)
+                * (1 + degree / 4)
+                * (1 + nesting) ** 2
+                * (1 + max(symbols - 1, 0) / 4)
+                * KIND_WEIGHTS.get(kind, 1.0)
+            )
+
+    @property
+    def heavy(self):
+        return self.score > fast_lane_max_cost()
+
+    @property
+    def lane(self):
+        return "heavy" if self.heavy else "fast"
+
+    def describe(self):
+        if self.nodes > MAX_NODES:
+            return f"more than {MAX_NODES} expression nodes"
+        return (f"{self.ops} operations, depth {self.depth}, degree {self.degree}, "
+                f"{self.nesting} nested functions, {self.symbols} symbols")
+
+    def __repr__(self):
+        return f"Cost({self.score:.0f}: {self.describe()})"
+
+
+class _TooManyNodes(Exception):
+    pass
+
+
+def _number(name, default):
+    value = os.environ.get(name)
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            logger.warning("Invalid %s=%r, using %s", name, value, default)
+    return default
+
+
+def fast_lane_max_cost():
+    return _number("FENG_MATH_COST_FAST", FAST_LANE_MAX_COST)
+
+
+def cost_ceiling():
+    return _number("FENG_MATH_COST_CEILING", DEFAULT_COST_CEILING)
+
+
+def _walk(node, symbols, counter):
+    """
+    返回子树的 (深度, 多项式次数, 函数嵌套层数)，符号收集到 symbols，节点数累加到 counter[0]
+    """
+    counter[0] += 1
+    if counter[0] > MAX_NODES:
+        raise _TooManyNodes()
+    if isinstance(node, Symbol):
+        symbols.add(node)
+        return 1, 1, 0
+    if not node.args:
+        return 1, 0, 0
+
+    # 极限的方向 ("+"、"-") 是一个符号，不参与统计
+    args = node.args[:3] if isinstance(node, Limit) else node.args
+    children = [_walk(arg, symbols, counter) for arg in args]
+    depth = 1 + max(child[0] for child in children)
+    nesting = max(child[2] for child in children)
+    if isinstance(node, Pow):
+        base, exponent = children[0][1], node.args[1]
+        if isinstance(exponent, Integer):
+            degree = base * abs(int(exponent)) if abs(exponent) < MAX_DEGREE else MAX_DEGREE
+        else:
+            degree = base
+            # x^x、2^x 之类的变指数相当于指数函数
+            if node.args[1].free_symbols:
+                nesting += 1
+    elif isinstance(node, Mul):
+        degree = sum(child[1] for child in children)
+    else:
+        degree = max(child[1] for child in children)
+        if isinstance(node, TRANSCENDENTAL):
+            nesting += 1
+    return depth, min(degree, MAX_DEGREE), nesting
+
+
+def estimate_cost(expr):
+    """
+    估计解析结果的求解代价 (在工作进程中执行，节点数有上限，耗时与表达式规模成正比)
+    """
+    kind = metrics.expr_kind(expr)
+    symbols = set()
+    counter = [0]
+    try:
+        depth, degree, nesting = _walk(expr, symbols, counter)
+    except _TooManyNodes:
+        return Cost(kind, 0, counter[0], 0, 0, 0, len(symbols))
+    return Cost(kind, int(count_ops(expr)), counter[0], depth, degree, nesting, len(symbols))
+
+
+def admit(cost):
+    """
+    准入控制：代价超过上限时抛出 TooComplex，否则按通道计数
+    """
+    ceiling = cost_ceiling()
+    if ceiling > 0 and cost.score > ceiling:
+        metrics.ADMISSIONS.inc(lane="rejected")
+        raise TooComplex(f"estimated cost {cost.score:.0f} exceeds the limit of {ceiling:.0f} ({cost.describe()})")
+    metrics.ADMISSIONS.inc(lane=cost.lane)
@@ -0,0 +1,232 @@
+import logging
+
+from sympy import (
+    latex, Derivative, Integral, Limit, Sum, Add, Mul, Pow, S, fraction, log,
+    sin, cos, tan, cot, sec, csc, exp, asin, acos, atan, acot, sinh, cosh, tanh, coth, asinh, acosh, atanh,
+)
+
+# 求导：沿表达式树递归，一次遍历同时得到步骤和导函数。
+# 每个子表达式的导数按 (子表达式, 变量) 记忆，共享的子树只求导一次，
+# 重复出现时步骤中只引用前面的结果；最终结果直接使用，不再调用 doit() 重新求导。
+# 支持任意个因子的乘积、商、任意深度的链式法则、高阶导数和偏导数。
+
+# 步骤行数上限。超过后继续求导，但不再记录步骤
+MAX_DERIVATIVE_STEPS = 200
+
+# 外层函数的求导公式 (步骤中展示)；导数本身由 fdiff 给出
+OUTER_FORMULAS = {
+    sin: r"\sin u \to \cos u",
+    cos: r"\cos u \to -\sin u",
+    tan: r"\tan u \to 1 + \tan^2 u",
+    cot: r"\cot u \to -(1 + \cot^2 u)",
+    sec: r"\sec u \to \sec u \tan u",
+    csc: r"\csc u \to -\csc u \cot u",
+    exp: r"e^u \to e^u",
+    log: r"\ln u \to \frac{1}{u}",
+    asin: r"\arcsin u \to \frac{1}{\sqrt{1-u^2}}",
+    acos: r"\arccos u \to -\frac{1}{\sqrt{1-u^2}}",
+    atan: r"\arctan u \to \frac{1}{1+u^2}",
+    acot: r"\operatorname{arccot} u \to -\frac{1}{1+u^2}",
+    sinh: r"\sinh u \to \cosh u",
+    cosh: r"\cosh u \to \sinh u",
+    tanh: r"\tanh u \to 1 - \tanh^2 u",
+    coth: r"\coth u \to 1 - \coth^2 u",
+    asinh: r"\operatorname{arsinh} u \to \frac{1}{\sqrt{u^2+1}}",
+    acosh: r"\operatorname{arcosh} u \to \frac{1}{\sqrt{u^2-1}}",
+    atanh: r"\operatorname{artanh} u \to \frac{1}{1-u^2}",
+}
+
+# 含这些未计算运算的表达式交给 doit()
+UNEVALUATED = (Integral, Derivative, Limit, Sum)
+
+logger = logging.getLogger(__name__)
+
+
+class Derivation:
+    """
+    求导结果：导函数和步骤
+    """
+
+    def __init__(self, result, steps):
+        self.result = result
+        self.steps = steps
+
+
+class _Engine:
+    """
+    一次求导请求的状态：记忆表和已输出的步骤 (带深度)
+    """
+
+    def __init__(self, symbol="d"):
+        self.symbol = symbol
+        self.memo = {}
+        self.lines = []
+        self.truncated = False
+
+    def d(self, var, f):
+        # \frac{d}{dx}(f)，偏导数时为 \frac{\partial}{\partial x}(f)
+        return r"\frac{" + self.symbol + "}{" + self.symbol + " " + latex(var) + r"}\left(" + latex(f) + r"\right)"
+
+    def emit(self, depth, text):
+        if len(self.lines) < MAX_DERIVATIVE_STEPS:
+            self.lines.append((depth, text))
+        else:
+            self.truncated = True
+
+    def diff(self, f, var, depth=0):
+        """
+        对 f 关于 var 求导，返回导数并在 depth 处输出步骤
+        """
+        key = (f, var)
+        if key in self.memo and not f.is_Symbol:
+            result = self.memo[key]
+            self.emit(depth, r"\text{前面已求得: } " + self.d(var, f) + " = " + latex(result))
+            return result
+        result = self._diff(f, var, depth)
+        self.memo[key] = result
+        return result
+
+    def _diff(self, f, var, depth):
+        if not f.has(var):
+            self.emit(depth, r"\text{常数的导数为 } 0: " + self.d(var, f) + " = 0")
+            return S.Zero
+        if f == var:
+            self.emit(depth, self.d(var, f) + " = 1")
+            return S.One
+
+        if isinstance(f, Add):
+            self.emit(depth, r"\text{加法法则: } " + self.d(var, f) + " = "
+                      + " + ".join(self.d(var, term) for term in f.args))
+            result = Add(*(self.diff(term, var, depth + 1) for term in f.args))
+        elif isinstance(f, Mul):
+            result = self._mul(f, var, depth)
+        elif isinstance(f, Pow):
+            result = self._pow(f, var, depth)
+        elif f.func in OUTER_FORMULAS and len(f.args) == 1:
+            result = self._chain(f, var, depth)
+        else:
+            # 其他函数 (例如 Abs、特殊函数)：直接交给 SymPy
+            result = f.diff(var)
+            self.emit(depth, r"\text{直接求导: } " + self.d(var, f) + " = " + latex(result))
+            return result
+
+        self.emit(depth, r"\Rightarrow " + self.d(var, f) + " = " + latex(result))
+        return result
+
+    def _mul(self, f, var, depth):
+        coeff, g = f.as_independent(var, as_Add=False)
+        if coeff != 1:
+            self.emit(depth, r"\text{提取常数: } " + self.d(var, f) + " = "
+                      + latex(coeff) + r" \cdot " + self.d(var, g))
+            return coeff * self.diff(g, var, depth + 1)
+
+        numer, denom = fraction(f)
+        if denom.has(var) and numer.has(var):
+            self.emit(depth, r"\text{除法法则: } \left(\frac{u}{v}\right)' = \frac{u'v - uv'}{v^2}")
+            self.emit(depth, r"\quad u = " + latex(numer) + r", \quad v = " + latex(denom))
+            du = self.diff(numer, var, depth + 1)
+            dv = self.diff(denom, var, depth + 1)
+            # 与 diff() 的结果形式相同 (u'/v - u v'/v^2)，化简阶段可以用便宜的化简合并
+            return du / denom - numer * dv / denom**2
+
+        factors = Mul.make_args(f)
+        if len(factors) == 2:
+            formula = r"(uv)' = u'v + uv'"
+        else:
+            formula = r"(f_1 f_2 \cdots f_n)' = \sum_i f_i' \prod_{j \neq i} f_j"
+        self.emit(depth, r"\text{乘法法则: } " + formula + r", \quad "
+                  + ", ".join(f"f_{{{i + 1}}} = " + latex(factor) for i, factor in enumerate(factors)))
+        derivatives = [self.diff(factor, var, depth + 1) for factor in factors]
+        return Add(*(
+            Mul(derivative, *(factor for j, factor in enumerate(factors) if j != i))
+            for i, derivative in enumerate(derivatives)
+        ))
+
+    def _pow(self, f, var, depth):
+        base, exponent = f.args
+        if not exponent.has(var):
+            if base == var:
+                self.emit(depth, r"\text{幂法则: } (x^n)' = n x^{n-1}, \quad n = " + latex(exponent))
+                return exponent * base**(exponent - 1)
+            self.emit(depth, r"\text{幂法则 + 链式法则: } (u^n)' = n u^{n-1} \cdot u', \quad u = "
+                      + latex(base) + r", \quad n = " + latex(exponent))
+            return exponent * base**(exponent - 1) * self.diff(base, var, depth + 1)
+        if not base.has(var):
+            self.emit(depth, r"\text{指数函数 + 链式法则: } (a^u)' = a^u \ln a \cdot u', \quad a = "
+                      + latex(base) + r", \quad u = " + latex(exponent))
+            return f * log(base) * self.diff(exponent, var, depth + 1)
+        # 底数和指数都含变量：对数求导法
+        self.emit(depth, r"\text{对数求导法: } (u^v)' = u^v \left(v' \ln u + \frac{v u'}{u}\right), \quad u = "
+                  + latex(base) + r", \quad v = " + latex(exponent))
+        du = self.diff(base, var, depth + 1)
+        dv = self.diff(exponent, var, depth + 1)
+        return f * (dv * log(base) + exponent * du / base)
+
+    def _chain(self, f, var, depth):
+        inner = f.args[0]
+        outer = f.fdiff(1)
+        if inner == var:
+            self.emit(depth, r"\text{基本求导公式: } " + OUTER_FORMULAS[f.func].replace("u", latex(var)))
+            return outer
+        self.emit(depth, r"\text{链式法则: } " + OUTER_FORMULAS[f.func] + r" \ \text{，再乘以 } u', \quad u = "
+                  + latex(inner))
+        return outer * self.diff(inner, var, depth + 1)
+
+
+def differentiate(expr: Derivative):
+    """
+    递归求导，返回 Derivation (导函数和步骤)。含未计算的积分/极限等运算时返回 None，调用方回退到 doit()
+    """
+    func = expr.expr
+    if func.has(*UNEVALUATED) or not all(var.is_Symbol and count.is_Integer for var, count in expr.variable_count):
+        return None
+
+    orders = [(var, count) for var, count in expr.variable_count]
+    total = sum(count for _, count in orders)
+    partial = len(orders) > 1 or bool(func.free_symbols - {orders[0][0]})
+    symbol = r"\partial" if partial else "d"
+    engine = _Engine(symbol)
+    engine.emit(0, r"\text{目标: 对 } " + latex(func) + r" \text{ 求导: } " + latex(expr))
+
+    current = func
+    index = 0
+    for var, count in orders:
+        for _ in range(int(count)):
+            index += 1
+            if total > 1:
+                engine.emit(0, r"\text{第 " + str(index) + r" 次求导 (对 } " + latex(var) + r"\text{):}")
+            elif partial:
+                engine.emit(0, r"\text{对 } " + latex(var) + r" \text{ 求偏导，其余变量视为常数}")
+            current = engine.diff(current, var, 1 if total > 1 else 0)
+            if total > 1:
+                power = "^{" + str(index) + "}" if index > 1 else ""
+                engine.emit(0, r"\quad \Rightarrow \frac{" + symbol + power + " f}{"
+                            + _order_latex(symbol, orders, index) + "} = " + latex(current))
+
+    steps = [r"\quad " * depth + text for depth, text in engine.lines]
+    if engine.truncated:
+        steps.append(r"\text{(步骤过多，其余步骤已省略)}")
+    return Derivation(current, steps)
+
+
+def _order_latex(symbol, orders, index):
+    # 前 index 次求导的分母，例如 \partial x^{2} \partial y
+    parts = []
+    remaining = index
+    for var, count in orders:
+        used = min(int(count), remaining)
+        remaining -= used
+        if used:
+            parts.append(symbol + " " + latex(var) + ("^{" + str(used) + "}" if used > 1 else ""))
+    return " ".join(parts)
+
+
+def derive(expr: Derivative):
+    """
+    differentiate 的安全版本：出错时返回 None，由调用方回退到 doit()
+    """
+    try:
+        return differentiate(expr)
+    except Exception as e:
+        logger.warning("Derivative step error: %s", e)
+        return None
@@ -0,0 +1,149 @@
+import json
+import re
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # 未安装时退回标准库 json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # 未安装时不提供 MessagePack 编码
+    msgpack = None
+
+# 响应编码。
+# 默认仍返回普通 JSON (用 orjson 序列化)。客户端可以通过 Accept 头请求紧凑格式：
+#   application/vnd.feng-math.compact+json  紧凑格式，JSON 编码
+#   application/msgpack                     紧凑格式，MessagePack 编码
+# 紧凑格式中每个步骤是 [缩进深度, 片段...]：一行步骤按 \text{...} 标签切成固定的标签 (规则说明)
+# 和标签之间的 LaTeX 参数，各片段放进同一个字符串表，步骤里只放片段在表中的下标，
+# 按顺序拼接即还原原来的步骤。重复的标签、公式、结果和整段重复的子步骤都只传输一次；
+# 结果字段 result 同样是字符串表的下标 (通常与最后一步中的结果是同一个片段)。
+
+COMPACT_VERSION = 1
+COMPACT_JSON = "application/vnd.feng-math.compact+json"
+MSGPACK = "application/msgpack"
+JSON = "application/json"
+
+_INDENT = r"\quad "
+# 标签连同两侧的空白一起切出，参数两端不带空白，和 result 字段一致
+_TEXT_RE = re.compile(r"\s*\\text\{[^{}]*\}\s*")
+
+
+def dumps(body):
+    """
+    序列化为 UTF-8 编码的 JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(body)
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+@lru_cache(maxsize=8192)
+def split_step(step):
+    """
+    把一行步骤拆成 (缩进深度, 片段列表)：标签和参数交替出现，拼接后加上 depth 个 \\quad 即为原来的步骤
+    """
+    depth = 0
+    while step.startswith(_INDENT, depth * len(_INDENT)):
+        depth += 1
+    line = step[depth * len(_INDENT):]
+
+    pieces = []
+    position = 0
+    for match in _TEXT_RE.finditer(line):
+        if match.start() > position:
+            pieces.append(line[position:match.start()])
+        pieces.append(match.group())
+        position = match.end()
+    if position < len(line):
+        pieces.append(line[position:])
+    return depth, tuple(pieces)
+
+
+def join_step(depth, pieces):
+    """
+    split_step 的逆运算 (客户端按同样的方式还原步骤)
+    """
+    return _INDENT * depth + "".join(pieces)
+
+
+class Compactor:
+    """
+    共享字符串表。一次响应 (包括批量响应中的所有结果) 使用同一个表
+    """
+
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+        self._rows = {}  # 步骤 -> 行，整行重复的步骤只拆分一次
+
+    def intern(self, value):
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def steps(self, steps):
+        rows = []
+        for step in steps:
+            row = self._rows.get(step)
+            if row is None:
+                depth, pieces = split_step(step)
+                row = self._rows[step] = [depth] + [self.intern(piece) for piece in pieces]
+            rows.append(row)
+        return rows
+
+    def result(self, body):
+        # 只改写步骤和结果，其余字段 (数值采样等) 原样保留；出错的批量项没有步骤，原样返回
+        if not isinstance(body, dict) or "steps" not in body:
+            return body
+        return {**body, "result": self.intern(body["result"]), "steps": self.steps(body["steps"])}
+
+
+def compact(body):
+    """
+    单个结果的紧凑格式
+    """
+    compactor = Compactor()
+    converted = compactor.result(body)
+    return {"format": "compact", "version": COMPACT_VERSION, "strings": compactor.strings, **converted}
+
+
+def compact_batch(results):
+    """
+    批量结果的紧凑格式：所有结果共用一个字符串表
+    """
+    compactor = Compactor()
+    converted = [compactor.result(result) for result in results]
+    return {"format": "compact", "version": COMPACT_VERSION, "strings": compactor.strings, "results": converted}
+
+
+def negotiate(accept):
+    """
+    按 Accept 头选择响应格式：MSGPACK、COMPACT_JSON 或 JSON。
+    未安装 msgpack 时，请求 MessagePack 的客户端得到紧凑 JSON
+    """
+    accept = (accept or "").lower()
+    if MSGPACK in accept or "application/x-msgpack" in accept:
+        return MSGPACK if msgpack is not None else COMPACT_JSON
+    if COMPACT_JSON in accept:
+        return COMPACT_JSON
+    return JSON
+
+
+def encode(body, media_type, batch=False):
+    """
+    按选定的格式编码响应体，返回字节串
+    """
+    if media_type == JSON:
+        return dumps(body)
+    if batch:
+        body = compact_batch(body["results"])
+    else:
+        body = compact(body)
+    if media_type == MSGPACK:
+        return msgpack.packb(body, use_bin_type=True)
+    return dumps(body)
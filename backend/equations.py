@@ -0,0 +1,183 @@
+import logging
+
+import numpy as np
+from sympy import latex, solve, roots, sqrt, Eq, Poly, Float, I, PolynomialError, default_sort_key
+
+# 方程求解引擎。
+# 单变量多项式方程复用 Poly：一次、二次方程直接用公式，高次方程用 roots，
+# roots 找不全时，实根用 real_roots 给出精确的 CRootOf 表示，
+# 复根用 NumPy 伴随矩阵特征值的数值解 (完整的复根隔离对高次方程非常慢)。
+# 只有非多项式方程才调用通用的 solve()。
+
+logger = logging.getLogger(__name__)
+
+
+class PolynomialForm:
+    """
+    方程移项后的多项式形式：变量、rhs = 0 后的左边、Poly 对象
+    """
+    def __init__(self, var, lhs, poly):
+        self.var = var
+        self.lhs = lhs
+        self.poly = poly
+        self._roots = None
+
+    @property
+    def degree(self):
+        return self.poly.degree()
+
+    def roots(self):
+        """
+        roots() 的结果 {根: 重数}，只计算一次 (步骤生成和求解共用)
+        """
+        if self._roots is None:
+            self._roots = roots(self.poly)
+        return self._roots
+
+
+def polynomial_form(eq: Eq):
+    """
+    尝试把单变量方程整理为多项式，不是多项式时返回 None
+    """
+    free_symbols = eq.free_symbols
+    if len(free_symbols) != 1:
+        return None
+    x = list(free_symbols)[0]
+    lhs = eq.lhs - eq.rhs # 移项使得 rhs = 0
+    try:
+        poly = Poly(lhs, x)
+    except PolynomialError:
+        return None
+    # 系数中仍含变量 (例如 sin(x) 作为生成元) 时不是真正的多项式
+    if poly.free_symbols_in_domain or len(poly.gens) != 1:
+        return None
+    return PolynomialForm(x, lhs, poly)
+
+
+def numeric_roots(poly: Poly):
+    """
+    用 NumPy 计算伴随矩阵的特征值，得到全部数值根 (np.roots)
+    """
+    coeffs = [complex(c.evalf()) for c in poly.all_coeffs()]
+    values = np.roots(coeffs)
+    result = []
+    for value in values:
+        # 去掉数值误差产生的微小虚部
+        if abs(value.imag) < 1e-12 * max(1.0, abs(value.real)):
+            result.append(Float(value.real))
+        else:
+            result.append(Float(value.real) + Float(value.imag) * I)
+    # 实根在前，然后按实部、虚部排序
+    return sorted(result, key=lambda r: (not r.is_real, complex(r).real, complex(r).imag))
+
+
+def has_exact_real_roots(poly):
+    # real_roots (CRootOf) 只支持整数和有理数系数
+    return poly.domain.is_ZZ or poly.domain.is_QQ
+
+
+def _ordered(solutions):
+    # 实根按大小排在前面，复根在后
+    real = sorted((s for s in solutions if s.is_real), key=lambda s: s.evalf())
+    other = sorted((s for s in solutions if not s.is_real), key=default_sort_key)
+    return real + other
+
+
+def solve_polynomial(form: PolynomialForm, numeric=False):
+    """
+    求解多项式方程，返回去重后的解列表
+    """
+    poly = form.poly
+    if numeric:
+        return numeric_roots(poly)
+
+    degree = form.degree
+    if degree == 1:
+        a, b = poly.all_coeffs()
+        return [-b / a]
+    if degree == 2:
+        a, b, c = poly.all_coeffs()
+        delta = b**2 - 4*a*c
+        if delta == 0:
+            return [-b / (2*a)]
+        return _ordered([(-b - sqrt(delta)) / (2*a), (-b + sqrt(delta)) / (2*a)])
+
+    found = form.roots()
+    if sum(found.values()) == degree:
+        return _ordered(list(found.keys()))
+    if not has_exact_real_roots(poly):
+        # 系数含无理数 (域为 EX 等)：real_roots 不支持，solve 也可能漏根，全部取数值解
+        return numeric_roots(poly)
+    # roots 无法给出全部根式解：实根精确表示，复根取数值解
+    real = list(dict.fromkeys(poly.real_roots()))
+    return real + [r for r in numeric_roots(poly) if not r.is_real]
+
+
+def solve_equation(eq: Eq, form=None, numeric=False):
+    """
+    求解方程。form 为 polynomial_form 的结果 (已经计算过时直接传入，避免重复构造 Poly)
+    """
+    if form is None:
+        form = polynomial_form(eq)
+    if form is None or form.degree < 1:
+        return solve(eq)
+    return solve_polynomial(form, numeric=numeric)
+
+
+def generate_equation_steps(eq: Eq, form=None):
+    """
+    尝试生成方程求解步骤
+    """
+    steps = []
+    try:
+        if form is None:
+            form = polynomial_form(eq)
+        # 假设是单变量多项式方程
+        if form is not None:
+            lhs = form.lhs
+
+            steps.append(r"\text{移项整理得: } " + latex(lhs) + " = 0")
+
+            poly = form.poly
+            degree = form.degree
+
+            if degree == 1:
+                coeffs = poly.all_coeffs()
+                a, b = coeffs[0], coeffs[1]
+                steps.append(r"\text{这是一个线性方程 } ax + b = 0")
+                steps.append(r"\quad a = " + latex(a) + r", \quad b = " + latex(b))
+                steps.append(r"\text{解为: } x = -\frac{b}{a}")
+                steps.append(r"\quad \Rightarrow x = " + latex(-b/a))
+
+            elif degree == 2:
+                coeffs = poly.all_coeffs()
+                a, b, c = coeffs[0], coeffs[1], coeffs[2]
+                steps.append(r"\text{这是一个一元二次方程 } ax^2 + bx + c = 0")
+                steps.append(r"\quad a = " + latex(a) + r", \quad b = " + latex(b) + r", \quad c = " + latex(c))
+                steps.append(r"\text{应用求根公式: } x = \frac{-b \pm \sqrt{b^2 - 4ac}}{2a}")
+                delta = b**2 - 4*a*c
+                steps.append(r"\quad \Delta = b^2 - 4ac = " + latex(delta))
+                if delta >= 0:
+                    steps.append(r"\quad x_1 = \frac{" + latex(-b) + r" + \sqrt{" + latex(delta) + r"}}{" + latex(2*a) + r"}")
+                    steps.append(r"\quad x_2 = \frac{" + latex(-b) + r" - \sqrt{" + latex(delta) + r"}}{" + latex(2*a) + r"}")
+                else:
+                    steps.append(r"\text{判别式小于0，无实数解 (或为复数解)}")
+
+            elif degree > 2:
+                steps.append(r"\text{这是一个 } " + str(degree) + r" \text{ 次多项式方程，尝试因式分解或数值解法}")
+                found = form.roots()
+                if sum(found.values()) == degree:
+                    steps.append(r"\text{求得全部根式解}")
+                else:
+                    # 没有根式解：实根用 CRootOf 表示，并给出伴随矩阵特征值的数值近似
+                    approx = numeric_roots(poly)
+                    if has_exact_real_roots(poly):
+                        steps.append(r"\text{无法求得全部根式解，实根用 CRootOf 精确表示，复根取数值解}")
+                    else:
+                        steps.append(r"\text{无法求得全部根式解，系数含无理数，全部取数值解}")
+                    steps.append(r"\text{由伴随矩阵特征值得到数值近似:}")
+                    steps.append(r"\quad x \approx " + ", ".join(latex(r.evalf(6)) for r in approx))
+
+    except Exception as e:
+        logger.warning("Equation step error: %s", e)
+    return steps
@@ -0,0 +1,389 @@
+import logging
+from collections import defaultdict
+
+from sympy import latex, Integral, Derivative, Add, Pow, Dummy, Wild, Symbol, S, exp, log, sin, cos, tan, atan, sqrt, factorial, pi
+
+# 常见积分/求导题型的查表。
+# 大部分积分和求导请求是少数几种标准形式，只是常数不同 (∫x^n e^{ax}、∫sin^m(ax) cos(ax)、复合函数求导等)。
+# 每种形式是一个模板：Wild 模式 + 预先推导好的结果 + 预先写好的步骤。
+# 模板按模式的顶层运算 (Pow、Mul、sin、exp ...) 建立索引，只和顶层运算相同的模板做匹配，
+# 命中后代入匹配到的常数即可，不必运行 integral_steps / doit()。
+# 被积函数 (求导对象) 先提取与变量无关的常数因子，和式逐项查表，全部命中才算命中。
+
+logger = logging.getLogger(__name__)
+
+# 模板中的变量。输入表达式先把实际变量替换为它再匹配
+X = Dummy("x")
+
+_a = Wild("a", exclude=[X])
+_b = Wild("b", exclude=[X])
+_n = Wild("n", exclude=[X])
+_m = Wild("m", exclude=[X])
+_k = Wild("k", exclude=[X])
+
+
+def _nonzero(value):
+    return value.is_zero is False
+
+
+class Template:
+    """
+    一种标准形式：pattern 为 Wild 模式，result(常数) 给出原函数或导函数，
+    steps 为步骤模板，其中的 %(a)s 等占位符替换为匹配到的常数 (以及 x、f、F、u、du) 的 LaTeX
+    """
+
+    def __init__(self, name, pattern, result, steps, condition=None, extra=None, heads=None):
+        self.name = name
+        self.pattern = pattern
+        self.result = result
+        self.steps = tuple(steps)
+        self.condition = condition
+        self.extra = extra
+        self.heads = tuple(heads) if heads else (_head(pattern),)
+
+    def match(self, f):
+        found = f.match(self.pattern)
+        if found is None:
+            return None
+        constants = {wild.name: value for wild, value in found.items()}
+        if self.condition is not None and not self.condition(constants):
+            return None
+        return constants
+
+
+class FormMatch:
+    """
+    查表结果：命中的模板名、结果 (原函数或导函数) 和步骤
+    """
+
+    def __init__(self, names, result, steps):
+        self.names = names
+        self.result = result
+        self.steps = steps
+
+
+def _head(expr):
+    # 变量本身 (x = x^1) 和幂函数放在同一个索引下
+    if expr.is_Symbol:
+        return Symbol
+    return expr.func
+
+
+def _build_index(templates):
+    index = defaultdict(list)
+    for template in templates:
+        for head in template.heads:
+            index[head].append(template)
+    return index
+
+
+def _fill(template, constants, var, f, F):
+    values = {name: latex(value) for name, value in constants.items()}
+    if template.extra is not None:
+        values.update({name: latex(value.xreplace({X: var})) for name, value in template.extra(constants).items()})
+    values.update(x=latex(var), f=latex(f), F=latex(F))
+    return [step % values for step in template.steps]
+
+
+def _lookup_term(index, term, var, kind):
+    """
+    单项查表 (不含和式)。返回 (模板名, 结果, 步骤)，未命中时返回 None
+    """
+    coeff, f = term.as_independent(var, as_Add=False)
+    if f == 1:
+        # 常数项
+        if kind == "integral":
+            return "constant", coeff * var, [r"\text{常数积分: } \int " + latex(coeff) + r" \, d" + latex(var)
+                                             + " = " + latex(coeff * var)]
+        return "constant", S.Zero, [r"\text{常数的导数为 } 0: \frac{d}{d" + latex(var) + "} " + latex(coeff) + " = 0"]
+    g = f.xreplace({var: X})
+    for template in index.get(_head(g), ()):
+        try:
+            constants = template.match(g)
+            if constants is None:
+                continue
+            result = template.result(constants).xreplace({X: var})
+        except Exception as e:
+            logger.debug("Template %s failed on %s: %s", template.name, f, e)
+            continue
+        steps = _fill(template, constants, var, f, result)
+        if coeff != 1:
+            if kind == "integral":
+                head = r"\text{提取常数: } \int " + latex(coeff) + r" \cdot f(x) dx = " + latex(coeff) + r" \int f(x) dx"
+            else:
+                head = r"\text{提取常数: } \frac{d}{dx}(" + latex(coeff) + r" \cdot f(x)) = " + latex(coeff) + r" \cdot f'(x)"
+            steps = [head] + [r"\quad " + step for step in steps]
+        return template.name, coeff * result, steps
+    return None
+
+
+def _lookup(index, expr, var, kind):
+    terms = Add.make_args(expr.expand(deep=False)) if isinstance(expr, Add) else (expr,)
+    found = []
+    for term in terms:
+        hit = _lookup_term(index, term, var, kind)
+        if hit is None:
+            return None
+        found.append(hit)
+    if len(found) == 1:
+        name, result, steps = found[0]
+        return FormMatch([name], result, steps)
+
+    steps = [r"\text{利用线性性质拆分，逐项查表:}"]
+    for _, _, term_steps in found:
+        steps.extend(r"\quad " + step for step in term_steps)
+    return FormMatch([name for name, _, _ in found], Add(*(result for _, result, _ in found)), steps)
+
+
+# --- 积分模板 ---
+
+def _tabular(c, antiderivative):
+    """
+    表格法 (反复分部积分): \int x^n g dx = \sum_k (-1)^k (x^n)^{(k)} G_{k+1}，G_j 为 g 的 j 次原函数
+    """
+    n = int(c["n"])
+    return Add(*(
+        (-1)**k * factorial(n) / factorial(n - k) * X**(n - k) * antiderivative(c["a"], k + 1)
+        for k in range(n + 1)
+    ))
+
+
+def _positive_integer_power(c):
+    return c["n"].is_Integer and c["n"] > 0 and _nonzero(c["a"])
+
+
+def _chain_power(c):
+    # x^n 恰好是 x^{n+1} 的导数 (相差常数倍)
+    return (c["m"] - c["n"] - 1).is_zero is True and _nonzero(c["a"])
+
+
+_INTEGRAL_RESULT = r"\quad \Rightarrow \int %(f)s \, d%(x)s = %(F)s + C"
+
+INTEGRAL_TEMPLATES = [
+    Template(
+        "power", X**_n,
+        lambda c: X**(c["n"] + 1) / (c["n"] + 1),
+        [r"\text{查表 (幂函数): } \int x^n dx = \frac{x^{n+1}}{n+1} \ (n \neq -1)",
+         r"\quad n = %(n)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["n"] + 1),
+        heads=(Symbol, Pow),
+    ),
+    Template(
+        "power_linear", (_a * X + _b)**_n,
+        lambda c: (c["a"] * X + c["b"])**(c["n"] + 1) / (c["a"] * (c["n"] + 1)),
+        [r"\text{查表 (线性函数的幂): } \int (ax+b)^n dx = \frac{(ax+b)^{n+1}}{a(n+1)} \ (n \neq -1)",
+         r"\quad a = %(a)s, \quad b = %(b)s, \quad n = %(n)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["n"] + 1) and _nonzero(c["a"]),
+    ),
+    Template(
+        "reciprocal_linear", 1 / (_a * X + _b),
+        lambda c: log(c["a"] * X + c["b"]) / c["a"],
+        [r"\text{查表 (倒数): } \int \frac{1}{ax+b} dx = \frac{1}{a} \ln|ax+b|",
+         r"\quad a = %(a)s, \quad b = %(b)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["a"]),
+    ),
+    Template(
+        "arctan", 1 / (X**2 + _b),
+        lambda c: atan(X / sqrt(c["b"])) / sqrt(c["b"]),
+        [r"\text{查表 (反正切): } \int \frac{1}{x^2+b} dx = \frac{1}{\sqrt{b}} \arctan\frac{x}{\sqrt{b}} \ (b > 0)",
+         r"\quad b = %(b)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: c["b"].is_positive is True,
+    ),
+    Template(
+        "sin_squared", sin(_a * X)**2,
+        lambda c: X / 2 - sin(2 * c["a"] * X) / (4 * c["a"]),
+        [r"\text{查表 (降幂公式): } \sin^2(ax) = \frac{1 - \cos(2ax)}{2}",
+         r"\quad \int \sin^2(ax) dx = \frac{x}{2} - \frac{\sin(2ax)}{4a}, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["a"]),
+    ),
+    Template(
+        "cos_squared", cos(_a * X)**2,
+        lambda c: X / 2 + sin(2 * c["a"] * X) / (4 * c["a"]),
+        [r"\text{查表 (降幂公式): } \cos^2(ax) = \frac{1 + \cos(2ax)}{2}",
+         r"\quad \int \cos^2(ax) dx = \frac{x}{2} + \frac{\sin(2ax)}{4a}, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["a"]),
+    ),
+    Template(
+        "exp_linear", exp(_a * X + _b),
+        lambda c: exp(c["a"] * X + c["b"]) / c["a"],
+        [r"\text{查表 (指数函数): } \int e^{ax+b} dx = \frac{1}{a} e^{ax+b}",
+         r"\quad a = %(a)s, \quad b = %(b)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["a"]),
+    ),
+    Template(
+        "sin_linear", sin(_a * X + _b),
+        lambda c: -cos(c["a"] * X + c["b"]) / c["a"],
+        [r"\text{查表 (三角函数): } \int \sin(ax+b) dx = -\frac{1}{a} \cos(ax+b)",
+         r"\quad a = %(a)s, \quad b = %(b)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["a"]),
+    ),
+    Template(
+        "cos_linear", cos(_a * X + _b),
+        lambda c: sin(c["a"] * X + c["b"]) / c["a"],
+        [r"\text{查表 (三角函数): } \int \cos(ax+b) dx = \frac{1}{a} \sin(ax+b)",
+         r"\quad a = %(a)s, \quad b = %(b)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["a"]),
+    ),
+    Template(
+        "log", log(X),
+        lambda c: X * log(X) - X,
+        [r"\text{查表 (对数函数，由分部积分得到): } \int \ln x \, dx = x \ln x - x",
+         _INTEGRAL_RESULT],
+    ),
+    Template(
+        "poly_exp", X**_n * exp(_a * X),
+        lambda c: exp(c["a"] * X) * _tabular(c, lambda a, j: 1 / a**j),
+        [r"\text{查表 (反复分部积分，表格法): } \int x^n e^{ax} dx = e^{ax} \sum_{k=0}^{n} (-1)^k \frac{n!}{(n-k)!} \frac{x^{n-k}}{a^{k+1}}",
+         r"\quad n = %(n)s, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=_positive_integer_power,
+    ),
+    Template(
+        "poly_sin", X**_n * sin(_a * X),
+        # sin(ax) 的 j 次原函数为 \sin(ax - j\pi/2) / a^j
+        lambda c: _tabular(c, lambda a, j: sin(a * X - j * pi / 2) / a**j),
+        [r"\text{查表 (反复分部积分，表格法): } \int x^n \sin(ax) dx = \sum_{k=0}^{n} (-1)^k \frac{n!}{(n-k)!} x^{n-k} \frac{\sin(ax - \frac{(k+1)\pi}{2})}{a^{k+1}}",
+         r"\quad n = %(n)s, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=_positive_integer_power,
+    ),
+    Template(
+        "poly_cos", X**_n * cos(_a * X),
+        lambda c: _tabular(c, lambda a, j: cos(a * X - j * pi / 2) / a**j),
+        [r"\text{查表 (反复分部积分，表格法): } \int x^n \cos(ax) dx = \sum_{k=0}^{n} (-1)^k \frac{n!}{(n-k)!} x^{n-k} \frac{\cos(ax - \frac{(k+1)\pi}{2})}{a^{k+1}}",
+         r"\quad n = %(n)s, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=_positive_integer_power,
+    ),
+    Template(
+        "poly_exp_chain", X**_n * exp(_a * X**_m),
+        lambda c: exp(c["a"] * X**c["m"]) / (c["a"] * c["m"]),
+        [r"\text{查表 (换元 } u = a x^{n+1} \text{): } \int x^n e^{a x^{n+1}} dx = \frac{e^{a x^{n+1}}}{a(n+1)}",
+         r"\quad n = %(n)s, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=_chain_power,
+    ),
+    Template(
+        "poly_sin_chain", X**_n * sin(_a * X**_m),
+        lambda c: -cos(c["a"] * X**c["m"]) / (c["a"] * c["m"]),
+        [r"\text{查表 (换元 } u = a x^{n+1} \text{): } \int x^n \sin(a x^{n+1}) dx = -\frac{\cos(a x^{n+1})}{a(n+1)}",
+         r"\quad n = %(n)s, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=_chain_power,
+    ),
+    Template(
+        "poly_cos_chain", X**_n * cos(_a * X**_m),
+        lambda c: sin(c["a"] * X**c["m"]) / (c["a"] * c["m"]),
+        [r"\text{查表 (换元 } u = a x^{n+1} \text{): } \int x^n \cos(a x^{n+1}) dx = \frac{\sin(a x^{n+1})}{a(n+1)}",
+         r"\quad n = %(n)s, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=_chain_power,
+    ),
+    Template(
+        "sin_power_cos", sin(_a * X)**_m * cos(_a * X),
+        lambda c: sin(c["a"] * X)**(c["m"] + 1) / (c["a"] * (c["m"] + 1)),
+        [r"\text{查表 (换元 } u = \sin(ax) \text{): } \int \sin^m(ax) \cos(ax) dx = \frac{\sin^{m+1}(ax)}{a(m+1)}",
+         r"\quad m = %(m)s, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["m"] + 1) and _nonzero(c["a"]),
+    ),
+    Template(
+        "cos_power_sin", cos(_a * X)**_m * sin(_a * X),
+        lambda c: -cos(c["a"] * X)**(c["m"] + 1) / (c["a"] * (c["m"] + 1)),
+        [r"\text{查表 (换元 } u = \cos(ax) \text{): } \int \cos^m(ax) \sin(ax) dx = -\frac{\cos^{m+1}(ax)}{a(m+1)}",
+         r"\quad m = %(m)s, \quad a = %(a)s",
+         _INTEGRAL_RESULT],
+        condition=lambda c: _nonzero(c["m"] + 1) and _nonzero(c["a"]),
+    ),
+]
+
+
+# --- 求导模板 ---
+# 复合函数 F(u)，内层 u = a x^n + b (包括 u = x)，结果为 F'(u) \cdot u'
+
+def _inner(c):
+    return c["a"] * X**c["n"] + c["b"]
+
+
+def _inner_diff(c):
+    return c["a"] * c["n"] * X**(c["n"] - 1)
+
+
+def _chain_values(c):
+    return {"u": _inner(c), "du": _inner_diff(c)}
+
+
+def _chain(name, outer, derivative, formula):
+    return Template(
+        name, outer(_a * X**_n + _b),
+        lambda c: derivative(_inner(c)) * _inner_diff(c),
+        [r"\text{查表 (链式法则): } " + formula,
+         r"\quad u = %(u)s, \quad u' = %(du)s",
+         r"\quad \Rightarrow \frac{d}{d%(x)s} %(f)s = %(F)s"],
+        condition=lambda c: _nonzero(c["a"]) and _nonzero(c["n"]),
+        extra=_chain_values,
+    )
+
+
+DERIVATIVE_TEMPLATES = [
+    Template(
+        "power", X**_n,
+        lambda c: c["n"] * X**(c["n"] - 1),
+        [r"\text{查表 (幂法则): } \frac{d}{dx} x^n = n x^{n-1}",
+         r"\quad n = %(n)s",
+         r"\quad \Rightarrow \frac{d}{d%(x)s} %(f)s = %(F)s"],
+        heads=(Symbol, Pow),
+    ),
+    Template(
+        "power_chain", (_a * X**_n + _b)**_k,
+        lambda c: c["k"] * _inner(c)**(c["k"] - 1) * _inner_diff(c),
+        [r"\text{查表 (幂法则 + 链式法则): } \frac{d}{dx} u^k = k u^{k-1} \cdot u'",
+         r"\quad u = %(u)s, \quad u' = %(du)s, \quad k = %(k)s",
+         r"\quad \Rightarrow \frac{d}{d%(x)s} %(f)s = %(F)s"],
+        condition=lambda c: _nonzero(c["a"]) and _nonzero(c["n"]),
+        extra=_chain_values,
+    ),
+    _chain("sin_chain", sin, cos, r"\frac{d}{dx} \sin u = \cos u \cdot u'"),
+    _chain("cos_chain", cos, lambda u: -sin(u), r"\frac{d}{dx} \cos u = -\sin u \cdot u'"),
+    _chain("tan_chain", tan, lambda u: tan(u)**2 + 1, r"\frac{d}{dx} \tan u = (1 + \tan^2 u) \cdot u'"),
+    _chain("exp_chain", exp, exp, r"\frac{d}{dx} e^u = e^u \cdot u'"),
+    _chain("log_chain", log, lambda u: 1 / u, r"\frac{d}{dx} \ln u = \frac{u'}{u}"),
+]
+
+_integral_index = _build_index(INTEGRAL_TEMPLATES)
+_derivative_index = _build_index(DERIVATIVE_TEMPLATES)
+
+
+def lookup_integral(expr: Integral):
+    """
+    单变量积分查表，返回 FormMatch (result 为原函数，不含上下限)；未命中时返回 None
+    """
+    if not isinstance(expr, Integral) or len(expr.limits) != 1:
+        return None
+    try:
+        return _lookup(_integral_index, expr.function, expr.limits[0][0], "integral")
+    except Exception as e:
+        logger.warning("Integral lookup error: %s", e)
+        return None
+
+
+def lookup_derivative(expr: Derivative):
+    """
+    单变量一阶导数查表，返回 FormMatch (result 为导函数)；未命中时返回 None
+    """
+    if not isinstance(expr, Derivative) or len(expr.variable_count) != 1 or expr.variable_count[0][1] != 1:
+        return None
+    try:
+        return _lookup(_derivative_index, expr.expr, expr.variables[0], "derivative")
+    except Exception as e:
+        logger.warning("Derivative lookup error: %s", e)
+        return None
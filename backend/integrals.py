@@ -0,0 +1,228 @@
+import logging
+from collections import OrderedDict
+
+from sympy import latex, Integral, Interval, S
+from sympy.calculus.singularities import singularities
+from sympy.integrals.manualintegrate import (
+    integral_steps, 
+    PartsRule, 
+    URule, 
+    PowerRule, 
+    AddRule, 
+    ConstantRule, 
+    TrigRule,
+    ReciprocalRule,
+    ConstantTimesRule,
+    AlternativeRule,
+    ExpRule,
+    RewriteRule,
+    DontKnowRule
+)
+
+# 积分：规则树 (integral_steps) 同时用于生成步骤和计算原函数。
+# 规则树完整 (不含 DontKnowRule) 时，原函数直接由 rule.eval() 得到，
+# 不再调用 doit() 走 risch/meijerg 重新积分一遍。
+
+logger = logging.getLogger(__name__)
+
+
+def integral_rule(expr: Integral):
+    """
+    计算被积函数的规则树，失败时返回 None
+    """
+    try:
+        var = expr.variables[0]
+        integrand = expr.function
+        return integral_steps(integrand, var)
+    except Exception as e:
+        logger.warning("Integral rule error: %s", e)
+        return None
+
+
+# 已渲染子树的缓存：键为 (规则类型, 被积函数, 积分变量)。
+# integral_steps 对相同的 (被积函数, 变量) 总是生成相同的子树，
+# 因此这个键可以识别 AlternativeRule/AddRule 中重复出现的子树，也可以跨请求复用。
+# 缓存的是相对深度的行，输出时再加上实际缩进。
+RENDER_CACHE_SIZE = 2048
+_render_cache = OrderedDict()
+
+
+def _rule_key(r):
+    integrand = getattr(r, "integrand", None)
+    variable = getattr(r, "variable", None)
+    if integrand is None or variable is None:
+        return None
+    return (type(r).__name__, integrand, variable)
+
+
+def _remember(key, lines):
+    _render_cache[key] = lines
+    if len(_render_cache) > RENDER_CACHE_SIZE:
+        _render_cache.popitem(last=False)
+
+
+def _render_node(r):
+    """
+    渲染单个规则节点，返回 (本节点的行, 需要继续展开的子规则)。
+    行和子规则都带相对深度。
+    """
+    lines = []
+    children = []
+
+    if isinstance(r, PartsRule):
+        u = r.u
+        dv = r.dv
+        var = r.variable
+        du = u.diff(var)
+        # v 直接由规则自己的子步骤得到，不再重新积分 dv
+        v = r.v_step.eval()
+
+        lines.append((0, r"\text{应用分部积分法: } \int u dv = uv - \int v du"))
+        lines.append((0, r"\quad u = " + latex(u) + r", \quad dv = " + latex(dv)))
+        lines.append((0, r"\quad du = " + latex(du) + r", \quad v = " + latex(v)))
+        lines.append((0, r"\quad \Rightarrow " + latex(u * v) + r" - \int " + latex(v * du)))
+        if r.second_step:
+            children.append((r.second_step, 1))
+
+    elif isinstance(r, URule):
+        lines.append((0, r"\text{应用换元法: } u = " + latex(r.u_func)))
+        if r.substep:
+            children.append((r.substep, 1))
+
+    elif isinstance(r, AlternativeRule):
+        # AlternativeRule 包含多种可能的积分路径，我们只展示第一种有效路径，其余分支不会被渲染
+        if r.alternatives:
+            children.append((r.alternatives[0], 0))
+
+    elif isinstance(r, RewriteRule):
+        lines.append((0, r"\text{重写被积函数: } \int " + latex(r.rewritten) + r" dx"))
+        if r.substep:
+            children.append((r.substep, 1))
+
+    elif isinstance(r, DontKnowRule):
+        lines.append((0, r"\text{无法找到进一步的积分步骤}"))
+
+    elif isinstance(r, AddRule):
+        lines.append((0, r"\text{利用线性性质拆分:}"))
+        children.extend((sub, 1) for sub in r.substeps)
+
+    elif isinstance(r, ConstantTimesRule):
+        lines.append((0, r"\text{提取常数: } \int c \cdot f(x) dx = c \cdot \int f(x) dx"))
+        lines.append((0, r"\quad \text{常数: } " + latex(r.constant)))
+        if r.substep:
+            children.append((r.substep, 1))
+
+    elif isinstance(r, PowerRule):
+        lines.append((0, r"\text{应用幂法则: } \int x^n dx = \frac{x^{n+1}}{n+1}"))
+
+    elif isinstance(r, ReciprocalRule):
+        lines.append((0, r"\text{应用倒数法则: } \int \frac{1}{x} dx = \ln|x|"))
+
+    elif isinstance(r, ExpRule):
+        lines.append((0, r"\text{应用指数法则: } \int e^x dx = e^x"))
+
+    elif isinstance(r, TrigRule):
+        lines.append((0, r"\text{应用三角函数积分公式}"))
+
+    elif isinstance(r, ConstantRule):
+        lines.append((0, r"\text{常数积分: } \int c dx = cx"))
+
+    return lines, children
+
+
+def render_rule(rule):
+    """
+    用显式栈 (而不是递归) 按先序遍历规则树，返回带缩进的步骤列表。
+    每个子树渲染完成后缓存，重复的子树直接复用。
+    """
+    out = []  # (深度, 内容)
+    stack = [("enter", rule, 0)]
+    while stack:
+        item = stack.pop()
+        if item[0] == "exit":
+            # 子树的所有行都已输出，记入缓存
+            _, key, depth, start = item
+            _remember(key, [(d - depth, text) for d, text in out[start:]])
+            continue
+
+        _, r, depth = item
+        key = _rule_key(r)
+        cached = _render_cache.get(key) if key is not None else None
+        if cached is not None:
+            _render_cache.move_to_end(key)
+            out.extend((depth + d, text) for d, text in cached)
+            continue
+
+        lines, children = _render_node(r)
+        start = len(out)
+        out.extend((depth + d, text) for d, text in lines)
+        if key is not None:
+            stack.append(("exit", key, depth, start))
+        for child, d in reversed(children):
+            stack.append(("enter", child, depth + d))
+
+    return [r"\quad " * depth + text for depth, text in out]
+
+
+def generate_integral_steps(expr: Integral, rule=None):
+    """
+    尝试生成积分步骤
+    """
+    steps = []
+    try:
+        if rule is None:
+            rule = integral_rule(expr)
+        if rule is None:
+            return steps
+        steps.extend(render_rule(rule))
+    except Exception as e:
+        logger.warning("Step generation error: %s", e)
+        # steps.append(r"\text{无法生成详细步骤}")
+    return steps
+
+
+def _continuous_on(integrand, var, a, b):
+    # 被积函数在 [a, b] 上没有奇点时才能直接用牛顿-莱布尼茨公式；无法判断时视为不连续
+    try:
+        lower, upper = (a, b) if bool(a <= b) else (b, a)
+        return singularities(integrand, var).intersect(Interval(lower, upper)) is S.EmptySet
+    except Exception:
+        return False
+
+
+def evaluate_integral(expr: Integral, rule):
+    """
+    由规则树计算积分结果。规则树不完整或无法安全代入上下限时返回 None，调用方回退到 doit()
+    """
+    if rule is None or len(expr.limits) != 1:
+        return None
+    try:
+        if rule.contains_dont_know():
+            return None
+        antiderivative = rule.eval()
+    except Exception as e:
+        logger.warning("Rule evaluation error: %s", e)
+        return None
+    return apply_limits(expr, antiderivative)
+
+
+def apply_limits(expr: Integral, antiderivative):
+    """
+    由原函数得到积分结果：不定积分直接返回原函数，定积分计算 F(b) - F(a)。
+    无法安全代入上下限时返回 None
+    """
+    if len(expr.limits) != 1:
+        return None
+    limit = expr.limits[0]
+    if len(limit) == 1:
+        # 不定积分
+        return antiderivative
+
+    # 定积分：F(b) - F(a)
+    var, a, b = limit
+    if not (a.is_finite and b.is_finite) or not _continuous_on(expr.function, var, a, b):
+        return None
+    result = antiderivative.subs(var, b) - antiderivative.subs(var, a)
+    if result.has(S.NaN, S.ComplexInfinity, S.Infinity, S.NegativeInfinity):
+        return None
+    return result
@@ -0,0 +1,298 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+
+from encoding import dumps
+from store import data_path
+
+# 异步任务队列。
+# 耗时的题目 (困难的积分、大结果的 simplify) 不必占着一个 HTTP 连接等待：
+# POST /jobs 立即返回任务 ID，客户端之后轮询状态、取回结果。
+# 任务状态和结果保存在 SQLite 中 (设置了数据目录时写入磁盘，见 store.data_path)，服务或工作进程重启后仍然可以查询；
+# 重启时尚未完成的任务 (queued/running) 重新入队。
+# 内存中是一个有界的优先级队列，由固定数目的协程取出任务，交给进程池计算。
+# 相同的题目 (相同的请求键) 在排队或计算期间再次提交时，直接返回已有任务的 ID，共享一次计算。
+
+DEFAULT_JOBS_PATH = "feng_math_jobs.sqlite3"
+DEFAULT_QUEUE_SIZE = 1000
+# 已完成任务的保留时间 (秒)
+DEFAULT_JOB_TTL = 24 * 3600
+# 清理过期任务的最小间隔 (秒)
+PURGE_INTERVAL = 60.0
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """
+    队列已满，客户端应稍后重试
+    """
+
+
+class JobStore:
+    """
+    SQLite 中的任务表。只在主进程的事件循环中访问，每次操作都很快，不另开线程
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                latex TEXT NOT NULL,
+                params TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                status_code INTEGER,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished)")
+        self._db.commit()
+
+    def create(self, key, latex, params, priority):
+        job_id = uuid.uuid4().hex
+        self._db.execute(
+            "INSERT INTO jobs (id, key, latex, params, priority, status, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, key, latex, json.dumps(params), priority, QUEUED, time.time()),
+        )
+        self._db.commit()
+        return job_id
+
+    def get(self, job_id):
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def in_flight(self, key):
+        """
+        同一请求键的排队中或计算中的任务
+        """
+        row = self._db.execute(
+            "SELECT * FROM jobs WHERE key = ? AND status IN (?, ?) ORDER BY created LIMIT 1",
+            (key, QUEUED, RUNNING),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def unfinished(self):
+        """
+        上次退出时尚未完成的任务，按优先级和提交顺序排列
+        """
+        rows = self._db.execute(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY priority DESC, created",
+            (QUEUED, RUNNING),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_priority(self, job_id, priority):
+        self._db.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, job_id))
+        self._db.commit()
+
+    def mark_running(self, job_id):
+        self._db.execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+        self._db.commit()
+
+    def mark_queued(self, job_id):
+        self._db.execute("UPDATE jobs SET status = ?, started = NULL WHERE id = ?", (QUEUED, job_id))
+        self._db.commit()
+
+    def finish(self, job_id, result):
+        self._db.execute(
+            "UPDATE jobs SET status = ?, result = ?, finished = ? WHERE id = ?",
+            (DONE, dumps(result).decode("utf-8"), time.time(), job_id),
+        )
+        self._db.commit()
+
+    def fail(self, job_id, status_code, detail):
+        self._db.execute(
+            "UPDATE jobs SET status = ?, status_code = ?, error = ?, finished = ? WHERE id = ?",
+            (ERROR, status_code, detail, time.time(), job_id),
+        )
+        self._db.commit()
+
+    def purge(self, ttl):
+        """
+        删除完成时间早于 ttl 秒之前的任务，返回删除的数目
+        """
+        cursor = self._db.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (time.time() - ttl,))
+        self._db.commit()
+        return cursor.rowcount
+
+    def ahead_of(self, job):
+        """
+        排在该任务前面的排队任务数：优先级更高，或优先级相同但提交更早
+        """
+        row = self._db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority > ? OR (priority = ? AND created < ?))",
+            (QUEUED, job["priority"], job["priority"], job["created"]),
+        ).fetchone()
+        return row[0]
+
+    def close(self):
+        self._db.close()
+
+
+class JobQueue:
+    """
+    有界优先级队列 + 固定数目的消费协程。
+    run(latex, params) 是实际求解的协程函数，error_response(e) 把异常转换为 (状态码, 错误信息)
+    """
+
+    def __init__(self, store, run, error_response, workers=1, maxsize=DEFAULT_QUEUE_SIZE, ttl=DEFAULT_JOB_TTL):
+        self.store = store
+        self.run = run
+        self.error_response = error_response
+        self.workers = workers
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._queue = None
+        # 排队中的任务 ID。提高优先级会在队列中留下旧的队列项，队列长度不能作为排队数
+        self._queued = set()
+        self._tasks = []
+        self._order = itertools.count()
+        self._last_purge = 0.0
+
+    def start(self):
+        """
+        启动消费协程，并把上次未完成的任务重新入队 (在事件循环中调用)
+        """
+        self._queue = asyncio.PriorityQueue()
+        recovered = self.store.unfinished()
+        for job in recovered:
+            if job["status"] == RUNNING:
+                self.store.mark_queued(job["id"])
+            self._push(job["id"], job["priority"])
+        if recovered:
+            logger.info("Re-queued %d unfinished jobs", len(recovered))
+        self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def depth(self):
+        """
+        排队中的任务数 (不含提高优先级后留下的旧队列项)
+        """
+        return len(self._queued)
+
+    def _push(self, job_id, priority):
+        # 优先级高的先出队，同一优先级按提交顺序
+        self._queue.put_nowait((-priority, next(self._order), job_id))
+        self._queued.add(job_id)
+
+    def submit(self, key, latex, params, priority=0):
+        """
+        提交任务，返回 (任务, 是否与已有任务合并)。队列已满时抛出 QueueFull
+        """
+        self._maybe_purge()
+        existing = self.store.in_flight(key)
+        if existing is not None:
+            if existing["status"] == QUEUED and priority > existing["priority"]:
+                # 更高优先级的重复提交把已有任务提前；旧的队列项出队时会被跳过
+                self.store.set_priority(existing["id"], priority)
+                self._push(existing["id"], priority)
+                existing["priority"] = priority
+            return existing, True
+
+        if self.depth() >= self.maxsize:
+            raise QueueFull(f"Job queue is full ({self.maxsize} jobs)")
+        job_id = self.store.create(key, latex, params, priority)
+        self._push(job_id, priority)
+        return self.store.get(job_id), False
+
+    async def _consume(self):
+        while True:
+            neg_priority, _, job_id = await self._queue.get()
+            try:
+                job = self.store.get(job_id)
+                # 任务已被处理，或者这是提高优先级之前留下的旧队列项
+                if job is None or job["status"] != QUEUED:
+                    self._queued.discard(job_id)
+                    continue
+                if job["priority"] != -neg_priority:
+                    continue
+                self._queued.discard(job_id)
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job):
+        self.store.mark_running(job["id"])
+        try:
+            result = await self.run(job["latex"], json.loads(job["params"]))
+        except asyncio.CancelledError:
+            # 服务退出：保持 running 状态，下次启动时重新入队
+            raise
+        except Exception as e:
+            status_code, detail = self.error_response(e)
+            self.store.fail(job["id"], status_code, detail)
+            logger.info("Job %s failed: %s", job["id"], detail)
+            return
+        self.store.finish(job["id"], result)
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        removed = self.store.purge(self.ttl)
+        if removed:
+            logger.info("Purged %d expired jobs", removed)
+
+
+def job_view(job, store=None):
+    """
+    任务状态的对外表示 (不含结果)
+    """
+    view = {
+        "id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"],
+    }
+    if job["status"] == QUEUED and store is not None:
+        view["position"] = store.ahead_of(job)
+    if job["status"] == ERROR:
+        view["error"] = job["error"]
+        view["status_code"] = job["status_code"]
+    return view
+
+
+def store_from_env():
+    """
+    打开任务数据库：FENG_MATH_JOBS_PATH 为路径，未设置时放在 FENG_MATH_DATA_DIR 下，
+    两者都未设置或为 ":memory:" 时不持久化
+    """
+    return JobStore(data_path("FENG_MATH_JOBS_PATH", DEFAULT_JOBS_PATH))
+
+
+def queue_size_from_env():
+    try:
+        return int(os.environ.get("FENG_MATH_JOBS_MAX", DEFAULT_QUEUE_SIZE))
+    except ValueError:
+        return DEFAULT_QUEUE_SIZE
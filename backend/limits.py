@@ -0,0 +1,634 @@
+import logging
+from functools import lru_cache
+
+from sympy import (
+    Basic, Limit, Integral, Derivative, Sum, Add, Mul, Pow, Order, Dummy, Symbol, Integer, S, AccumBounds,
+    latex, sympify, cancel, together, fraction, expand, degree, Poly, limit,
+    sin, cos, tan, cot, sec, csc, exp, log, asin, acos, atan, acot, sinh, cosh, tanh, coth, asinh, acosh, atanh, Abs,
+)
+
+# 极限与泰勒展开。
+# 极限不直接交给 limit() (Gruntz 算法，内部层层嵌套地求子表达式的极限和级数，很慢)，
+# 而是依次尝试几种便宜的方法，哪一种先得到结果就用哪一种，同时生成步骤：
+# 1. 代入：按极限的四则运算和初等函数的连续性逐层代入 (包括 x → ∞ 时的 e^x → ∞、1/x → 0 等)
+# 2. 有理函数：约去公因式后代入，x → ∞ 时比较分子分母的次数
+# 3. 泰勒展开 (等价无穷小)：分子分母在极限点展开，比较首项
+# 4. 主部：as_leading_term 求首项 (可以处理 x → ∞ 和更一般的函数)
+# 5. 洛必达法则：0/0 或 ∞/∞ 型时分子分母分别求导
+# 都不适用时才回退到 limit()。
+# 泰勒展开 (\operatorname{series}_{x=a}^{n} f) 用常见初等函数的标准展开式复合、相乘得到，
+# 标准展开式按 (函数, 阶数) 缓存；不能这样展开的函数回退到 SymPy 的 series()，结果同样缓存。
+
+# 未写阶数时的展开阶数：展开到 O((x-a)^6)，与 SymPy 的 series() 一致
+DEFAULT_SERIES_ORDER = 6
+# 求极限时依次尝试的展开阶数
+EXPANSION_ORDERS = (4, 8)
+# 洛必达法则最多连续使用的次数
+MAX_LHOPITAL = 3
+
+# 在定义域内连续的初等函数：可以逐层代入
+CONTINUOUS = {
+    sin, cos, tan, cot, sec, csc, exp, log,
+    asin, acos, atan, acot, sinh, cosh, tanh, coth, asinh, acosh, atanh, Abs,
+}
+
+# 有标准展开式的函数 (在 0 处展开)；log 和幂函数分别按 ln(1+u)、(1+u)^a 展开
+SERIES_FUNCTIONS = {sin, cos, tan, exp, atan, asin, sinh, cosh, tanh, atanh, asinh}
+
+SIDES = {"+": "右", "-": "左"}
+
+_U = Dummy("u")
+# 步骤中展示标准展开式用的变量
+_DISPLAY_U = Symbol("u")
+
+# 含这些未计算运算的极限先对内层运算求值
+UNEVALUATED = (Integral, Derivative, Sum)
+
+logger = logging.getLogger(__name__)
+
+
+class TaylorSeries(Basic):
+    """
+    未计算的泰勒展开：expr 在 variable = point 处展开到 O((variable - point)^order)
+    """
+
+    def __new__(cls, expr, variable, point=S.Zero, order=DEFAULT_SERIES_ORDER):
+        expr, variable, point = sympify(expr), sympify(variable), sympify(point)
+        order = Integer(order)
+        if not variable.is_Symbol:
+            raise ValueError(f"Series variable must be a symbol, got {variable}")
+        if order < 1:
+            raise ValueError(f"Series order must be positive, got {order}")
+        return Basic.__new__(cls, expr, variable, point, order)
+
+    @property
+    def function(self):
+        return self.args[0]
+
+    @property
+    def variable(self):
+        return self.args[1]
+
+    @property
+    def point(self):
+        return self.args[2]
+
+    @property
+    def order(self):
+        return int(self.args[3])
+
+    def doit(self, **hints):
+        return expand_series(self).result
+
+    def _latex(self, printer):
+        return (r"\operatorname{series}_{" + printer._print(self.variable) + " = " + printer._print(self.point)
+                + "}^{" + str(self.order) + r"} \left(" + printer._print(self.function) + r"\right)")
+
+
+class LimitResult:
+    """
+    极限或展开的结果：result 为 None 表示极限不存在；method 是得到结果的方法 (步骤之外，记录在日志中)
+    """
+
+    def __init__(self, result, steps, method, result_latex=None):
+        self.result = result
+        self.steps = steps
+        self.method = method
+        self._latex = result_latex
+
+    @property
+    def latex(self):
+        if self._latex is not None:
+            return self._latex
+        return r"\text{不存在}" if self.result is None else latex(self.result)
+
+
+# --- 标准展开式 ---
+
+def _standard(key):
+    if key == "log1p":
+        return log(1 + _U)
+    if isinstance(key, tuple):
+        return (1 + _U) ** key[1]
+    return key(_U)
+
+
+@lru_cache(maxsize=512)
+def elementary_series(key, order):
+    """
+    标准展开式的系数 (u^0, ..., u^{order-1})，按 (函数, 阶数) 缓存。
+    key 为 SERIES_FUNCTIONS 中的函数、"log1p" (ln(1+u)) 或 ("pow", a) ((1+u)^a)
+    """
+    polynomial = _standard(key).series(_U, 0, order).removeO()
+    return tuple(polynomial.coeff(_U, k) for k in range(order))
+
+
+def preload_expansions():
+    """
+    预先计算求极限和默认阶数展开时最常用的标准展开式 (启动预热时调用，fork 出的工作进程继承缓存)
+    """
+    for order in sorted({*EXPANSION_ORDERS, DEFAULT_SERIES_ORDER}):
+        for key in (*SERIES_FUNCTIONS, "log1p", ("pow", S.Half), ("pow", S.NegativeOne)):
+            elementary_series(key, order)
+
+
+@lru_cache(maxsize=512)
+def _formula(key, order):
+    # 标准展开式的 LaTeX，例如 \sin u = u - \frac{u^3}{6} + O(u^5)
+    u = _DISPLAY_U
+    coefficients = elementary_series(key, order)
+    polynomial = Add(*(c * u**k for k, c in enumerate(coefficients)))
+    return latex(_standard(key).subs(_U, u)) + " = " + latex(polynomial + Order(u**order, u))
+
+
+@lru_cache(maxsize=1024)
+def _sympy_series(f, x, a, n):
+    # 不能用标准展开式复合的函数交给 series()，结果同样缓存
+    return f.series(x, a, n)
+
+
+class _Expansion:
+    """
+    在 x = a 处展开到 O(s^n) (s = x - a)。展开式是系数列表 [c_0, ..., c_{n-1}]；
+    记录用到的标准展开式 (步骤中展示)。遇到不能展开的函数或极点时返回 None
+    """
+
+    def __init__(self, x, a, n):
+        self.x = x
+        self.a = a
+        self.n = n
+        self.memo = {}
+        self.used = {}
+
+    def constant(self, c):
+        return [c] + [S.Zero] * (self.n - 1)
+
+    def add(self, p, q):
+        return [u + v for u, v in zip(p, q)]
+
+    def scale(self, p, c):
+        return [c * u for u in p]
+
+    def mul(self, p, q):
+        result = [S.Zero] * self.n
+        for i, u in enumerate(p):
+            if u == 0:
+                continue
+            for j in range(self.n - i):
+                if q[j] != 0:
+                    result[i + j] += u * q[j]
+        return result
+
+    def compose(self, key, inner, display):
+        # 把常数项为 0 的 inner 代入标准展开式 (Horner 形式，每次乘法都截断)
+        coefficients = elementary_series(key, self.n)
+        self.used.setdefault(key, display)
+        result = self.constant(coefficients[-1])
+        for c in reversed(coefficients[:-1]):
+            result = self.mul(result, inner)
+            result[0] += c
+        return result
+
+    def series(self, f):
+        if f in self.memo:
+            return self.memo[f]
+        result = self._series(f)
+        if result is not None:
+            result = [expand(c) for c in result]
+        self.memo[f] = result
+        return result
+
+    def _series(self, f):
+        x = self.x
+        if not f.has(x):
+            return self.constant(f)
+        if f == x:
+            return self.add(self.constant(self.a), [S.Zero, S.One] + [S.Zero] * (self.n - 2))[:self.n]
+
+        if isinstance(f, (Add, Mul)):
+            parts = [self.series(arg) for arg in f.args]
+            if any(part is None for part in parts):
+                return None
+            result = parts[0]
+            for part in parts[1:]:
+                result = self.add(result, part) if isinstance(f, Add) else self.mul(result, part)
+            return result
+
+        if isinstance(f, Pow):
+            base, exponent = f.args
+            if exponent.has(x):
+                return self.series(exp(exponent * log(base)))
+            inner = self.series(base)
+            if inner is None:
+                return None
+            if exponent.is_Integer and exponent >= 0:
+                result = self.constant(S.One)
+                for _ in range(int(exponent)):
+                    result = self.mul(result, inner)
+                return result
+            c = inner[0]
+            if not (c.is_zero is False and (exponent.is_integer or c.is_positive)):
+                return None
+            # (c + v)^a = c^a (1 + v/c)^a
+            shifted = self.scale(inner, 1 / c)
+            shifted[0] = S.Zero
+            return self.scale(self.compose(("pow", exponent), shifted, base / c - 1), c**exponent)
+
+        if len(f.args) != 1:
+            return None
+        inner = self.series(f.args[0])
+        if inner is None:
+            return None
+        c = inner[0]
+        v = [S.Zero] + inner[1:]
+        display = f.args[0] - c
+        if f.func is log:
+            if not c.is_positive:
+                return None
+            # ln(c + v) = ln c + ln(1 + v/c)
+            result = self.compose("log1p", self.scale(v, 1 / c), display / c)
+            result[0] += log(c)
+            return result
+        if c == 0:
+            return self.compose(f.func, v, display) if f.func in SERIES_FUNCTIONS else None
+        # 展开点不在 0：用加法公式移到 0
+        if f.func is exp:
+            return self.scale(self.compose(exp, v, display), exp(c))
+        if f.func in (sin, cos, sinh, cosh):
+            partner = {sin: cos, cos: sin, sinh: cosh, cosh: sinh}[f.func]
+            even = self.compose(cos if f.func in (sin, cos) else cosh, v, display)
+            odd = self.compose(sin if f.func in (sin, cos) else sinh, v, display)
+            if f.func is sin:
+                return self.add(self.scale(even, sin(c)), self.scale(odd, cos(c)))
+            if f.func is cos:
+                return self.add(self.scale(even, cos(c)), self.scale(odd, -sin(c)))
+            return self.add(self.scale(even, f.func(c)), self.scale(odd, partner(c)))
+        return None
+
+    def formulas(self):
+        """
+        用到的标准展开式，每个一行
+        """
+        lines = []
+        for key, display in self.used.items():
+            line = _formula(key, self.n)
+            if display != _DISPLAY_U:
+                line += r", \quad u = " + latex(display)
+            lines.append(line)
+        return lines
+
+
+def _polynomial(coefficients, x, a):
+    s = x - a
+    return Add(*(c * s**k for k, c in enumerate(coefficients)))
+
+
+def _series_latex(coefficients, x, a, remainder=True):
+    # 按升幂排列，(x - a)^k 不展开 (latex() 会按降幂排列，并把 c (x - a) 展开成 c x - c a)
+    s = Dummy("s")
+    names = {s: latex(x) if a == 0 else r"\left(" + latex(x - a) + r"\right)"}
+    terms = [latex(c * s**k, symbol_names=names) for k, c in enumerate(coefficients) if c != 0]
+    if remainder:
+        terms.append(latex(Order((x - a)**len(coefficients), (x, a))))
+    return " + ".join(terms).replace("+ - ", "- ") if terms else "0"
+
+
+def _ratio(numer, denom):
+    # 步骤中展示的分式，不让 SymPy 把它重新整理成乘积
+    return Mul(numer, Pow(denom, -1, evaluate=False), evaluate=False)
+
+
+def _leading(coefficients):
+    """
+    首个非零系数 (下标, 系数)；全为零时返回 (None, None)，有系数无法判断是否为零时返回 None
+    """
+    for k, c in enumerate(coefficients):
+        zero = c.is_zero
+        if zero is None:
+            return None
+        if not zero:
+            return k, c
+    return None, None
+
+
+# --- 泰勒展开 ---
+
+def expand_series(op: TaylorSeries):
+    """
+    泰勒展开，返回 LimitResult (展开式和步骤)
+    """
+    f, x, a, n = op.function, op.variable, op.point, op.order
+    name = r"\text{麦克劳林公式}" if a == 0 else r"\text{泰勒公式}"
+    steps = [r"\text{目标: 把 } " + latex(f) + r" \text{ 在 } " + latex(x) + " = " + latex(a)
+             + r" \text{ 处展开到 } " + latex(Order((x - a)**n, (x, a))) + r" \text{ 之前}"]
+
+    expansion = _Expansion(x, a, n) if a.is_finite else None
+    coefficients = expansion.series(f) if expansion is not None else None
+    if coefficients is not None:
+        # 次数低于展开阶数的多项式没有余项 (与 series() 一致)
+        remainder = not (f.is_polynomial(x) and degree(f, x) < n)
+        result = _polynomial(coefficients, x, a)
+        if remainder:
+            result += Order((x - a)**n, (x, a))
+        result_latex = _series_latex(coefficients, x, a, remainder)
+        formulas = expansion.formulas()
+        if formulas:
+            steps.append(r"\text{代入常见函数的标准展开式 (} " + name + r"\text{):}")
+            steps.extend(r"\quad " + line for line in formulas)
+            steps.append(r"\text{相乘、合并同类项，保留到 } " + latex((x - a)**(n - 1)) + r" \text{ 项:}")
+        steps.append(r"\Rightarrow " + latex(f) + " = " + result_latex)
+        return LimitResult(result, steps, "expansion", result_latex)
+
+    result = _sympy_series(f, x, a, n)
+    steps.append(r"\text{由} " + name + r" \text{计算展开式的系数:}")
+    steps.append(r"\quad " + latex(f) + r" = \sum_{k} \frac{f^{(k)}(" + latex(a) + r")}{k!} "
+                 + latex(x - a) + "^k")
+    steps.append(r"\Rightarrow " + latex(f) + " = " + latex(result))
+    return LimitResult(result, steps, "series")
+
+
+# --- 极限 ---
+
+def _value(f, x, a):
+    """
+    按极限的四则运算和连续性逐层代入，得到 x → a 时 f 的极限 (可以是 ±∞)。
+    遇到未定式 (0/0、∞ - ∞、0·∞、1^∞ 等)、极点或不连续的函数时返回 None
+    """
+    if f == x:
+        return a
+    if not f.has(x):
+        return f
+    if not (isinstance(f, (Add, Mul, Pow)) or f.func in CONTINUOUS):
+        return None
+    values = []
+    for arg in f.args:
+        value = _value(arg, x, a)
+        if value is None:
+            return None
+        values.append(value)
+    if isinstance(f, Pow):
+        base, exponent = values
+        # 0^0、0^{-n} (极点) 和 ∞^0 不能直接代入；1^∞ 由 SymPy 算出 nan
+        if base.is_zero and not exponent.is_positive:
+            return None
+        if base.is_infinite and exponent.is_zero:
+            return None
+    value = f.func(*values)
+    if value in (S.Infinity, S.NegativeInfinity):
+        return value
+    if value.has(S.NaN, S.ComplexInfinity, S.Infinity, S.NegativeInfinity, AccumBounds):
+        return None
+    return value
+
+
+def _undefined(value):
+    # 振荡 (AccumBounds)、无定义 (nan) 或无向无穷 (zoo)：不能作为极限值
+    return value.has(S.NaN, S.ComplexInfinity, AccumBounds)
+
+
+def _power_limit(c, k, side):
+    """
+    c s^k 在 s → 0 时的极限，s 从 side ("+" 或 "-") 一侧趋于 0。k < 0 且 c 的符号未知时返回 None
+    """
+    if k > 0:
+        return S.Zero
+    if k == 0:
+        return c
+    sign = 1 if c.is_positive else -1 if c.is_negative else None
+    if sign is None:
+        return None
+    if side == "-" and k.is_integer and k % 2:
+        sign = -sign
+    return S.Infinity if sign > 0 else S.NegativeInfinity
+
+
+class _LimitSolver:
+    """
+    一次求极限的状态：函数、变量、极限点、方向和已输出的步骤
+    """
+
+    def __init__(self, expr: Limit):
+        f, x, a, direction = expr.args
+        self.f = f
+        self.x = x
+        self.a = a
+        self.direction = str(direction) if a.is_finite else "+"
+        self.steps = []
+
+    def lim(self, f=None, side=None):
+        side = self.direction if side is None else side
+        to = latex(self.a)
+        if self.a.is_finite and side != "+-":
+            to = "{" + to + "}^{" + side + "}"
+        body = latex(self.f if f is None else f)
+        return r"\lim_{" + latex(self.x) + r" \to " + to + "} " + body
+
+    def sides(self):
+        return ["+", "-"] if self.direction == "+-" else [self.direction]
+
+    def combine(self, values):
+        """
+        各侧的极限 {方向: 值} 合并为结果：双侧极限要求左右极限相等。返回 (是否得到结论, 极限)
+        """
+        if any(value is None for value in values.values()):
+            return False, None
+        if len(values) == 1 or values["+"] == values["-"]:
+            return True, next(iter(values.values()))
+        self.steps.append(r"\text{左极限 } " + self.lim(side="-") + " = " + latex(values["-"])
+                          + r"\text{，右极限 } " + self.lim(side="+") + " = " + latex(values["+"]))
+        self.steps.append(r"\text{左右极限不相等，极限不存在}")
+        return True, None
+
+    def substitution(self):
+        value = _value(self.f, self.x, self.a)
+        if value is None:
+            return False, None
+        if self.a.is_finite:
+            self.steps.append(r"\text{函数在 } " + latex(self.x) + " = " + latex(self.a)
+                              + r" \text{ 处连续，直接代入}")
+        else:
+            self.steps.append(r"\text{按极限的四则运算法则逐项求极限}")
+        return True, value
+
+    def rational(self):
+        f, x, a = self.f, self.x, self.a
+        # 多项式在有限点处已经可以直接代入
+        if not f.is_rational_function(x) or (a.is_finite and f.is_polynomial(x)):
+            return False, None
+        numer, denom = fraction(cancel(f))
+        if not a.is_finite:
+            p, q = degree(numer, x), degree(denom, x)
+            ratio = Poly(numer, x).LC() / Poly(denom, x).LC()
+            self.steps.append(r"\text{有理函数，分子分母同除以 } " + latex(x**max(p, q))
+                              + r"\text{ (分子次数 } " + str(p) + r"\text{，分母次数 } " + str(q) + r"\text{)}")
+            if p < q:
+                return True, S.Zero
+            if p == q:
+                return True, ratio
+            # x → -∞ 时 x^{p-q} 的符号由 p - q 的奇偶决定
+            return self.combine({"+": _power_limit(ratio, Integer(q - p), "+" if a is S.Infinity else "-")})
+
+        if (numer, denom) != fraction(f):
+            self.steps.append(r"\text{约去公因式: } " + latex(f) + " = " + latex(_ratio(numer, denom)))
+        if denom.subs(x, a) != 0:
+            value = numer.subs(x, a) / denom.subs(x, a)
+            self.steps.append(r"\text{代入 } " + latex(x) + " = " + latex(a) + r": \ " + self.lim(numer / denom)
+                              + " = " + latex(value))
+            return True, value
+        # 分母为零、分子不为零：极点，按极点的阶数和两侧的符号判断
+        poly, order = Poly(denom, x), 0
+        while poly.eval(a) == 0:
+            poly = poly.quo(Poly(x - a, x))
+            order += 1
+        c = numer.subs(x, a) / poly.eval(a)
+        line = r"\text{分母在 } " + latex(x) + " = " + latex(a) + r" \text{ 处为 } 0 \text{，分子不为 } 0"
+        if numer / denom != c / (x - a)**order:
+            line += r"\text{：} " + latex(numer / denom) + r" \sim " + latex(c / (x - a)**order)
+        self.steps.append(line)
+        return self.combine({side: _power_limit(c, Integer(-order), side) for side in self.sides()})
+
+    def expansion(self):
+        f, x, a = self.f, self.x, self.a
+        if not a.is_finite:
+            return False, None
+        numer, denom = fraction(together(f))
+        for n in EXPANSION_ORDERS:
+            expansion = _Expansion(x, a, n)
+            top, bottom = expansion.series(numer), expansion.series(denom)
+            if top is None or bottom is None:
+                return False, None
+            top_lead, bottom_lead = _leading(top), _leading(bottom)
+            if top_lead is None or bottom_lead is None:
+                return False, None
+            if bottom_lead[0] is None or (top_lead[0] is None and n != EXPANSION_ORDERS[-1]):
+                # 分母展开到这一阶仍为零 (或分子全为零时再展开一阶确认)
+                continue
+            if top_lead[0] is None:
+                return False, None
+            (p, c_top), (q, c_bottom) = top_lead, bottom_lead
+            c = c_top / c_bottom
+            s = x - a
+            self.steps.append(r"\text{在 } " + latex(x) + " = " + latex(a) + r" \text{ 处作泰勒展开 (等价无穷小替换):}")
+            self.steps.extend(r"\quad " + line for line in expansion.formulas())
+            if denom != 1:
+                self.steps.append(r"\text{分子: } " + latex(numer) + " = " + latex(c_top * s**p)
+                                  + " + " + latex(Order(s**(p + 1), (x, a))))
+                self.steps.append(r"\text{分母: } " + latex(denom) + " = " + latex(c_bottom * s**q)
+                                  + " + " + latex(Order(s**(q + 1), (x, a))))
+            else:
+                self.steps.append(latex(numer) + " = " + latex(c_top * s**p) + " + " + latex(Order(s**(p + 1), (x, a))))
+            if p != q:
+                self.steps.append(r"\Rightarrow " + self.lim() + " = " + self.lim(c * s**(p - q)))
+            return self.combine({side: _power_limit(c, Integer(p - q), side) for side in self.sides()})
+        return False, None
+
+    def leading_term(self):
+        f, x, a = self.f, self.x, self.a
+        t = Dummy("t", positive=True)
+        values = {}
+        for side in self.sides():
+            if a is S.Infinity:
+                g = f.subs(x, 1 / t)
+            elif a is S.NegativeInfinity:
+                g = f.subs(x, -1 / t)
+            else:
+                g = f.subs(x, a + t if side == "+" else a - t)
+            try:
+                lead = g.as_leading_term(t)
+            except Exception as e:
+                logger.debug("Leading term failed for %s: %s", g, e)
+                return False, None
+            c, k = lead.as_coeff_exponent(t)
+            if c.has(t) or c == 0 or not k.is_rational:
+                return False, None
+            # 振荡的函数 (例如 x → ∞ 时的 tan x) 的"首项"是 AccumBounds，系数有限才能按幂次判断
+            if _undefined(lead) or _undefined(c) or c.is_finite is not True:
+                return False, None
+            values[side] = _power_limit(c, k, "+")
+            if values[side] is None:
+                return False, None
+            # 步骤中用原变量表示主部
+            back = {S.Infinity: 1 / x, S.NegativeInfinity: -1 / x}.get(a, (x - a) if side == "+" else (a - x))
+            label = SIDES[side] + "侧主部" if len(self.sides()) > 1 else "主部"
+            self.steps.append(r"\text{" + label + r" (首项): } " + latex(f) + r" \sim " + latex(c * back**k))
+        return self.combine(values)
+
+    def lhopital(self):
+        f, x, a = self.f, self.x, self.a
+        current = f
+        for _ in range(MAX_LHOPITAL):
+            numer, denom = fraction(current)
+            if denom == 1:
+                numer, denom = fraction(together(current))
+            top, bottom = _value(numer, x, a), _value(denom, x, a)
+            if top is None or bottom is None:
+                return False, None
+            if top == 0 and bottom == 0:
+                form = r"\frac{0}{0}"
+            elif top.is_infinite and bottom.is_infinite:
+                form = r"\frac{\infty}{\infty}"
+            else:
+                return False, None
+            top, bottom = numer.diff(x), denom.diff(x)
+            current = cancel(top / bottom) if (top / bottom).is_rational_function(x) else top / bottom
+            self.steps.append(form + r" \text{ 型，洛必达法则 (分子分母分别求导): } "
+                              + self.lim(_ratio(numer, denom)) + " = " + self.lim(_ratio(top, bottom)))
+            value = _value(current, x, a)
+            if value is not None:
+                self.steps.append(r"\text{代入得 } " + latex(value))
+                return True, value
+        return False, None
+
+    def general(self):
+        self.steps.append(r"\text{使用一般的极限算法 (Gruntz 算法)}")
+        f, x, a = self.f, self.x, self.a
+        try:
+            return True, limit(f, x, a, self.direction)
+        except ValueError:
+            # 左右极限不相等 (limit 对双侧极限抛出 ValueError)
+            if self.direction != "+-":
+                raise
+        return self.combine({side: limit(f, x, a, side) for side in self.sides()})
+
+    def solve(self):
+        self.steps.append(r"\text{目标: 求 } " + self.lim())
+        for method in (self.substitution, self.rational, self.expansion, self.leading_term, self.lhopital,
+                       self.general):
+            mark = len(self.steps)
+            done, value = method()
+            if done and value is not None and _undefined(value):
+                if method != self.general:
+                    del self.steps[mark:]
+                    continue
+                # 一般算法也只能给出振荡区间或无定义：极限不存在
+                self.steps.append(self.lim() + " = " + latex(value) + r"\text{，极限不存在}")
+                value = None
+            if done:
+                if value is not None:
+                    self.steps.append(r"\Rightarrow " + self.lim() + " = " + latex(value))
+                return LimitResult(value, self.steps, method.__name__)
+            # 没有得到结论的方法不留下步骤
+            del self.steps[mark:]
+
+
+def evaluate_limit(expr: Limit):
+    """
+    求极限，返回 LimitResult (极限和步骤)。内层的未计算运算先求值
+    """
+    f = expr.args[0]
+    if f.has(Limit):
+        f = f.replace(lambda e: isinstance(e, Limit), lambda e: _inner_limit(e))
+    if f.has(*UNEVALUATED):
+        f = f.doit()
+    if f is not expr.args[0]:
+        expr = Limit(f, *expr.args[1:])
+    result = _LimitSolver(expr).solve()
+    logger.debug("Limit %s solved by %s", expr, result.method)
+    return result
+
+
+def _inner_limit(expr):
+    result = evaluate_limit(expr).result
+    if result is None:
+        raise ValueError(f"Inner limit does not exist: {expr}")
+    return result
@@ -0,0 +1,56 @@
+import logging
+import logging.handlers
+import os
+import queue
+
+# 日志配置。请求处理路径上只把日志记录放入内存队列，
+# 由后台线程 (QueueListener) 负责格式化和写出，避免同步 I/O 阻塞请求。
+# 日志级别由环境变量 FENG_MATH_LOG_LEVEL 控制 (默认 INFO)，每个请求的详细信息使用 DEBUG 级别。
+DEFAULT_LEVEL = "INFO"
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"
+
+_listener = None
+_listener_pid = None
+
+
+def log_level():
+    value = os.environ.get("FENG_MATH_LOG_LEVEL", DEFAULT_LEVEL).upper()
+    level = logging.getLevelName(value)
+    return level if isinstance(level, int) else logging.INFO
+
+
+def setup_logging():
+    """
+    为当前进程配置非阻塞日志。可重复调用；
+    fork 出的工作进程没有父进程的后台线程，会重新创建自己的队列和线程。
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        if isinstance(old, logging.handlers.QueueHandler):
+            root.removeHandler(old)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(log_level())
+
+    listener.start()
+    _listener = listener
+    _listener_pid = os.getpid()
+
+
+def stop_logging():
+    """
+    写出队列中剩余的日志并停止后台线程 (服务退出时调用)
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+    _listener = None
+    _listener_pid = None
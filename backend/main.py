@@ -1,335 +1,401 @@
-import sys
-import typing
-import re
-
-# --- Monkey Patch Start ---
-# 修复 antlr4-python3-runtime 在高版本 Python (3.12+) 下的兼容性问题
-# 旧版 antlr4 尝试从 'typing.io' 导入，该模块已被移除
-if sys.version_info >= (3, 12):
-    from types import ModuleType
-    
-    # 模拟 typing.io
-    if "typing.io" not in sys.modules:
-        typing_io = ModuleType("typing.io")
-        typing_io.TextIO = typing.TextIO
-        typing_io.BinaryIO = typing.BinaryIO
-        sys.modules["typing.io"] = typing_io
-
-    # 模拟 typing.re (通常也需要)
-    if "typing.re" not in sys.modules:
-        typing_re = ModuleType("typing.re")
-        typing_re.Match = typing.Match
-        typing_re.Pattern = typing.Pattern
-        sys.modules["typing.re"] = typing_re
-# --- Monkey Patch End ---
-
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from latex2sympy2 import latex2sympy
-from sympy import latex, simplify, Eq, solve, Integral, Derivative, Add, Mul, Pow, Symbol, sin, cos, exp, log, Poly
-from sympy.integrals.manualintegrate import (
-    integral_steps, 
-    PartsRule, 
-    URule, 
-    PowerRule, 
-    AddRule, 
-    ConstantRule, 
-    TrigRule,
-    ReciprocalRule,
-    ConstantTimesRule,
-    AlternativeRule,
-    ExpRule,
-    RewriteRule,
-    DontKnowRule
-)
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse, Response
+from pydantic import BaseModel, Field
 import uvicorn
 
-app = FastAPI()
+from logs import setup_logging, stop_logging
+
+setup_logging()
+
+# 先逐个计时导入 sympy / latex2sympy2 等重量级模块，后面的导入只是取已加载的模块
+import warmup
+warmup.preload_imports()
+
+from solver import preprocess_latex, parse_job, solve_expr, solve_expr_stream, solve_numeric_expr
+from numeric import DEFAULT_SAMPLES, MAX_SAMPLES
+from budget import stage_budget, total_budget, WATCHDOG_GRACE
+from cache import cache_from_env
+from encoding import negotiate, encode, dumps
+from singleflight import SingleFlight
+from complexity import TooComplex, admit
+from jobs import JobQueue, QueueFull, DONE, ERROR, job_view, store_from_env, queue_size_from_env
+from worker import get_pool, shutdown_pool, run_in_pool, stream_from_pool, warm_pool, pool_size
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 预热完成、工作进程就绪后置位；在此之前到达的请求等待预热结束
+_ready = asyncio.Event()
+
+
+async def start_up():
+    """
+    后台启动流程：先在主进程中预热，再创建进程池 (fork 出的工作进程继承预热后的状态)，
+    确认每个工作进程都已启动后报告就绪
+    """
+    if warmup.warmup_enabled():
+        loop = asyncio.get_running_loop()
+        # 在线程中预热，期间 /ready 和 /metrics 仍可响应
+        await loop.run_in_executor(None, warmup.warm_up)
+        workers = await warm_pool(timeout=total_budget())
+        logger.info("Ready: %d/%d workers warm", workers, pool_size())
+    else:
+        get_pool()
+    _ready.set()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时在后台预热并创建进程池，退出时关闭
+    startup_task = asyncio.create_task(start_up())
+    job_queue.start()
+    yield
+    startup_task.cancel()
+    await job_queue.stop()
+    shutdown_pool()
+    result_cache.close()
+    job_queue.store.close()
+    stop_logging()
+
+
+app = FastAPI(lifespan=lifespan)
+result_cache = cache_from_env()
+
+metrics.Gauge("feng_math_cache_entries", "Cached results in memory", lambda: result_cache.stats()["entries"])
+metrics.Gauge("feng_math_cache_bytes", "Estimated memory used by the result cache", lambda: result_cache.stats()["bytes"])
+metrics.Gauge("feng_math_cache_hit_rate", "Result cache hit rate", lambda: result_cache.stats()["hit_rate"])
+
+# 相同题目的并发请求合并为一次计算：整个流程按规范化的 LaTeX 合并，
+# 解析之后的计算再按表达式键合并 (写法不同但含义相同的题目)
+solve_flights = SingleFlight("latex")
+compute_flights = SingleFlight("expr")
+metrics.Gauge("feng_math_inflight_computations", "Distinct computations in flight", lambda: len(compute_flights))
+
+# 单次批量请求允许的最大题目数
+MAX_BATCH_SIZE = int(os.environ.get("FENG_MATH_BATCH_MAX", "1000"))
 
 class MathRequest(BaseModel):
     latex: str
+    # numeric: 不做符号运算，只返回数值结果 (定积分的值或函数在区间上的采样，见 numeric.py)
+    mode: Literal["symbolic", "numeric"] = "symbolic"
+    # 数值模式下的采样区间 [起点, 终点] 和采样点数
+    range: Optional[Tuple[float, float]] = None
+    samples: int = Field(DEFAULT_SAMPLES, ge=2, le=MAX_SAMPLES)
+
+class JobRequest(MathRequest):
+    # 优先级越高越先计算，相同优先级按提交顺序
+    priority: int = Field(0, ge=-10, le=10)
 
-def generate_derivative_steps(expr: Derivative):
+def error_response(e: Exception):
     """
-    尝试生成求导步骤
+    把计算异常转换为 (状态码, 错误信息)
     """
-    steps = []
-    try:
-        var = expr.variables[0]
-        func = expr.expr
-        
-        steps.append(r"\text{目标: 对 } " + latex(func) + r" \text{ 关于 } " + latex(var) + r" \text{ 求导}")
-
-        if isinstance(func, Add):
-            steps.append(r"\text{应用加法法则: } \frac{d}{dx}(u+v) = \frac{du}{dx} + \frac{dv}{dx}")
-            steps.append(r"\quad \Rightarrow " + r" + ".join([r"\frac{d}{dx}(" + latex(arg) + r")" for arg in func.args]))
-        
-        elif isinstance(func, Mul):
-            # 简单的乘法法则展示 (只展示两个项的情况，多项类似)
-            if len(func.args) == 2:
-                u, v = func.args
-                steps.append(r"\text{应用乘法法则: } \frac{d}{dx}(uv) = u'v + uv'")
-                steps.append(r"\quad u = " + latex(u) + r", \quad v = " + latex(v))
-                steps.append(r"\quad \Rightarrow (" + latex(u.diff(var)) + r") \cdot " + latex(v) + r" + " + latex(u) + r" \cdot (" + latex(v.diff(var)) + r")")
-            else:
-                steps.append(r"\text{应用乘法法则}")
-
-        elif isinstance(func, Pow):
-            base, exponent = func.args
-            if exponent.is_constant():
-                steps.append(r"\text{应用幂法则/链式法则: } \frac{d}{dx}(u^n) = n u^{n-1} \cdot u'")
-                steps.append(r"\quad \Rightarrow " + latex(exponent) + r"(" + latex(base) + r")^{" + latex(exponent - 1) + r"} \cdot \frac{d}{dx}(" + latex(base) + r")")
-            else:
-                steps.append(r"\text{应用指数求导法则}")
-
-        elif func.func in (sin, cos, exp, log):
-             steps.append(r"\text{应用基本函数求导公式}")
-             if len(func.args) > 0 and func.args[0] != var:
-                 steps.append(r"\text{并应用链式法则}")
+    if isinstance(e, TimeoutError):
+        return 504, f"Calculation timeout: {str(e)}"
+    if isinstance(e, TooComplex):
+        return 422, f"Problem too complex: {str(e)}"
+    return 400, f"Calculation error: {str(e)}"
 
-    except Exception as e:
-        print(f"Derivative step error: {e}")
-    return steps
+def preprocess(latex_str: str):
+    """
+    规范化输入，并记录预处理耗时 (在主进程中执行，直接记入直方图)
+    """
+    start = time.perf_counter()
+    latex_key = preprocess_latex(latex_str)
+    kind = metrics.latex_kind(latex_key)
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage="preprocess", kind=kind)
+    return latex_key, kind
 
-def generate_equation_steps(eq: Eq):
+def encoded_response(body, accept, batch=False):
     """
-    尝试生成方程求解步骤
+    按 Accept 头选择普通 JSON、紧凑 JSON 或 MessagePack (见 encoding.py)
     """
-    steps = []
-    try:
-        # 假设是单变量方程
-        free_symbols = eq.free_symbols
-        if len(free_symbols) == 1:
-            x = list(free_symbols)[0]
-            lhs = eq.lhs - eq.rhs # 移项使得 rhs = 0
-            
-            steps.append(r"\text{移项整理得: } " + latex(lhs) + " = 0")
-            
-            poly = Poly(lhs, x)
-            degree = poly.degree()
-            
-            if degree == 1:
-                coeffs = poly.all_coeffs()
-                a, b = coeffs[0], coeffs[1]
-                steps.append(r"\text{这是一个线性方程 } ax + b = 0")
-                steps.append(r"\quad a = " + latex(a) + r", \quad b = " + latex(b))
-                steps.append(r"\text{解为: } x = -\frac{b}{a}")
-                steps.append(r"\quad \Rightarrow x = " + latex(-b/a))
-            
-            elif degree == 2:
-                coeffs = poly.all_coeffs()
-                a, b, c = coeffs[0], coeffs[1], coeffs[2]
-                steps.append(r"\text{这是一个一元二次方程 } ax^2 + bx + c = 0")
-                steps.append(r"\quad a = " + latex(a) + r", \quad b = " + latex(b) + r", \quad c = " + latex(c))
-                steps.append(r"\text{应用求根公式: } x = \frac{-b \pm \sqrt{b^2 - 4ac}}{2a}")
-                delta = b**2 - 4*a*c
-                steps.append(r"\quad \Delta = b^2 - 4ac = " + latex(delta))
-                if delta >= 0:
-                    steps.append(r"\quad x_1 = \frac{" + latex(-b) + r" + \sqrt{" + latex(delta) + r"}}{" + latex(2*a) + r"}")
-                    steps.append(r"\quad x_2 = \frac{" + latex(-b) + r" - \sqrt{" + latex(delta) + r"}}{" + latex(2*a) + r"}")
-                else:
-                    steps.append(r"\text{判别式小于0，无实数解 (或为复数解)}")
-            
-            else:
-                steps.append(r"\text{尝试因式分解或数值解法}")
-                
-    except Exception as e:
-        print(f"Equation step error: {e}")
-    return steps
+    media_type = negotiate(accept)
+    return Response(encode(body, media_type, batch), media_type=media_type, headers={"Vary": "Accept"})
 
-def generate_integral_steps(expr: Integral):
+def observe_request(endpoint, kind, status, start):
+    metrics.REQUESTS.inc(endpoint=endpoint, status=status)
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, kind=kind)
+
+async def solve_normalized(latex_key: str):
     """
-    尝试生成积分步骤
+    求解一个已规范化的 LaTeX 字符串：先查缓存，未命中时在进程池中解析和计算。
+    结果按规范化的 LaTeX 和解析后的表达式两级缓存 (见 cache.py)。
+    同一道题的并发请求共享一次计算 (见 singleflight.py)。
     """
-    steps = []
-    try:
-        var = expr.variables[0]
-        integrand = expr.function
-        rule = integral_steps(integrand, var)
-        
-        def parse_rule(r, depth=0):
-            res = []
-            indent = r"\quad " * depth
-            
-            if isinstance(r, PartsRule):
-                # PartsRule 可能不直接包含 du 和 v，需要计算
-                u = r.u
-                dv = r.dv
-                var = r.variable
-                du = u.diff(var)
-                v = dv.integrate(var)
-
-                res.append(indent + r"\text{应用分部积分法: } \int u dv = uv - \int v du")
-                res.append(indent + r"\quad u = " + latex(u) + r", \quad dv = " + latex(dv))
-                res.append(indent + r"\quad du = " + latex(du) + r", \quad v = " + latex(v))
-                res.append(indent + r"\quad \Rightarrow " + latex(u * v) + r" - \int " + latex(v * du))
-                if r.second_step:
-                    res.extend(parse_rule(r.second_step, depth + 1))
-            
-            elif isinstance(r, URule):
-                res.append(indent + r"\text{应用换元法: } u = " + latex(r.u_func))
-                # res.append(indent + r"\quad du = " + latex(r.constant * r.u_var) + r" dx") # 近似表达
-                if r.substep:
-                    res.extend(parse_rule(r.substep, depth + 1))
-            
-            elif isinstance(r, AlternativeRule):
-                # AlternativeRule 包含多种可能的积分路径，我们只展示第一种有效路径
-                if r.alternatives:
-                    res.extend(parse_rule(r.alternatives[0], depth))
-            
-            elif isinstance(r, RewriteRule):
-                res.append(indent + r"\text{重写被积函数: } \int " + latex(r.rewritten) + r" dx")
-                if r.substep:
-                    res.extend(parse_rule(r.substep, depth + 1))
-            
-            elif isinstance(r, DontKnowRule):
-                res.append(indent + r"\text{无法找到进一步的积分步骤}")
-
-            elif isinstance(r, AddRule):
-                res.append(indent + r"\text{利用线性性质拆分:}")
-                for sub in r.substeps:
-                    res.extend(parse_rule(sub, depth + 1))
-            
-            elif isinstance(r, ConstantTimesRule):
-                res.append(indent + r"\text{提取常数: } \int c \cdot f(x) dx = c \cdot \int f(x) dx")
-                res.append(indent + r"\quad \text{常数: } " + latex(r.constant))
-                if r.substep:
-                    res.extend(parse_rule(r.substep, depth + 1))
-
-            elif isinstance(r, PowerRule):
-                res.append(indent + r"\text{应用幂法则: } \int x^n dx = \frac{x^{n+1}}{n+1}")
-            
-            elif isinstance(r, ReciprocalRule):
-                res.append(indent + r"\text{应用倒数法则: } \int \frac{1}{x} dx = \ln|x|")
-            
-            elif isinstance(r, ExpRule):
-                res.append(indent + r"\text{应用指数法则: } \int e^x dx = e^x")
-
-            elif isinstance(r, TrigRule):
-                res.append(indent + r"\text{应用三角函数积分公式}")
-                
-            elif isinstance(r, ConstantRule):
-                res.append(indent + r"\text{常数积分: } \int c dx = cx")
-                
-            return res
-
-        steps.extend(parse_rule(rule))
-    except Exception as e:
-        print(f"Step generation error: {e}")
-        # steps.append(r"\text{无法生成详细步骤}")
-    return steps
+    cached = result_cache.get_latex(latex_key)
+    if cached is not None:
+        return cached
+    return await solve_flights.run(latex_key, lambda: solve_uncached(latex_key))
+
+async def solve_uncached(latex_key: str):
+    await _ready.wait()
+    expr, key, cost = await run_in_pool(parse_job, latex_key, timeout=stage_budget("parse") + WATCHDOG_GRACE)
+    cached = result_cache.get_expr(latex_key, key)
+    if cached is not None:
+        return cached
+    # 估计代价过高的题目在这里被拒绝，不占用工作进程 (见 complexity.py)
+    admit(cost)
+    logger.debug("Estimated %r, %s lane", cost, cost.lane)
+
+    async def compute():
+        result = await run_in_pool(solve_expr, expr, timeout=total_budget(), heavy=cost.heavy)
+        # 部分结果依赖于时间预算，不缓存
+        if not result["partial"]:
+            result_cache.put(latex_key, key, result)
+        return result
+
+    return await compute_flights.run(key, compute)
+
+async def solve_numeric_normalized(latex_key: str, x_range=None, samples=DEFAULT_SAMPLES):
+    """
+    数值模式：解析后在进程池中数值求解。结果依赖于采样参数且计算很快，不缓存。
+    数值求解的预算很短，不做代价上限检查，只按代价选择通道
+    """
+    await _ready.wait()
+    expr, _, cost = await run_in_pool(parse_job, latex_key, timeout=stage_budget("parse") + WATCHDOG_GRACE)
+    return await run_in_pool(
+        solve_numeric_expr, expr, x_range, samples,
+        timeout=stage_budget("numeric") + WATCHDOG_GRACE, heavy=cost.heavy,
+    )
+
+def solve_request(latex_key: str, request: MathRequest):
+    # 按请求的模式选择求解流程
+    if request.mode == "numeric":
+        return solve_numeric_normalized(latex_key, request.range, request.samples)
+    return solve_normalized(latex_key)
+
+def request_key(latex_key: str, request: MathRequest):
+    # 批量请求中用于去重的键：数值模式的结果还取决于采样参数
+    if request.mode == "numeric":
+        return (latex_key, request.mode, request.range, request.samples)
+    return (latex_key,)
+
+async def run_job(latex: str, params: dict):
+    """
+    任务队列中的一个任务：与 /solve 相同的求解流程 (包括缓存)
+    """
+    request = MathRequest(latex=latex, **params)
+    return await solve_request(preprocess(latex)[0], request)
+
+job_queue = JobQueue(
+    store_from_env(), run_job, error_response,
+    workers=pool_size(), maxsize=queue_size_from_env(),
+)
+metrics.Gauge("feng_math_job_queue_depth", "Jobs waiting in the job queue", job_queue.depth)
 
 @app.post("/solve")
-async def solve_math(request: MathRequest):
+async def solve_math(request: MathRequest, accept: Optional[str] = Header(None)):
     """
     接收 LaTeX 字符串，解析为 SymPy 表达式，
     调用 .doit() 进行求解，并返回结果的 LaTeX 字符串。
+    实际计算在工作进程池中进行，这里只等待结果。
+    响应格式由 Accept 头决定 (见 encoding.py)。
     """
+    start = time.perf_counter()
+    logger.debug("Received LaTeX: %s", request.latex)
+    latex_key, kind = preprocess(request.latex)
     try:
-        print(f"Received LaTeX: {request.latex}")
-        
-        # 预处理 LaTeX 字符串
-        # 1. 替换 latex2sympy2 可能不支持的间距符号
-        fixed_latex = request.latex.replace(r"\:", " ").replace(r"\,", " ")
-        # 2. 确保 dx 前面有空格 (可选，视解析器情况而定)
-        
-        print(f"Processed LaTeX: {fixed_latex}")
-
-        # 1. 解析 LaTeX 为 SymPy 对象
-        # latex2sympy2 能够处理积分、导数、极限等符号
-        # 预处理：把类似 '{=}' 这样的带大括号等号规范为 '='，以避免分割错误
-        fixed_latex = re.sub(r'\{\s*=\s*\}', '=', fixed_latex)
-
-        try:
-            # 特殊处理方程：如果包含 '='，手动分割左右两边，避免 latex2sympy 自动求解
-            if "=" in fixed_latex:
-                parts = fixed_latex.split("=")
-                if len(parts) == 2:
-                    lhs_latex = parts[0].strip()
-                    rhs_latex = parts[1].strip()
-                    try:
-                        lhs = latex2sympy(lhs_latex)
-                        rhs = latex2sympy(rhs_latex)
-                        expr = Eq(lhs, rhs)
-                    except Exception:
-                        # 如果分割解析失败，回退到默认解析
-                        expr = latex2sympy(fixed_latex)
-                else:
-                    expr = latex2sympy(fixed_latex)
-            else:
-                expr = latex2sympy(fixed_latex)
-        except Exception as e:
-            print(f"Latex parsing error: {e}")
-            import traceback
-            traceback.print_exc()
-            raise e
-        
-        print(f"Parsed expression type: {type(expr)}")
-        print(f"Parsed expression: {expr}")
-
-        # 2. 判断是否为方程 (Equality)
-        steps = []
-        steps.append(r"\text{1. 解析输入: } " + latex(expr))
-        
-        if isinstance(expr, Eq):
-            # 如果是方程，则求解
-            steps.append(r"\text{2. 识别为方程，进行求解}")
-            
-            # --- 尝试生成方程求解步骤 ---
-            eq_steps = generate_equation_steps(expr)
-            if eq_steps:
-                steps.append(r"\text{--- 方程求解步骤 ---}")
-                steps.extend(eq_steps)
-                steps.append(r"\text{------------------}")
-            # --------------------------
-
-            # solve 返回一个列表
-            solutions = solve(expr)
-            # 将解集转换为 LaTeX
-            result_latex = latex(solutions)
-            steps.append(r"\text{3. 得到解集: } " + result_latex)
+        result = await solve_request(latex_key, request)
+    except Exception as e:
+        logger.info("Error: %s", e)
+        status_code, detail = error_response(e)
+        observe_request("/solve", kind, status_code, start)
+        raise HTTPException(status_code=status_code, detail=detail)
+    observe_request("/solve", kind, 200, start)
+    return encoded_response(result, accept)
+
+@app.post("/solve/batch")
+async def solve_batch(requests: List[MathRequest], accept: Optional[str] = Header(None)):
+    """
+    批量求解：相同的题目只计算一次，不同题目分发到各个工作进程并行计算。
+    结果按输入顺序返回；单个题目出错只影响该题，返回 {"error": ..., "status": ...}。
+    """
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(requests)} > {MAX_BATCH_SIZE}")
+
+    start = time.perf_counter()
+    keys = []
+    unique = {}
+    for request in requests:
+        key = request_key(preprocess(request.latex)[0], request)
+        keys.append(key)
+        unique.setdefault(key, request)
+    unique_keys = list(unique)
+    logger.debug("Batch: %d problems, %d unique", len(keys), len(unique_keys))
+
+    outcomes = await asyncio.gather(
+        *(solve_request(key[0], unique[key]) for key in unique_keys),
+        return_exceptions=True,
+    )
+    by_key = dict(zip(unique_keys, outcomes))
+
+    results = []
+    for key in keys:
+        outcome = by_key[key]
+        if isinstance(outcome, Exception):
+            status_code, detail = error_response(outcome)
+            results.append({"error": detail, "status": status_code})
         else:
-            # 3. 如果是表达式，执行核心运算
-            steps.append(r"\text{2. 识别为表达式，执行运算}")
-            
-            # --- 尝试生成详细步骤 (针对积分) ---
-            if isinstance(expr, Integral):
-                integral_details = generate_integral_steps(expr)
-                if integral_details:
-                    steps.append(r"\text{--- 积分步骤详解 ---}")
-                    steps.extend(integral_details)
-                    steps.append(r"\text{------------------}")
-            
-            # --- 尝试生成详细步骤 (针对求导) ---
-            elif isinstance(expr, Derivative):
-                diff_details = generate_derivative_steps(expr)
-                if diff_details:
-                    steps.append(r"\text{--- 求导步骤 ---}")
-                    steps.extend(diff_details)
-                    steps.append(r"\text{------------------}")
-            # --------------------------------
-            
-            # .doit() 会强制执行未计算的操作（如 Integral, Derivative, Limit）
-            result = expr.doit()
-            steps.append(r"\text{3. 运算结果: } " + latex(result))
-            
-            # 4. 可选：化简结果
-            # simplify 可以让结果更简洁，例如 sin^2 + cos^2 -> 1
-            final_result = simplify(result)
-            if final_result != result:
-                steps.append(r"\text{4. 化简结果: } " + latex(final_result))
-            
-            # 5. 将结果转换回 LaTeX
-            result_latex = latex(final_result)
-        
-        print(f"Calculated Result: {result_latex}")
-        
-        return {"result": result_latex, "steps": steps}
+            results.append(outcome)
+    observe_request("/solve/batch", "batch", 200, start)
+    return encoded_response({"results": results}, accept, batch=True)
+
+def result_event(result):
+    # 结果事件不再重复携带步骤，步骤已经逐条推送过
+    return {"type": "result", **{k: v for k, v in result.items() if k != "steps"}}
+
+async def solve_events(latex_key: str):
+    """
+    与 solve_normalized 相同的求解流程，但以事件的形式逐步产出：
+    stage (阶段进度)、step (单个步骤)、result (最终结果) 或 error
+    """
+    try:
+        cached = result_cache.get_latex(latex_key)
+        if cached is None:
+            # 相同的题目正在计算 (无论来自 /solve 还是另一个流)：等待它的结果，再一次性推送步骤
+            cached = await solve_flights.join(latex_key)
+        if cached is None:
+            with solve_flights.lead(latex_key) as shared:
+                await _ready.wait()
+                yield {"type": "stage", "stage": "parse", "status": "start"}
+                expr, key, cost = await run_in_pool(parse_job, latex_key, timeout=stage_budget("parse") + WATCHDOG_GRACE)
+                yield {"type": "stage", "stage": "parse", "status": "done"}
+                cached = result_cache.get_expr(latex_key, key)
+                if cached is None:
+                    cached = await compute_flights.join(key)
+                if cached is None:
+                    admit(cost)
+                    with compute_flights.lead(key) as computed:
+                        async for kind, payload in stream_from_pool(
+                            solve_expr_stream, expr, timeout=total_budget(), heavy=cost.heavy,
+                        ):
+                            if kind == "event":
+                                yield payload
+                            else:
+                                if not payload["partial"]:
+                                    result_cache.put(latex_key, key, payload)
+                                computed.set_result(payload)
+                                shared.set_result(payload)
+                                yield result_event(payload)
+                    return
+                shared.set_result(cached)
+
+        for index, step in enumerate(cached["steps"]):
+            yield {"type": "step", "index": index, "step": step}
+        yield result_event(cached)
     except Exception as e:
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=400, detail=f"Calculation error: {str(e)}")
+        logger.info("Error: %s", e)
+        status_code, detail = error_response(e)
+        yield {"type": "error", "status": status_code, "detail": detail}
+
+async def numeric_events(latex_key: str, request: MathRequest):
+    """
+    数值模式没有耗时的中间阶段，计算完成后一次性产出步骤和结果
+    """
+    try:
+        result = await solve_numeric_normalized(latex_key, request.range, request.samples)
+    except Exception as e:
+        logger.info("Error: %s", e)
+        status_code, detail = error_response(e)
+        yield {"type": "error", "status": status_code, "detail": detail}
+        return
+    for index, step in enumerate(result["steps"]):
+        yield {"type": "step", "index": index, "step": step}
+    yield result_event(result)
+
+@app.post("/solve/stream")
+async def solve_stream(request: MathRequest):
+    """
+    流式求解：以 NDJSON (每行一个 JSON 事件) 的形式，在步骤产生后立即推送给客户端，
+    最后推送结果事件。客户端不必等待 simplify 等耗时阶段结束就能看到前面的步骤。
+    """
+    start = time.perf_counter()
+    logger.debug("Received LaTeX (stream): %s", request.latex)
+    latex_key, kind = preprocess(request.latex)
+
+    async def body():
+        status_code = 200
+        if request.mode == "numeric":
+            events = numeric_events(latex_key, request)
+        else:
+            events = solve_events(latex_key)
+        async for event in events:
+            if event["type"] == "error":
+                status_code = event["status"]
+            yield dumps(event) + b"\n"
+        # 流式响应的状态码总是 200，这里按错误事件统计
+        observe_request("/solve/stream", kind, status_code, start)
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    提交异步任务，立即返回任务 ID。相同的题目正在排队或计算时返回已有的任务 (deduplicated 为 true)
+    """
+    latex_key, _ = preprocess(request.latex)
+    key = json.dumps(request_key(latex_key, request))
+    params = {"mode": request.mode, "range": request.range, "samples": request.samples}
+    try:
+        job, deduplicated = job_queue.submit(key, request.latex, params, request.priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {**job_view(job), "deduplicated": deduplicated}
+
+def find_job(job_id: str):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """
+    任务状态：queued (附带前面的排队数 position)、running、done 或 error
+    """
+    return job_view(find_job(job_id), job_queue.store)
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str, accept: Optional[str] = Header(None)):
+    """
+    任务结果。未完成时返回 202 和任务状态；出错时返回与 /solve 相同的状态码和错误信息
+    """
+    job = find_job(job_id)
+    if job["status"] == DONE:
+        return encoded_response(json.loads(job["result"]), accept)
+    if job["status"] == ERROR:
+        raise HTTPException(status_code=job["status_code"], detail=job["error"])
+    return JSONResponse(job_view(job, job_queue.store), status_code=202)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    缓存命中/未命中统计
+    """
+    return result_cache.stats()
+
+@app.get("/ready")
+async def readiness():
+    """
+    就绪检查：预热完成前返回 503。同时返回导入耗时和预热耗时
+    """
+    body = {"ready": _ready.is_set(), **warmup.startup_stats}
+    return JSONResponse(body, status_code=200 if _ready.is_set() else 503)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus 文本格式的指标：各阶段耗时直方图 (按题型)、请求延迟、超时次数、缓存状态
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     # 启动服务
@@ -0,0 +1,448 @@
+import logging
+from fractions import Fraction
+
+import numpy as np
+from sympy import Basic, ImmutableMatrix, Rational, Symbol, S, latex, cancel, factor, roots, nroots, eye
+from sympy.core.symbol import Str
+
+from systems import format_number
+
+# 矩阵运算：行列式、逆矩阵、秩、行最简形、特征值与特征向量。
+# 解析层把 \det A、A^{-1}、\operatorname{rank} A 等写法解析为未计算的 MatrixOperation (见 parsing.py)，
+# 不在解析时直接求值。
+# 元素全是数且矩阵不大时，用无分数 (Bareiss) 消元精确计算，同时生成消元步骤；有理数用 Fraction 计算。
+# 含符号的矩阵用同样的消元，每一步的除法都是整除 (cancel)，中间结果是多项式而不是层层嵌套的分式。
+# 元素全是数的大矩阵交给 NumPy (LU 分解、SVD、QR 算法)，毫秒级返回。
+
+OPERATIONS = {
+    "det": "行列式",
+    "inv": "逆矩阵",
+    "rank": "秩",
+    "rref": "行最简形",
+    "eigen": "特征值与特征向量",
+}
+# 只对方阵有定义的运算
+SQUARE_ONLY = {"det", "inv", "eigen"}
+
+# 元素全是数、行数和列数都不超过这个值时精确计算，更大的矩阵使用 NumPy
+EXACT_MAX_SIZE = 10
+# 行数不超过这个值时，每个主元消去后都展示一次矩阵
+MAX_MATRIX_STEPS = 6
+
+LAMBDA = Symbol("lambda")
+
+logger = logging.getLogger(__name__)
+
+
+class MatrixOperation(Basic):
+    """
+    未计算的矩阵运算：operation 为 OPERATIONS 中的键，matrix 为 ImmutableMatrix
+    """
+
+    def __new__(cls, operation, matrix):
+        operation = str(operation)
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown matrix operation: {operation}")
+        matrix = ImmutableMatrix(matrix)
+        if operation in SQUARE_ONLY and not matrix.is_square:
+            raise ValueError(f"'{operation}' requires a square matrix, got {matrix.rows}x{matrix.cols}")
+        return Basic.__new__(cls, Str(operation), matrix)
+
+    @property
+    def operation(self):
+        return self.args[0].name
+
+    @property
+    def matrix(self):
+        return self.args[1]
+
+    def _latex(self, printer):
+        # 整数元素直接转成字符串，大矩阵逐个调用 printer 很慢
+        body = matrix_latex(self.matrix.tolist(), lambda v: str(v.p) if v.is_Integer else printer._print(v))
+        if self.operation == "det":
+            return r"\det " + body
+        if self.operation == "inv":
+            return body + "^{-1}"
+        name = "eig" if self.operation == "eigen" else self.operation
+        return r"\operatorname{" + name + "} " + body
+
+    def _sympyrepr(self, printer):
+        # 与默认的 srepr 输出相同 (用作缓存键，见 solver.expr_key)，整数元素直接拼接
+        rows = ", ".join(
+            "[" + ", ".join(f"Integer({v.p})" if v.is_Integer else printer._print(v) for v in row) + "]"
+            for row in self.matrix.tolist()
+        )
+        return f"{type(self).__name__}(Str({self.operation!r}), ImmutableDenseMatrix([{rows}]))"
+
+
+class MatrixResult:
+    """
+    矩阵运算的结果：结果的 LaTeX 和步骤；value 是数值模式返回的值 (行列式、秩、特征值)
+    """
+
+    def __init__(self, result, steps, value=None):
+        self.result = result
+        self.steps = steps
+        self.value = value
+
+
+def matrix_latex(rows, entry=latex, split=None):
+    """
+    矩阵的 LaTeX。split 不为 None 时是增广矩阵，在第 split 列之后画竖线
+    """
+    body = r" \\ ".join(" & ".join(entry(v) for v in row) for row in rows)
+    if split is None:
+        return r"\begin{pmatrix}" + body + r"\end{pmatrix}"
+    width = len(rows[0])
+    return r"\left[\begin{array}{" + "c" * split + "|" + "c" * (width - split) + "}" + body + r"\end{array}\right]"
+
+
+def is_numeric(matrix):
+    # 元素全是实数 (不含符号)：可以交给 NumPy
+    # flat() 比逐个下标取元素快得多
+    return all(v.is_number and v.is_real for v in matrix.flat())
+
+
+def use_numpy(matrix):
+    return max(matrix.shape) > EXACT_MAX_SIZE and is_numeric(matrix)
+
+
+# ---------- 精确计算 ----------
+
+def _entry(value):
+    return format_number(value) if isinstance(value, Fraction) else latex(value)
+
+
+def _to_sympy(value):
+    return Rational(value.numerator, value.denominator) if isinstance(value, Fraction) else value
+
+
+def _negative(value):
+    return value < 0 if isinstance(value, Fraction) else value.could_extract_minus_sign()
+
+
+def _scaled(coeff, row):
+    # coeff R_row，系数为 1 时省略，多项式系数加括号
+    if coeff == 1:
+        return f"R_{{{row + 1}}}"
+    text = _entry(coeff)
+    if not isinstance(coeff, Fraction) and coeff.is_Add:
+        text = r"\left(" + text + r"\right)"
+    return text + f" R_{{{row + 1}}}"
+
+
+def _row_op(target, pivot, multiplier, source, previous):
+    # R_i \to (p R_i - a R_k) / p_{prev}
+    numerator = _scaled(pivot, target)
+    if multiplier != 0:
+        sign = "+" if _negative(multiplier) else "-"
+        numerator += f" {sign} " + _scaled(-multiplier if _negative(multiplier) else multiplier, source)
+    if previous == 1:
+        return f"R_{{{target + 1}}} \\to " + numerator
+    return f"R_{{{target + 1}}} \\to \\frac{{{numerator}}}{{{_entry(previous)}}}"
+
+
+class _Elimination:
+    """
+    无分数 (Bareiss) 消元。以第 k 个主元 p_k 消去第 i 行时 R_i → (p_k R_i − a_i R_k) / p_{k−1}，
+    除法总是整除：整数矩阵的中间结果都是整数，含符号时都是多项式。
+    每个主元都是对应的主子式，最后一个主元就是 (行交换后的) 行列式。
+    jordan=True 时同时消去主元上方的行 (高斯-约当)，结束时所有主元都等于最后一个主元
+    """
+
+    def __init__(self, rows, split=None):
+        self.rows = rows
+        self.split = split
+        self.symbolic = not all(isinstance(v, Fraction) for row in rows for v in row)
+        self.pivots = []
+        self.last = S.One if self.symbolic else Fraction(1)
+        self.swaps = 0
+        self.assumed = []  # 假定不为零的含符号主元
+        self.steps = []
+
+    def _is_zero(self, value):
+        if value == 0:
+            return True
+        return self.symbolic and value.is_zero is True
+
+    def _combine(self, pivot, x, multiplier, y, previous):
+        value = (pivot * x - multiplier * y) / previous
+        return cancel(value) if self.symbolic else value
+
+    def run(self, width, jordan=False):
+        rows = self.rows
+        n = len(rows)
+        show = n <= MAX_MATRIX_STEPS
+        previous = self.last
+        r = 0
+        for c in range(width):
+            if r >= n:
+                break
+            candidates = [i for i in range(r, n) if not self._is_zero(rows[i][c])]
+            if not candidates:
+                continue
+            # 含符号时优先选数作主元，尽量少做“主元不为零”的假定
+            pivot_row = next((i for i in candidates if not self.symbolic or rows[i][c].is_number), candidates[0])
+            ops = []
+            if pivot_row != r:
+                rows[pivot_row], rows[r] = rows[r], rows[pivot_row]
+                self.swaps += 1
+                ops.append(f"R_{{{r + 1}}} \\leftrightarrow R_{{{pivot_row + 1}}}")
+            pivot = rows[r][c]
+            if self.symbolic and not pivot.is_number:
+                self.assumed.append(pivot)
+            for i in (range(n) if jordan else range(r + 1, n)):
+                multiplier = rows[i][c]
+                if i == r or (multiplier == 0 and pivot == previous):
+                    continue
+                rows[i] = [self._combine(pivot, x, multiplier, y, previous) for x, y in zip(rows[i], rows[r])]
+                ops.append(_row_op(i, pivot, multiplier, r, previous))
+            self.steps.append(r"\text{第 } " + str(c + 1) + r" \text{ 列以 } " + _entry(pivot) + r" \text{ 为主元: } "
+                              + (r", \; ".join(ops) if ops else r"\text{无需变换}"))
+            if show and ops:
+                self.steps.append(r"\quad " + matrix_latex(rows, _entry, self.split))
+            previous = pivot
+            self.pivots.append(c)
+            r += 1
+        self.last = previous
+        return self
+
+    def notes(self):
+        # 含符号的主元：结果只在这些主元不为零时成立
+        if not self.assumed:
+            return []
+        return [r"\text{(以上按参数的一般取值计算，假定 } "
+                + r", \ ".join(latex(p) + r" \neq 0" for p in self.assumed) + r"\text{)}"]
+
+
+def _exact_rows(matrix):
+    # 有理数用 Fraction 计算 (比 SymPy 的 Rational 快得多)，否则用 SymPy 表达式
+    rows = matrix.tolist()
+    if all(v.is_Rational for v in matrix.flat()):
+        return [[Fraction(int(v.p), int(v.q)) for v in row] for row in rows]
+    return [list(row) for row in rows]
+
+
+_BAREISS = r"\text{无分数消元 (Bareiss): } R_i \to \frac{p_k R_i - a_i R_k}{p_{k-1}} \text{，除法都是整除}"
+
+
+def _determinant(matrix):
+    n = matrix.rows
+    elimination = _Elimination(_exact_rows(matrix)).run(n)
+    steps = [_BAREISS + r"\text{，最后一个主元即为行列式}"] + elimination.steps
+    if len(elimination.pivots) < n:
+        missing = next(c for c in range(n) if c not in elimination.pivots)
+        steps.append(r"\text{第 } " + str(missing + 1) + r" \text{ 列找不到主元，矩阵不满秩，因此 } \det A = 0")
+        return MatrixResult("0", steps, 0.0)
+    value = _to_sympy(elimination.last)
+    if elimination.swaps % 2:
+        value = -value
+    if elimination.symbolic:
+        value = factor(value)
+    sign = "" if elimination.swaps == 0 else r"(-1)^{" + str(elimination.swaps) + r"} \cdot "
+    steps.append(r"\det A = " + sign + _entry(elimination.last) + " = " + latex(value))
+    steps.extend(elimination.notes())
+    return MatrixResult(latex(value), steps, float(value) if value.is_number else None)
+
+
+def _rank(matrix):
+    elimination = _Elimination(_exact_rows(matrix)).run(matrix.cols)
+    rank = len(elimination.pivots)
+    steps = [_BAREISS + r"\text{，化为阶梯形}"] + elimination.steps
+    steps.append(r"\text{主元 (非零行) 个数为 } " + str(rank) + r"\text{，因此 } \operatorname{rank} A = " + str(rank))
+    steps.extend(elimination.notes())
+    return MatrixResult(str(rank), steps, rank)
+
+
+def _divide_pivot_rows(elimination):
+    # 高斯-约当消元结束后，各主元行除以主元 (都等于最后一个主元) 得到行最简形
+    last = elimination.last
+    rows = elimination.rows
+    for r in range(len(elimination.pivots)):
+        rows[r] = [cancel(v / last) if elimination.symbolic else v / last for v in rows[r]]
+    return rows
+
+
+def _rref(matrix):
+    elimination = _Elimination(_exact_rows(matrix)).run(matrix.cols, jordan=True)
+    steps = [_BAREISS + r"\text{，主元上下方都消去 (高斯-约当)}"] + elimination.steps
+    rows = _divide_pivot_rows(elimination)
+    result = matrix_latex(rows, _entry)
+    if elimination.pivots and elimination.last != 1:
+        steps.append(r"\text{各主元行除以主元 } " + _entry(elimination.last) + r"\text{: } " + result)
+    steps.append(r"\text{主元列: } " + ", ".join(str(c + 1) for c in elimination.pivots))
+    steps.extend(elimination.notes())
+    return MatrixResult(result, steps)
+
+
+def _inverse(matrix):
+    n = matrix.rows
+    rows = _exact_rows(matrix)
+    symbolic = not all(isinstance(v, Fraction) for row in rows for v in row)
+    one, zero = (S.One, S.Zero) if symbolic else (Fraction(1), Fraction(0))
+    augmented = [row + [one if j == i else zero for j in range(n)] for i, row in enumerate(rows)]
+    steps = [r"\text{写出 } [A \mid I] \text{: } " + matrix_latex(augmented, _entry, n),
+             _BAREISS + r"\text{，把左边化为对角形}"]
+    elimination = _Elimination(augmented, split=n).run(n, jordan=True)
+    steps.extend(elimination.steps)
+    if len(elimination.pivots) < n:
+        steps.append(r"\text{左边出现全零行，} \det A = 0 \text{，矩阵不可逆}")
+        return MatrixResult(r"\text{矩阵不可逆}", steps)
+    d = elimination.last
+    inverse = [[cancel(v / d) if symbolic else v / d for v in row[n:]] for row in elimination.rows]
+    steps.append(r"\text{左边化为 } " + _entry(d) + r" I \text{，右边即为 } " + _entry(d)
+                 + r" A^{-1} \text{，各元素除以 } " + _entry(d) + r"\text{ 得到 } A^{-1}")
+    steps.extend(elimination.notes())
+    return MatrixResult(matrix_latex(inverse, _entry), steps)
+
+
+def _sort_key(value):
+    # 实数特征值从小到大，其余按字符串排在后面
+    if value.is_real and value.is_number:
+        return (0, float(value), "")
+    return (1, 0.0, str(value))
+
+
+def _eigen(matrix):
+    n = matrix.rows
+    # Berkowitz 算法，不做除法
+    poly = matrix.charpoly(LAMBDA)
+    expr = poly.as_expr()
+    steps = [r"\text{特征多项式: } \det(\lambda I - A) = " + latex(expr)]
+    factored = factor(expr)
+    if factored != expr:
+        steps.append(r"\text{因式分解: } " + latex(factored))
+
+    found = roots(poly)
+    exact = True
+    if sum(found.values()) < n:
+        if not is_numeric(matrix):
+            raise ValueError("Eigenvalues have no closed form")
+        # 没有根式解：给出数值近似
+        exact = False
+        found = {}
+        for value in nroots(poly, n=10):
+            found[value] = found.get(value, 0) + 1
+        steps.append(r"\text{特征多项式没有根式解，求数值根}")
+
+    eigenvalues = sorted(found.items(), key=lambda item: _sort_key(item[0]))
+    parts = []
+    for i, (value, multiplicity) in enumerate(eigenvalues):
+        label = r"\lambda_{" + str(i + 1) + "} = " + latex(value)
+        if multiplicity > 1:
+            label += r" \ (\text{" + str(multiplicity) + r" 重})"
+        parts.append(label)
+        if exact:
+            vectors = (matrix - value * eye(n)).nullspace()
+            steps.append(label + r"\text{: 解 } (A - \lambda I) v = 0 \text{ 得 } "
+                         + r", \ ".join("v = " + matrix_latex(v.applyfunc(cancel).tolist()) for v in vectors))
+    value = [complex(v) for v, multiplicity in eigenvalues for _ in range(multiplicity)] if is_numeric(matrix) else None
+    return MatrixResult(r", \; ".join(parts), steps, value)
+
+
+EXACT_OPERATIONS = {
+    "det": _determinant,
+    "inv": _inverse,
+    "rank": _rank,
+    "rref": _rref,
+    "eigen": _eigen,
+}
+
+
+# ---------- NumPy ----------
+
+def _complex_latex(value, tol):
+    if abs(value.imag) <= tol:
+        return format_number(float(value.real))
+    sign = "-" if value.imag < 0 else "+"
+    return format_number(float(value.real)) + f" {sign} " + format_number(abs(float(value.imag))) + "i"
+
+
+def _numeric_rank(A):
+    # 大于容差 (与 numpy.linalg.matrix_rank 相同) 的奇异值个数
+    singular = np.linalg.svd(A, compute_uv=False)
+    tol = singular.max(initial=0.0) * max(A.shape) * np.finfo(float).eps
+    return int((singular > tol).sum()), tol
+
+
+def _numeric_rref(A):
+    """
+    部分选主元的高斯-约当消元 (按列向量化)，返回 (行最简形, 主元列)
+    """
+    M = A.copy()
+    rows, cols = M.shape
+    tol = max(M.shape) * np.finfo(float).eps * max(np.abs(M).max(initial=0.0), 1.0)
+    pivots = []
+    r = 0
+    for c in range(cols):
+        if r >= rows:
+            break
+        p = r + int(np.argmax(np.abs(M[r:, c])))
+        if abs(M[p, c]) <= tol:
+            M[r:, c] = 0.0
+            continue
+        M[[r, p]] = M[[p, r]]
+        M[r] /= M[r, c]
+        others = np.arange(rows) != r
+        M[others] -= np.outer(M[others, c], M[r])
+        pivots.append(c)
+        r += 1
+    M[np.abs(M) <= tol] = 0.0
+    return M, pivots
+
+
+def _array_latex(M):
+    return matrix_latex(M.tolist(), format_number)
+
+
+def numeric_matrix(op: MatrixOperation):
+    """
+    用 NumPy 计算 (双精度)。元素必须全是实数
+    """
+    matrix = op.matrix
+    if not is_numeric(matrix):
+        raise ValueError("numeric matrix operations require numeric entries")
+    A = np.array(matrix.tolist(), dtype=float)
+    rows, cols = A.shape
+    steps = [r"\text{元素全是数的 } " + f"{rows} \\times {cols}" + r" \text{ 矩阵，使用 NumPy 双精度计算}"]
+
+    if op.operation == "det":
+        sign, logdet = np.linalg.slogdet(A)
+        value = float(sign * np.exp(logdet))
+        steps.append(r"\text{LU 分解 (部分选主元) 化为上三角: } \det A = (-1)^{s} \prod_i u_{ii}")
+        return MatrixResult(format_number(value), steps, value)
+
+    if op.operation == "rank":
+        rank, tol = _numeric_rank(A)
+        steps.append(r"\text{奇异值分解，大于容差 } " + format_number(tol) + r" \text{ 的奇异值个数即为秩}")
+        return MatrixResult(str(rank), steps, rank)
+
+    if op.operation == "inv":
+        rank, _ = _numeric_rank(A)
+        if rank < rows:
+            steps.append(r"\text{奇异值分解得 } \operatorname{rank} A = " + str(rank) + r" < " + str(rows)
+                         + r"\text{，矩阵不可逆}")
+            return MatrixResult(r"\text{矩阵不可逆}", steps)
+        steps.append(r"\text{LU 分解 (部分选主元) 后解 } A X = I")
+        return MatrixResult(_array_latex(np.linalg.inv(A)), steps)
+
+    if op.operation == "rref":
+        M, pivots = _numeric_rref(A)
+        steps.append(r"\text{部分选主元的高斯-约当消元，主元列: } " + ", ".join(str(c + 1) for c in pivots))
+        return MatrixResult(_array_latex(M), steps)
+
+    values = np.linalg.eigvals(A)
+    values = values[np.lexsort((values.imag, values.real))]
+    tol = max(np.abs(values).max(initial=0.0), 1.0) * 1e-12
+    steps.append(r"\text{QR 算法 (LAPACK geev) 求特征值}")
+    parts = [r"\lambda_{" + str(i + 1) + "} = " + _complex_latex(v, tol) for i, v in enumerate(values)]
+    return MatrixResult(r", \; ".join(parts), steps, [complex(v) for v in values])
+
+
+def reduce_matrix(op: MatrixOperation):
+    """
+    计算矩阵运算，返回 MatrixResult。元素全是数的大矩阵走 NumPy，其余精确计算并生成消元步骤
+    """
+    if use_numpy(op.matrix):
+        return numeric_matrix(op)
+    return EXACT_OPERATIONS[op.operation](op.matrix)
@@ -0,0 +1,237 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from sympy import Eq, Integral, Derivative, Limit, Tuple
+
+from matrices import MatrixOperation
+from limits import TaylorSeries
+
+# 运行时指标，以 Prometheus 文本格式从 /metrics 导出。
+# 各阶段的计时发生在工作进程中：样本先记在进程内的待汇报列表里，
+# 任务结束时随返回值一起带回主进程 (见 worker.py)，再记入主进程的直方图。
+
+# 直方图的桶 (秒)，覆盖从毫秒级的缓存命中到接近时间预算的慢请求
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+_registry = []
+_lock = threading.Lock()
+
+# 本进程中尚未汇报给主进程的阶段样本: (阶段, 题型, 耗时, 是否超时)
+_pending = []
+# 不经过进程池直接调用 solve_expr 时没有人取走样本，只保留最近的这么多个
+MAX_PENDING = 1000
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    只增不减的计数器
+    """
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """
+    取值由回调函数在导出时给出 (例如缓存统计)
+    """
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        _registry.append(self)
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(self.read())}"]
+
+
+class Histogram:
+    """
+    按标签分组的累积直方图
+    """
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}  # 标签值 -> [各桶计数, 总和, 样本数]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "feng_math_stage_seconds", "Time spent in each pipeline stage", labels=("stage", "kind"),
+)
+REQUEST_SECONDS = Histogram(
+    "feng_math_request_seconds", "End-to-end request latency", labels=("endpoint", "kind"),
+)
+REQUESTS = Counter(
+    "feng_math_requests_total", "Requests by endpoint and status code", labels=("endpoint", "status"),
+)
+STAGE_TIMEOUTS = Counter(
+    "feng_math_stage_timeouts_total", "Stages interrupted by their time budget", labels=("stage", "kind"),
+)
+POOL_RESTARTS = Counter(
+    "feng_math_pool_restarts_total", "Worker pools killed by the watchdog",
+)
+COALESCED = Counter(
+    "feng_math_coalesced_requests_total", "Requests that shared an identical in-flight computation",
+    labels=("level",),
+)
+ADMISSIONS = Counter(
+    "feng_math_admissions_total", "Parsed problems by scheduling lane (fast, heavy or rejected)",
+    labels=("lane",),
+)
+
+
+def expr_kind(expr):
+    """
+    按解析结果给题目分类，作为指标的 kind 标签
+    """
+    if isinstance(expr, Tuple):
+        return "System"
+    if isinstance(expr, MatrixOperation):
+        return "Matrix"
+    if isinstance(expr, Eq):
+        return "Eq"
+    if isinstance(expr, Integral):
+        return "Integral"
+    if isinstance(expr, Derivative):
+        return "Derivative"
+    if isinstance(expr, Limit):
+        return "Limit"
+    if isinstance(expr, TaylorSeries):
+        return "Series"
+    return "other"
+
+
+def latex_kind(fixed_latex):
+    """
+    解析之前按 LaTeX 文本粗略分类 (预处理阶段和请求总耗时使用)，与 expr_kind 的标签一致
+    """
+    if "matrix}" in fixed_latex:
+        return "Matrix"
+    if r"\int" in fixed_latex:
+        return "Integral"
+    if r"\frac{d}" in fixed_latex or r"\frac{\partial" in fixed_latex:
+        return "Derivative"
+    if fixed_latex.startswith(r"\lim"):
+        return "Limit"
+    if "{series}" in fixed_latex or "{taylor}" in fixed_latex:
+        return "Series"
+    if fixed_latex.count("=") > 1:
+        return "System"
+    if "=" in fixed_latex:
+        return "Eq"
+    return "other"
+
+
+def record(stage, kind, seconds, timed_out=False):
+    """
+    记录一个阶段样本。在工作进程中只记入待汇报列表，由 drain() 带回主进程
+    """
+    _pending.append((stage, kind, seconds, timed_out))
+    if len(_pending) > MAX_PENDING:
+        del _pending[:-MAX_PENDING]
+
+
+@contextmanager
+def timed(stage, kind):
+    """
+    计时一个代码块并记录样本 (无论是否抛出异常)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, kind, time.perf_counter() - start)
+
+
+def drain():
+    """
+    取出并清空本进程待汇报的样本
+    """
+    samples = list(_pending)
+    del _pending[:]
+    return samples
+
+
+def observe_samples(samples):
+    """
+    把 (从工作进程带回的) 样本记入直方图
+    """
+    for stage, kind, seconds, timed_out in samples:
+        STAGE_SECONDS.observe(seconds, stage=stage, kind=kind)
+        if timed_out:
+            STAGE_TIMEOUTS.inc(stage=stage, kind=kind)
+
+
+def render():
+    """
+    所有指标的 Prometheus 文本格式
+    """
+    lines = []
+    with _lock:
+        for metric in _registry:
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,327 @@
+import logging
+from functools import lru_cache
+
+import numpy as np
+from sympy import lambdify, latex, singularities, Eq, I, Integral, Derivative, Limit, Float, FiniteSet, Interval, oo
+
+from equations import polynomial_form, solve_equation
+from systems import is_system, solve_system, solution_latex
+from matrices import MatrixOperation, numeric_matrix
+from limits import TaylorSeries, evaluate_limit, expand_series
+
+# 数值模式。
+# 只需要数值的请求不走 doit() + simplify()：表达式用 lambdify 编译为 NumPy 函数，
+# 定积分用向量化的复合 Gauss-Legendre 求积 (所有求积节点一次调用求值)，
+# 函数采样在整个区间上一次调用求值。符号积分超时时也用这里的结果作为后备 (见 solver.py)。
+
+DEFAULT_SAMPLES = 200
+MAX_SAMPLES = 10000
+DEFAULT_RANGE = (-10.0, 10.0)
+
+# 每个子区间上的 Gauss-Legendre 节点数
+GAUSS_POINTS = 20
+_NODES, _WEIGHTS = np.polynomial.legendre.leggauss(GAUSS_POINTS)
+
+# 子区间数从 1 开始加倍，直到相邻两次结果之差小于容差
+QUAD_TOL = 1e-10
+MAX_PANELS = 4096
+# 达到 MAX_PANELS 时相邻两次结果之差仍超过这个相对误差，视为不收敛 (例如 ∫_0^1 1/x)；
+# 在它以内的 (例如端点处可积的奇点 ∫_0^1 1/\sqrt{x}) 返回估计值和误差估计
+LOOSE_TOL = 1e-3
+
+# 无穷区间变换后，靠近端点的节点对应的 x 非常大，这些点上的溢出按 0 处理
+HUGE = 1e100
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=256)
+def numeric_function(expr, var):
+    """
+    把表达式编译为 NumPy 向量化函数，按 (表达式, 变量) 缓存
+    """
+    return lambdify(var, expr, "numpy")
+
+
+def evaluate(func, x, complex_values=False):
+    """
+    对数组 x 求值。常数表达式返回标量，这里统一扩展为与 x 相同的形状。
+    采样时真正的复数值记为 nan；complex_values 为真时 (求积) 保留复数
+    """
+    with np.errstate(all="ignore"):
+        y = np.asarray(func(x))
+        if complex_values and not np.iscomplexobj(x) and np.any(np.isnan(y)):
+            # 实数输入上 NumPy 的 sqrt、log 等对负数给出 nan，改用复数输入得到复数值
+            y = np.asarray(func(x.astype(complex)))
+    if y.shape != x.shape:
+        y = np.broadcast_to(y, x.shape)
+    if np.iscomplexobj(y):
+        # 数值误差产生的微小虚部按实数处理
+        small = np.abs(y.imag) <= 1e-12 * np.maximum(1.0, np.abs(y.real))
+        if np.all(small):
+            return y.real.astype(float)
+        if complex_values:
+            return y.astype(complex)
+        y = np.where(small, y.real, np.nan)
+    return y.astype(float)
+
+
+def _scalar(value):
+    """
+    求积结果转换为 float；虚部不可忽略时 (被积函数在区间上取复数值) 返回 complex
+    """
+    value = complex(value)
+    if abs(value.imag) <= 1e-12 * max(1.0, abs(value.real)):
+        return value.real
+    return value
+
+
+def value_latex(value):
+    # 数值结果的 LaTeX，复数写成 a + b i
+    if isinstance(value, complex):
+        return latex(Float(value.real, 12) + Float(value.imag, 12) * I)
+    return latex(Float(value, 12))
+
+
+def value_fields(value):
+    """
+    响应中的数值字段：实数放在 value；复数时 value 为 null，实部虚部放在 complex
+    """
+    if isinstance(value, complex):
+        return {"value": None, "complex": {"re": value.real, "im": value.imag}}
+    return {"value": value}
+
+
+def _transform(a, b):
+    """
+    把积分区间变换到有限区间，返回 (t 的下限, t 的上限, x(t), dx/dt)
+    """
+    if a == -np.inf and b == np.inf:
+        return -1.0, 1.0, lambda t: t / (1 - t**2), lambda t: (1 + t**2) / (1 - t**2) ** 2
+    if b == np.inf:
+        return 0.0, 1.0, lambda t: a + t / (1 - t), lambda t: 1 / (1 - t) ** 2
+    if a == -np.inf:
+        return 0.0, 1.0, lambda t: b - t / (1 - t), lambda t: 1 / (1 - t) ** 2
+    return a, b, None, None
+
+
+def _panel_sums(func, edges, to_x, jacobian):
+    # 所有子区间的所有节点组成一个 (子区间数, 节点数) 的数组，一次求值
+    left = edges[:-1, None]
+    half = (edges[1:, None] - left) / 2
+    t = left + half * (_NODES + 1)
+    if to_x is None:
+        y = evaluate(func, t, complex_values=True)
+        if not np.all(np.isfinite(y)):
+            raise ValueError("integrand is not finite on the interval")
+    else:
+        with np.errstate(all="ignore"):
+            x = to_x(t)
+            y = evaluate(func, x, complex_values=True) * jacobian(t)
+        bad = ~np.isfinite(y)
+        if np.any(bad & (np.abs(x) < HUGE)):
+            raise ValueError("integrand is not finite on the interval")
+        y = np.where(bad, 0.0, y)
+    return half[:, 0] * (y @ _WEIGHTS)
+
+
+def quadrature(func, a, b, tol=QUAD_TOL, max_panels=MAX_PANELS):
+    """
+    向量化的复合 Gauss-Legendre 求积，支持无穷上下限。返回 (积分值, 误差估计)；
+    被积函数在区间上取复数值时积分值为 complex
+    """
+    if a == b:
+        return 0.0, 0.0
+    sign = 1.0
+    if a > b:
+        a, b, sign = b, a, -1.0
+    lo, hi, to_x, jacobian = _transform(a, b)
+
+    panels = 1
+    estimate = _panel_sums(func, np.linspace(lo, hi, panels + 1), to_x, jacobian).sum()
+    error = np.inf
+    while panels < max_panels:
+        panels *= 2
+        refined = _panel_sums(func, np.linspace(lo, hi, panels + 1), to_x, jacobian).sum()
+        error = abs(refined - estimate)
+        estimate = refined
+        if error <= tol * max(1.0, abs(refined)):
+            break
+    if error > LOOSE_TOL * max(1.0, abs(estimate)):
+        # 加密到 max_panels 仍不收敛：通常是端点处不可积的奇点，不能把估计值当作结果
+        raise ValueError(f"numerical integration did not converge (estimate {sign * estimate:.6g}, "
+                         f"change between refinements {error:.2g})")
+    return _scalar(sign * estimate), float(error)
+
+
+def _bound(value):
+    if value == oo:
+        return np.inf
+    if value == -oo:
+        return -np.inf
+    return float(value)
+
+
+def numeric_integral(expr: Integral):
+    """
+    定积分的数值结果 (积分值, 误差估计)。不是单变量定积分时返回 None
+    """
+    if len(expr.limits) != 1 or len(expr.limits[0]) != 3:
+        return None
+    var, a, b = expr.limits[0]
+    if a.free_symbols or b.free_symbols or not expr.function.free_symbols <= {var}:
+        return None
+    check_poles(expr.function, var, a, b)
+    return quadrature(numeric_function(expr.function, var), _bound(a), _bound(b))
+
+
+def check_poles(f, var, a, b):
+    """
+    被积函数在积分区间内部有奇点时抛出 ValueError：对称的求积节点可能恰好互相抵消 (例如 ∫_{-1}^{1} 1/x)，
+    数值结果看似收敛却没有意义。端点处的奇点由求积是否收敛判断。找不到奇点时不做检查
+    """
+    lo, hi = (a, b) if a <= b else (b, a)
+    try:
+        points = singularities(f, var, Interval.open(lo, hi))
+    except Exception as e:
+        logger.debug("Cannot find singularities of %s: %s", f, e)
+        return
+    if isinstance(points, FiniteSet) and points:
+        where = ", ".join(str(point) for point in points)
+        raise ValueError(f"integrand is singular inside the interval at {var} = {where}; "
+                         "the integral may diverge and cannot be evaluated numerically")
+
+
+def multiple_integral(expr: Integral):
+    """
+    多重积分 (或上下限含变量的积分) 的数值：mpmath 只能计算单重积分，先做符号积分再求值
+    """
+    value = expr.doit().evalf()
+    if value.has(Integral) or not value.is_number:
+        raise ValueError("numeric mode cannot evaluate this multiple integral")
+    return _scalar(complex(value))
+
+
+def cumulative_integral(func, x):
+    """
+    不定积分的采样：F(x_i) = ∫_{x_0}^{x_i} f，所有相邻采样点之间的子区间一次向量化求积
+    """
+    left = x[:-1, None]
+    half = (x[1:, None] - left) / 2
+    y = evaluate(func, left + half * (_NODES + 1))
+    pieces = half[:, 0] * (y @ _WEIGHTS)
+    return np.concatenate([[0.0], np.cumsum(pieces)])
+
+
+def _json_values(values):
+    # nan/inf 不能写入 JSON，记为 null
+    return [float(v) if np.isfinite(v) else None for v in values]
+
+
+def solve_numeric(expr, x_range=None, samples=DEFAULT_SAMPLES):
+    """
+    数值模式求解，返回与 solve_expr 结构相同的响应 (附加 value/error/samples 字段)
+    """
+    steps = [r"\text{1. 解析输入: } " + latex(expr), r"\text{2. 数值模式}"]
+    response = {"mode": "numeric", "partial": False}
+
+    if is_system(expr):
+        solutions = solve_system(expr, numeric=True)
+        steps.append(r"\text{数值求解方程组}")
+        response["result"] = solution_latex([{k: v.evalf(10) for k, v in s.items()} for s in solutions])
+        response["solutions"] = [
+            {str(k): float(v) if v.is_real and not v.free_symbols else str(v) for k, v in s.items()}
+            for s in solutions
+        ]
+        response["steps"] = steps
+        return response
+
+    if isinstance(expr, MatrixOperation):
+        # 矩阵运算不论大小都交给 NumPy
+        reduction = numeric_matrix(expr)
+        steps.extend(reduction.steps)
+        response["result"] = reduction.result
+        if isinstance(reduction.value, list):
+            response["eigenvalues"] = [{"re": v.real, "im": v.imag} for v in reduction.value]
+        elif reduction.value is not None:
+            response["value"] = reduction.value
+        response["steps"] = steps
+        return response
+
+    if isinstance(expr, Eq):
+        form = polynomial_form(expr)
+        if form is None:
+            raise ValueError("numeric mode only supports polynomial equations")
+        roots = solve_equation(expr, form, numeric=True)
+        steps.append(r"\text{由伴随矩阵特征值求得数值解}")
+        response["result"] = latex([r.evalf(10) for r in roots])
+        response["roots"] = [
+            {"re": float(complex(r).real), "im": float(complex(r).imag)} for r in roots
+        ]
+        response["steps"] = steps
+        return response
+
+    if isinstance(expr, Integral) and all(len(limit) == 3 for limit in expr.limits):
+        found = numeric_integral(expr)
+        if found is None:
+            # 多重积分或上下限含变量：逐层积分后交给 mpmath
+            value, error = multiple_integral(expr), None
+            steps.append(r"\text{逐层积分后求数值}")
+        else:
+            value, error = found
+            steps.append(r"\text{复合 Gauss-Legendre 数值积分}")
+        if isinstance(value, complex):
+            steps.append(r"\text{被积函数在积分区间上取复数值，结果为复数}")
+        response["result"] = r"\approx " + value_latex(value)
+        response.update(value_fields(value))
+        response["error"] = error
+        response["steps"] = steps
+        return response
+
+    # 极限和泰勒展开先用符号方法算出 (见 limits.py)：极限取数值，展开式对多项式部分采样
+    if isinstance(expr, (Limit, TaylorSeries)):
+        evaluation = evaluate_limit(expr) if isinstance(expr, Limit) else expand_series(expr)
+        if evaluation.result is None:
+            raise ValueError("The limit does not exist")
+        expr = evaluation.result.removeO()
+        steps.append(r"\text{符号计算结果: } " + evaluation.latex)
+
+    # 求导在符号上很便宜，先求出导函数再采样
+    if isinstance(expr, Derivative):
+        expr = expr.doit()
+        steps.append(r"\text{导函数: } " + latex(expr))
+
+    integrand = None
+    if isinstance(expr, Integral):
+        # 不定积分：采样 F(x) = ∫_{x_0}^{x} f
+        if len(expr.limits) != 1:
+            raise ValueError("numeric mode only supports single indefinite integrals")
+        integrand = expr.function
+        free = {expr.limits[0][0]} | integrand.free_symbols
+    else:
+        free = expr.free_symbols
+
+    if not free:
+        value = complex(expr.evalf())
+        response["result"] = r"\approx " + latex(expr.evalf(12))
+        response["value"] = value.real if value.imag == 0 else None
+        response["steps"] = steps
+        return response
+    if len(free) != 1:
+        raise ValueError("numeric mode only supports a single variable")
+    var = next(iter(free))
+
+    start, stop = x_range or DEFAULT_RANGE
+    x = np.linspace(float(start), float(stop), samples)
+    if integrand is not None:
+        y = cumulative_integral(numeric_function(integrand, var), x)
+        steps.append(r"\text{数值积分得到 } \int_{" + latex(Float(start, 6)) + "}^{" + latex(var) + r"} f")
+    else:
+        y = evaluate(numeric_function(expr, var), x)
+    steps.append(r"\text{在 } [" + latex(Float(start, 6)) + ", " + latex(Float(stop, 6)) + r"] \text{ 上取 } "
+                 + str(samples) + r" \text{ 个采样点}")
+
+    response["result"] = latex(expr)
+    response["samples"] = {"variable": str(var), "x": _json_values(x), "y": _json_values(y)}
+    response["steps"] = steps
+    return response
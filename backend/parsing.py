@@ -0,0 +1,528 @@
+import sys
+import typing
+import re
+from functools import lru_cache
+
+# --- Monkey Patch Start ---
+# 修复 antlr4-python3-runtime 在高版本 Python (3.12+) 下的兼容性问题
+# 旧版 antlr4 尝试从 'typing.io' 导入，该模块已被移除
+if sys.version_info >= (3, 12):
+    from types import ModuleType
+
+    # 模拟 typing.io
+    if "typing.io" not in sys.modules:
+        typing_io = ModuleType("typing.io")
+        typing_io.TextIO = typing.TextIO
+        typing_io.BinaryIO = typing.BinaryIO
+        sys.modules["typing.io"] = typing_io
+
+    # 模拟 typing.re (通常也需要)
+    if "typing.re" not in sys.modules:
+        typing_re = ModuleType("typing.re")
+        typing_re.Match = typing.Match
+        typing_re.Pattern = typing.Pattern
+        sys.modules["typing.re"] = typing_re
+# --- Monkey Patch End ---
+
+from latex2sympy2 import latex2sympy
+from matrices import MatrixOperation
+from limits import TaylorSeries, DEFAULT_SERIES_ORDER
+from sympy import (
+    Eq, Tuple, Limit, Integer, Rational, Symbol, Mul, E, pi, oo, sqrt, root,
+    sin, cos, tan, cot, sec, csc, asin, acos, atan, sinh, cosh, tanh, exp, log,
+)
+
+# LaTeX 解析层。
+# latex2sympy (基于 ANTLR) 是整个流程中最慢的部分之一，这里做了三件事：
+# 1. 对每个被解析的 (子) 字符串做 LRU 缓存
+# 2. 方程按 '=' 分割后分别解析左右两边，不重复解析整个输入
+# 3. 对简单的多项式/初等函数输入使用手写的递归下降解析器，其余回退到 latex2sympy
+# 快速路径只接受语义明确的输入，任何拿不准的写法 (例如 '/'、'x^23'、f(x)) 都交给 latex2sympy，
+# 保证两条路径的解析结果在数学上一致。
+PARSE_CACHE_SIZE = 4096
+
+FUNCTIONS = {
+    "sin": sin, "cos": cos, "tan": tan, "cot": cot, "sec": sec, "csc": csc,
+    "arcsin": asin, "arccos": acos, "arctan": atan,
+    "sinh": sinh, "cosh": cosh, "tanh": tanh,
+    "exp": exp,
+    "ln": log,
+    "log": lambda arg: log(arg, 10),  # 与 latex2sympy 一致：\log 为常用对数
+}
+
+GREEK = {
+    "alpha", "beta", "gamma", "delta", "epsilon", "theta", "lambda", "mu",
+    "sigma", "phi", "omega", "tau", "rho", "eta", "xi", "zeta", "psi", "chi",
+}
+
+# 间距命令，直接忽略
+SPACING = {"quad", "qquad", ";", "!", ",", ":"}
+
+TOKEN_RE = re.compile(r"\s*(?:(\d+(?:\.\d+)?)|(\\[a-zA-Z]+|\\[;!,:])|([a-zA-Z])|([+\-*^(){}\[\]]))")
+
+# 导数记号 \frac{d}{dx} 只能交给 latex2sympy
+DERIVATIVE_RE = re.compile(r"\\frac\s*\{\s*(d|\\partial)")
+
+# 方程组：\begin{cases} ... \end{cases} 等环境和 \left\{ ... \right. 的边界，以及方程之间的分隔符 (\\、分号、逗号)
+SYSTEM_ENV_RE = re.compile(
+    r"\\(begin|end)\s*\{(cases|aligned|align\*?|gathered|array)\}(\s*\{[^}]*\})?|\\left\s*\\\{|\\right\s*\."
+)
+SYSTEM_SEPARATOR_RE = re.compile(r"\\\\|;|,")
+
+# 矩阵运算：单个矩阵环境，前面可以有 \det、\operatorname{rank} 等运算名，后面可以有 ^{-1} (见 matrices.py)
+MATRIX_ENV_RE = re.compile(r"\\begin\s*\{([pbBvV]?matrix)\}(.*?)\\end\s*\{\1\}", re.S)
+MATRIX_PREFIX_RE = re.compile(r"\\(?:operatorname|mathrm|text)\s*\{\s*([a-zA-Z]+)\s*\}|\\(det)")
+MATRIX_INVERSE_RE = re.compile(r"\^\s*(?:\{\s*-\s*1\s*\}|-\s*1)")
+MATRIX_OPERATIONS = {
+    "det": "det",
+    "inv": "inv",
+    "rank": "rank", "rk": "rank",
+    "rref": "rref",
+    "eig": "eigen", "eigen": "eigen", "eigenvals": "eigen", "eigenvalues": "eigen", "eigenvects": "eigen",
+}
+# 矩阵元素大多是数，直接构造，不经过解析器
+NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+# 极限 \lim_{x \to a} f 和泰勒展开 \operatorname{series}_{x=a}^{n} f (见 limits.py)。
+# latex2sympy 不支持 0^+ 这样的单侧极限，并且把双侧极限解析为右极限，这里自己解析
+LIMIT_RE = re.compile(r"\\lim(?:\\limits)?\s*_")
+SERIES_RE = re.compile(r"\\operatorname\s*\{\s*(?:series|taylor)\s*\}(?:\\limits)?\s*")
+APPROACH_RE = re.compile(r"\s*([a-zA-Z]|\\[a-zA-Z]+)\s*(?:\\to|\\rightarrow|\\longrightarrow|=)\s*(.+?)\s*", re.S)
+ONE_SIDED_RE = re.compile(r"(.+?)\s*\^\s*(?:\{\s*([+-])\s*\}|([+-]))", re.S)
+INFINITY = {r"\infty": oo, r"+\infty": oo, r"-\infty": -oo}
+
+parse_stats = {"fast": 0, "latex2sympy": 0}
+
+
+class FastParseError(Exception):
+    """
+    快速路径不支持该输入，需要回退到 latex2sympy
+    """
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if match is None:
+            raise FastParseError(f"unsupported character {text[pos]!r}")
+        pos = match.end()
+        number, command, letter, symbol = match.groups()
+        if number is not None:
+            tokens.append(("num", number))
+        elif command is not None:
+            name = command[1:]
+            if name in SPACING:
+                continue
+            tokens.append(("cmd", name))
+        elif letter is not None:
+            tokens.append(("letter", letter))
+        else:
+            tokens.append(("sym", symbol))
+    return tokens
+
+
+class FastParser:
+    """
+    手写的递归下降解析器，支持：数字、单字母变量、希腊字母、\\pi、e、
+    + - \\cdot \\times *、乘方、隐式乘法、括号、\\frac、\\sqrt 和常见初等函数
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, kind, value):
+        token = self.next()
+        if token != (kind, value):
+            raise FastParseError(f"expected {value!r}, got {token[1]!r}")
+
+    def parse(self):
+        if not self.tokens:
+            raise FastParseError("empty input")
+        expr = self.parse_sum()
+        if self.pos != len(self.tokens):
+            raise FastParseError(f"unexpected token {self.peek()[1]!r}")
+        return expr
+
+    def parse_sum(self):
+        kind, value = self.peek()
+        sign = 1
+        if (kind, value) in (("sym", "-"), ("sym", "+")):
+            self.next()
+            sign = -1 if value == "-" else 1
+        expr = sign * self.parse_product()
+        while self.peek() in (("sym", "+"), ("sym", "-")):
+            _, op = self.next()
+            term = self.parse_product()
+            expr = expr + term if op == "+" else expr - term
+        return expr
+
+    def parse_product(self):
+        factors = [self.parse_factor()]
+        while True:
+            token = self.peek()
+            if token in (("cmd", "cdot"), ("cmd", "times"), ("sym", "*")):
+                self.next()
+                factors.append(self.parse_factor())
+            elif self.starts_factor(token):
+                factors.append(self.parse_factor())
+            else:
+                break
+        return Mul(*factors)
+
+    def starts_factor(self, token, allow_functions=True):
+        kind, value = token
+        if kind in ("num", "letter"):
+            return True
+        if kind == "sym":
+            return value in ("(", "{")
+        if kind == "cmd":
+            if value in FUNCTIONS:
+                return allow_functions
+            return value in ("pi", "frac", "sqrt", "left") or value in GREEK
+        return False
+
+    def parse_factor(self):
+        base = self.parse_atom()
+        if self.peek() == ("sym", "^"):
+            self.next()
+            exponent = self.parse_exponent()
+            if self.peek() == ("sym", "^"):
+                # a^b^c / x^{2}^{3} 的结合方式在 latex2sympy 中不统一，交给它处理
+                raise FastParseError("chained exponent")
+            return base ** exponent
+        return base
+
+    def parse_exponent(self):
+        kind, value = self.next()
+        if kind == "num":
+            # x^23 在 latex2sympy 中是 x**23，而在 LaTeX 中是 x^2 3，语义不明确
+            if len(value) != 1:
+                raise FastParseError("multi-digit bare exponent")
+            return Integer(value)
+        if kind == "letter":
+            return E if value == "e" else Symbol(value)
+        if (kind, value) == ("sym", "{"):
+            expr = self.parse_sum()
+            self.expect("sym", "}")
+            return expr
+        if (kind, value) == ("cmd", "pi"):
+            return pi
+        raise FastParseError(f"unsupported exponent {value!r}")
+
+    def parse_group(self):
+        # 解析 {...}、(...) 或 \left( ... \right)
+        kind, value = self.next()
+        if (kind, value) == ("sym", "{"):
+            expr = self.parse_sum()
+            self.expect("sym", "}")
+            return expr
+        if (kind, value) == ("sym", "("):
+            expr = self.parse_sum()
+            self.expect("sym", ")")
+            return expr
+        if (kind, value) == ("cmd", "left"):
+            self.expect("sym", "(")
+            expr = self.parse_sum()
+            self.expect("cmd", "right")
+            self.expect("sym", ")")
+            return expr
+        raise FastParseError(f"expected group, got {value!r}")
+
+    def parse_atom(self):
+        kind, value = self.peek()
+        if kind == "num":
+            self.next()
+            return Rational(value) if "." in value else Integer(value)
+        if kind == "letter":
+            self.next()
+            if self.peek() == ("sym", "("):
+                # f(x) 在 latex2sympy 中可能是函数调用，也可能是乘法
+                raise FastParseError("letter followed by parenthesis")
+            return E if value == "e" else Symbol(value)
+        if kind == "sym" and value in ("(", "{"):
+            return self.parse_group()
+        if kind == "cmd":
+            if value == "left":
+                return self.parse_group()
+            self.next()
+            if value == "pi":
+                return pi
+            if value in GREEK:
+                return Symbol(value)
+            if value == "frac":
+                numerator = self.parse_group()
+                denominator = self.parse_group()
+                return numerator / denominator
+            if value == "sqrt":
+                if self.peek() == ("sym", "["):
+                    self.next()
+                    index = self.parse_sum()
+                    self.expect("sym", "]")
+                    return root(self.parse_group(), index)
+                return sqrt(self.parse_group())
+            if value in FUNCTIONS:
+                return self.parse_function(FUNCTIONS[value])
+        raise FastParseError(f"unsupported token {value!r}")
+
+    def parse_function(self, func):
+        power = None
+        if self.peek() == ("sym", "^"):
+            self.next()
+            power = self.parse_exponent()
+            if not (power.is_Integer and power.is_positive):
+                # \sin^{-1} x 表示反函数
+                raise FastParseError("function power is not a positive integer")
+        token = self.peek()
+        if token in (("sym", "("), ("sym", "{"), ("cmd", "left")):
+            arg = self.parse_group()
+            if token == ("sym", "{") and self.peek() == ("sym", "^"):
+                # latex2sympy 把 \sin{x}^2 解析为 sin(x^2)，而 \sin(x)^2 是 sin(x)^2，交给它处理
+                raise FastParseError("braced function argument followed by exponent")
+        else:
+            # 不带括号的参数：与 latex2sympy 一致，吸收后面隐式相乘的因子，遇到下一个函数为止
+            factors = [self.parse_factor()]
+            while self.starts_factor(self.peek(), allow_functions=False):
+                factors.append(self.parse_factor())
+            if self.peek() in (("cmd", "cdot"), ("cmd", "times"), ("sym", "*")):
+                raise FastParseError("ambiguous function argument")
+            arg = Mul(*factors)
+        result = func(arg)
+        return result ** power if power is not None else result
+
+
+def fast_parse(text):
+    """
+    使用快速路径解析，不支持时抛出 FastParseError
+    """
+    if DERIVATIVE_RE.search(text):
+        raise FastParseError("derivative notation")
+    return FastParser(text).parse()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_cached(text):
+    """
+    解析单个 LaTeX (子) 字符串，结果按字符串缓存
+    """
+    try:
+        expr = fast_parse(text)
+        parse_stats["fast"] += 1
+        return expr
+    except FastParseError:
+        pass
+    parse_stats["latex2sympy"] += 1
+    return latex2sympy(text)
+
+
+def split_system(fixed_latex):
+    """
+    把方程组拆分为单个方程的字符串列表。只有拆分后每一部分都恰好含一个 '=' 时才视为方程组，
+    否则返回 None (例如 f(x, y) = 1 中的逗号不是分隔符)
+    """
+    if fixed_latex.count("=") < 2:
+        return None
+    text = SYSTEM_ENV_RE.sub(" ", fixed_latex).replace("&", " ")
+    parts = [part.strip() for part in SYSTEM_SEPARATOR_RE.split(text)]
+    parts = [part for part in parts if part]
+    if len(parts) < 2 or any(part.count("=") != 1 for part in parts):
+        return None
+    return parts
+
+
+def parse_entry(text):
+    text = text.strip()
+    if NUMBER_RE.fullmatch(text):
+        return Rational(text) if "." in text else Integer(text)
+    return parse_cached(text)
+
+
+def parse_matrix_operation(fixed_latex):
+    """
+    解析矩阵运算：\\det A、|A| (vmatrix)、A^{-1}、\\operatorname{rank} A、\\operatorname{rref} A、
+    \\operatorname{eig} A，A 为单个矩阵环境，可以带括号。
+    其他写法 (单独的矩阵、矩阵乘法、转置等) 返回 None，交给 latex2sympy
+    """
+    match = MATRIX_ENV_RE.search(fixed_latex)
+    if match is None:
+        return None
+    env, body = match.groups()
+    before = fixed_latex[:match.start()].strip()
+    after = fixed_latex[match.end():].strip()
+    for left, right in ((r"\left(", r"\right)"), ("(", ")")):
+        if before.endswith(left) and after.startswith(right):
+            before = before[:-len(left)].strip()
+            after = after[len(right):].strip()
+            break
+
+    operation = None
+    if before:
+        prefix = MATRIX_PREFIX_RE.fullmatch(before)
+        if prefix is None:
+            return None
+        operation = MATRIX_OPERATIONS.get((prefix.group(1) or prefix.group(2)).lower())
+        if operation is None:
+            return None
+    if after:
+        if operation is not None or not MATRIX_INVERSE_RE.fullmatch(after):
+            return None
+        operation = "inv"
+    if env == "vmatrix":
+        if operation is not None:
+            return None
+        operation = "det"
+    if operation is None:
+        return None
+
+    rows = [row for row in re.split(r"\\\\", body) if row.strip()]
+    entries = [[parse_entry(entry) for entry in row.split("&")] for row in rows]
+    if len({len(row) for row in entries}) != 1:
+        raise ValueError("Matrix rows have different lengths")
+    return MatrixOperation(operation, entries)
+
+
+def read_script(text, pos):
+    """
+    读取 pos 处的上标/下标内容：{...} (括号配对) 或单个字符/命令，返回 (内容, 结束位置)
+    """
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    if pos >= len(text):
+        raise ValueError("Missing subscript or superscript")
+    if text[pos] == "{":
+        depth = 0
+        for end in range(pos, len(text)):
+            if text[end] == "{":
+                depth += 1
+            elif text[end] == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[pos + 1:end], end + 1
+        raise ValueError("Unbalanced braces")
+    match = re.match(r"\\[a-zA-Z]+|.", text[pos:])
+    return match.group(), pos + match.end()
+
+
+def parse_point(text):
+    text = text.strip()
+    if text in INFINITY:
+        return INFINITY[text]
+    return parse_entry(text)
+
+
+def parse_limit(fixed_latex):
+    """
+    解析 \\lim_{x \\to a} f、\\lim_{x \\to a^+} f 等极限，双侧极限的方向为 "+-"。
+    不是这种写法时返回 None，交给 latex2sympy
+    """
+    match = LIMIT_RE.match(fixed_latex)
+    if match is None:
+        return None
+    subscript, end = read_script(fixed_latex, match.end())
+    approach = APPROACH_RE.fullmatch(subscript)
+    body = fixed_latex[end:].strip()
+    if approach is None or not body or "=" in body:
+        return None
+    variable, point = approach.groups()
+    direction = "+-"
+    side = ONE_SIDED_RE.fullmatch(point)
+    if side is not None:
+        point = side.group(1)
+        direction = side.group(2) or side.group(3)
+    inner = parse_limit(body)
+    return Limit(inner if inner is not None else parse_cached(body), parse_cached(variable), parse_point(point),
+                 direction)
+
+
+def parse_series(fixed_latex):
+    """
+    解析泰勒展开 \\operatorname{series}_{x=a}^{n} f (也可以写 taylor，或 x \\to a)，
+    省略 =a 时在 0 处展开，省略 ^{n} 时展开到 O(x^6)，省略下标时对唯一的变量展开。不是这种写法时返回 None
+    """
+    match = SERIES_RE.match(fixed_latex)
+    if match is None:
+        return None
+    variable, point = None, Integer(0)
+    rest = fixed_latex[match.end():]
+    if rest.startswith("_"):
+        subscript, end = read_script(rest, 1)
+        approach = APPROACH_RE.fullmatch(subscript)
+        if approach is not None:
+            variable, point = parse_cached(approach.group(1)), parse_point(approach.group(2))
+        else:
+            variable = parse_cached(subscript.strip())
+        rest = rest[end:].lstrip()
+    order = DEFAULT_SERIES_ORDER
+    if rest.startswith("^"):
+        text, end = read_script(rest, 1)
+        if not text.strip().isdigit():
+            raise ValueError(f"Series order must be a positive integer, got {text!r}")
+        order = int(text)
+        rest = rest[end:]
+    body = rest.strip()
+    if not body:
+        return None
+    expr = parse_cached(body)
+    if variable is None:
+        if len(expr.free_symbols) != 1:
+            raise ValueError("Series expansion needs a variable, e.g. \\operatorname{series}_{x=0}")
+        variable = next(iter(expr.free_symbols))
+    return TaylorSeries(expr, variable, point, order)
+
+
+def parse_equation(text):
+    lhs_latex, rhs_latex = text.split("=")
+    return Eq(parse_cached(lhs_latex.strip()), parse_cached(rhs_latex.strip()))
+
+
+def parse_input(fixed_latex):
+    """
+    解析预处理后的完整输入。
+    多个方程 (方程组) 解析为由 Eq 组成的 Tuple (见 systems.py)；
+    如果包含一个 '='，分别解析左右两边并构造方程，避免 latex2sympy 自动求解；
+    分割解析失败时回退到整体解析。
+    矩阵运算解析为未计算的 MatrixOperation (见 matrices.py)，
+    极限解析为 Limit，泰勒展开解析为未计算的 TaylorSeries (见 limits.py)。
+    """
+    if r"\begin" in fixed_latex:
+        operation = parse_matrix_operation(fixed_latex)
+        if operation is not None:
+            return operation
+
+    if fixed_latex.startswith(r"\lim"):
+        limit = parse_limit(fixed_latex)
+        if limit is not None:
+            return limit
+    if fixed_latex.startswith(r"\operatorname"):
+        series = parse_series(fixed_latex)
+        if series is not None:
+            return series
+
+    equations = split_system(fixed_latex)
+    if equations is not None:
+        return Tuple(*(parse_equation(equation) for equation in equations))
+
+    if "=" in fixed_latex:
+        parts = fixed_latex.split("=")
+        if len(parts) == 2:
+            lhs_latex = parts[0].strip()
+            rhs_latex = parts[1].strip()
+            try:
+                return Eq(parse_cached(lhs_latex), parse_cached(rhs_latex))
+            except Exception:
+                # 如果分割解析失败，回退到默认解析
+                pass
+    return parse_cached(fixed_latex)
@@ -0,0 +1,69 @@
+import logging
+import time
+
+from sympy import cancel, together, powsimp, factor_terms, trigsimp, simplify, count_ops
+from sympy.functions.elementary.trigonometric import TrigonometricFunction
+
+# 分级化简。
+# 完整的 simplify() 往往是整个流程中最慢的一步，即使结果已经是最简形式。
+# 这里先尝试几种便宜的化简，用复杂度 (count_ops，其次是字符串长度) 比较，
+# 只有便宜的化简都没有效果、并且时间预算还剩一半以上时，才升级到完整的 simplify()。
+
+CHEAP_PASSES = [
+    ("cancel", cancel),
+    ("together", together),
+    ("powsimp", powsimp),
+    ("factor_terms", factor_terms),
+    ("trigsimp", trigsimp),
+]
+
+# 运算次数不超过该值的表达式视为已经最简
+TRIVIAL_OPS = 2
+
+# 便宜的化简用掉的时间不超过预算的这个比例时，才升级到完整 simplify
+ESCALATE_FRACTION = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def complexity(expr):
+    """
+    表达式复杂度，越小越简单
+    """
+    return (count_ops(expr), len(str(expr)))
+
+
+def tiered_simplify(expr, budget=None):
+    """
+    分级化简，返回 (化简结果, 生效的级别)。
+    级别为 "none" (无需化简)、某个便宜化简的名字，或 "simplify"。
+    """
+    if not hasattr(expr, "free_symbols") or count_ops(expr) <= TRIVIAL_OPS:
+        return expr, "none"
+
+    start = time.perf_counter()
+    best, best_tier = expr, "none"
+    best_measure = complexity(expr)
+    for name, func in CHEAP_PASSES:
+        if name == "trigsimp" and not expr.has(TrigonometricFunction):
+            continue
+        try:
+            candidate = func(expr)
+        except Exception as e:
+            logger.warning("Simplify pass %s error: %s", name, e)
+            continue
+        measure = complexity(candidate)
+        if measure < best_measure:
+            best, best_tier, best_measure = candidate, name, measure
+
+    if best_tier != "none":
+        return best, best_tier
+
+    # 便宜的化简都没有效果：时间还够时升级到完整 simplify
+    elapsed = time.perf_counter() - start
+    if budget is not None and budget > 0 and elapsed > budget * ESCALATE_FRACTION:
+        return expr, "none"
+    result = simplify(expr)
+    if complexity(result) < best_measure:
+        return result, "simplify"
+    return expr, "none"
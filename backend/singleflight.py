@@ -0,0 +1,77 @@
+import asyncio
+from contextlib import contextmanager
+
+import metrics
+
+# 并发请求合并 (single-flight)。
+# 同一时刻多个客户端提交同一道题 (例如老师投影出题后全班同时提交) 时，
+# 只有第一个请求真正计算，其余请求等待同一个进行中的计算，得到相同的结果或错误。
+# 计算以独立的 Task 运行：发起计算的请求被取消 (客户端断开) 不会影响其他等待者。
+# 流式接口的计算在生成器中进行，用 lead() 登记，领头的流中断时等待者各自重新计算。
+
+
+class SingleFlight:
+    """
+    按键合并进行中的计算。level 作为指标标签，区分合并发生在哪一级 (latex / expr)
+    """
+
+    def __init__(self, level):
+        self.level = level
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def join(self, key):
+        """
+        等待同一个键的进行中计算并返回其结果 (出错时抛出同样的异常)。
+        没有进行中的计算，或者领头的计算被放弃时返回 None，由调用方自己计算
+        """
+        future = self._calls.get(key)
+        if future is None:
+            return None
+        metrics.COALESCED.inc(level=self.level)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                return None
+            raise
+
+    async def run(self, key, factory):
+        """
+        合并执行 factory() 返回的协程：已有相同键的计算时等待它，否则启动新的计算
+        """
+        result = await self.join(key)
+        if result is not None:
+            return result
+        task = asyncio.ensure_future(factory())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    @contextmanager
+    def lead(self, key):
+        """
+        登记一个由调用方自己完成的计算 (流式接口)，产出的 future 需要调用方 set_result。
+        代码块抛出异常时等待者收到同样的异常；被取消或中途退出时等待者各自重新计算
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            yield future
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            self._forget(key, future)
+
+    def _forget(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        # 没有等待者时也要取出异常，避免 "exception was never retrieved" 警告
+        if future.done() and not future.cancelled():
+            future.exception()
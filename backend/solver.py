@@ -0,0 +1,389 @@
+import re
+import hashlib
+import logging
+import time
+from contextlib import contextmanager
+
+from sympy import latex, srepr, Eq, Integral, Derivative, Limit, Float
+
+import metrics
+from budget import StageTimeout, stage_budget, time_limit
+from parsing import parse_input
+from equations import polynomial_form, generate_equation_steps, solve_equation
+from simplifier import tiered_simplify
+from integrals import integral_rule, generate_integral_steps, evaluate_integral, apply_limits
+from forms import lookup_integral, lookup_derivative
+from derivatives import derive
+from systems import is_system, system_latex, linear_form, generate_system_steps, solve_system, solution_latex
+from matrices import MatrixOperation, OPERATIONS, reduce_matrix
+from limits import TaylorSeries, evaluate_limit, expand_series
+from complexity import estimate_cost, admit
+from numeric import numeric_integral, solve_numeric, value_latex, value_fields, DEFAULT_SAMPLES
+
+logger = logging.getLogger(__name__)
+
+
+class StepRecorder(list):
+    """
+    步骤列表。每追加一步都会通过 emit 回调推送出去 (用于流式输出)
+    """
+    def __init__(self, emit=None):
+        super().__init__()
+        self._emit = emit
+
+    def append(self, step):
+        super().append(step)
+        if self._emit is not None:
+            self._emit({"type": "step", "index": len(self) - 1, "step": step})
+
+    def extend(self, steps):
+        for step in steps:
+            self.append(step)
+
+
+@contextmanager
+def run_stage(stage, emit=None, kind="other"):
+    """
+    在时间预算内执行一个阶段，并推送阶段开始/结束/超时的进度事件。
+    耗时按题型 kind 记入指标 (见 metrics.py)
+    """
+    if emit is not None:
+        emit({"type": "stage", "stage": stage, "status": "start"})
+    start = time.perf_counter()
+    try:
+        with time_limit(stage):
+            yield
+    except StageTimeout:
+        elapsed = time.perf_counter() - start
+        metrics.record(stage, kind, elapsed, timed_out=True)
+        if emit is not None:
+            emit({"type": "stage", "stage": stage, "status": "timeout", "elapsed": elapsed})
+        raise
+    elapsed = time.perf_counter() - start
+    metrics.record(stage, kind, elapsed)
+    if emit is not None:
+        emit({"type": "stage", "stage": stage, "status": "done", "elapsed": elapsed})
+
+
+def preprocess_latex(latex_str: str):
+    """
+    规范化输入的 LaTeX 字符串，结果同时作为一级缓存的键
+    """
+    # 1. 替换 latex2sympy2 可能不支持的间距符号
+    fixed_latex = latex_str.replace(r"\:", " ").replace(r"\,", " ")
+    # 2. 确保 dx 前面有空格 (可选，视解析器情况而定)
+
+    # 预处理：把类似 '{=}' 这样的带大括号等号规范为 '='，以避免分割错误
+    fixed_latex = re.sub(r'\{\s*=\s*\}', '=', fixed_latex)
+    # 合并连续空白，使写法上只差空格的输入命中同一个缓存项
+    fixed_latex = re.sub(r'\s+', ' ', fixed_latex)
+    return fixed_latex.strip()
+
+
+def expr_key(expr):
+    """
+    解析结果的规范键：srepr 的哈希。写法不同但含义相同的输入共享同一个键
+    """
+    return hashlib.sha256(srepr(expr).encode("utf-8")).hexdigest()
+
+
+def parse_latex(fixed_latex: str):
+    """
+    把预处理后的 LaTeX 解析为 SymPy 对象 (parse 阶段)
+    """
+    logger.debug("Processed LaTeX: %s", fixed_latex)
+
+    # 1. 解析 LaTeX 为 SymPy 对象
+    # latex2sympy2 能够处理积分、导数、极限等符号
+    start = time.perf_counter()
+    try:
+        with time_limit("parse"):
+            # 特殊处理方程：如果包含 '='，分别解析左右两边，避免 latex2sympy 自动求解 (见 parsing.py)
+            expr = parse_input(fixed_latex)
+    except StageTimeout:
+        # 解析阶段没有可返回的部分结果
+        metrics.record("parse", metrics.latex_kind(fixed_latex), time.perf_counter() - start, timed_out=True)
+        raise TimeoutError(f"Parsing exceeded {stage_budget('parse')}s")
+    except Exception as e:
+        metrics.record("parse", metrics.latex_kind(fixed_latex), time.perf_counter() - start)
+        logger.info("Latex parsing error: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+        raise e
+    metrics.record("parse", metrics.expr_kind(expr), time.perf_counter() - start)
+
+    logger.debug("Parsed expression type: %s", type(expr))
+    logger.debug("Parsed expression: %s", expr)
+    return expr
+
+
+def parse_job(fixed_latex: str):
+    """
+    工作进程任务：解析并返回 (表达式, 规范键, 代价估计)。代价用于准入控制和选择通道 (见 complexity.py)
+    """
+    expr = parse_latex(fixed_latex)
+    with metrics.timed("analyze", metrics.expr_kind(expr)):
+        cost = estimate_cost(expr)
+    return expr, expr_key(expr), cost
+
+
+def solve_job(fixed_latex: str):
+    """
+    工作进程任务：解析并求解，一次往返完成 (离线批量求解用，见 bulk.py)，返回 (规范键, 结果)
+    """
+    expr = parse_latex(fixed_latex)
+    admit(estimate_cost(expr))
+    return expr_key(expr), solve_expr(expr)
+
+
+def numeric_fallback(expr, emit=None, kind="other"):
+    """
+    符号定积分超时时的数值积分结果 {"value", "error"}，无法数值计算时返回 None
+    """
+    if not isinstance(expr, Integral):
+        return None
+    try:
+        with run_stage("numeric", emit, kind):
+            found = numeric_integral(expr)
+    except StageTimeout:
+        return None
+    except Exception as e:
+        logger.info("Numeric fallback failed: %s", e)
+        return None
+    if found is None:
+        return None
+    value, error = found
+    return {**value_fields(value), "error": error, "latex": value_latex(value)}
+
+
+def solve_expr(expr, emit=None):
+    """
+    对解析好的表达式生成步骤、求解/运算、化简。
+    该函数是纯 CPU 计算，会在工作进程中执行 (见 worker.py)。
+    每个阶段都有时间预算 (见 budget.py)，超时后返回已完成的部分结果，并标记 partial。
+    传入 emit 回调时，每个步骤和阶段进度产生后立即推送 (用于流式接口)。
+    """
+    # 2. 判断是否为方程 (Equality)
+    steps = StepRecorder(emit)
+    steps.append(r"\text{1. 解析输入: } " + (system_latex(expr) if is_system(expr) else latex(expr)))
+    timeout_stage = None
+    simplify_tier = None
+    rule = None
+    matched = None
+    derivation = None
+    numeric = None
+    kind = metrics.expr_kind(expr)
+    
+    if is_system(expr):
+        # 方程组：线性方程组整理为 A x = b 一次，步骤生成和求解共用 (见 systems.py)
+        steps.append(r"\text{2. 识别为方程组，进行求解}")
+        # 与方程相同：整理为 A x = b 和消元求解在同一个 solve 阶段预算内完成，步骤生成复用整理结果
+        form = None
+        try:
+            with run_stage("solve", emit, kind):
+                form = linear_form(expr)
+                solutions = solve_system(expr, form)
+            with metrics.timed("latex", kind):
+                result_latex = solution_latex(solutions, form.symbols if form is not None else None)
+            result_step = r"\text{3. 得到解: } " + result_latex
+        except StageTimeout as e:
+            timeout_stage = e.stage
+            result_latex = latex(expr)
+            result_step = r"\text{3. 求解超时，未能得到解}"
+
+        try:
+            with run_stage("steps", emit, kind):
+                system_steps = generate_system_steps(expr, form)
+        except StageTimeout as e:
+            timeout_stage = timeout_stage or e.stage
+            system_steps = []
+        if system_steps:
+            steps.append(r"\text{--- 方程组求解步骤 ---}")
+            steps.extend(system_steps)
+            steps.append(r"\text{------------------}")
+        steps.append(result_step)
+    elif isinstance(expr, MatrixOperation):
+        # 矩阵运算：消元一次同时得到步骤和结果，大的数值矩阵交给 NumPy (见 matrices.py)
+        steps.append(r"\text{2. 识别为矩阵运算: " + OPERATIONS[expr.operation] + "}")
+        try:
+            with run_stage("solve", emit, kind):
+                reduction = reduce_matrix(expr)
+            if reduction.steps:
+                steps.append(r"\text{--- 矩阵运算步骤 ---}")
+                steps.extend(reduction.steps)
+                steps.append(r"\text{------------------}")
+            result_latex = reduction.result
+            steps.append(r"\text{3. 运算结果: } " + result_latex)
+        except StageTimeout as e:
+            timeout_stage = e.stage
+            result_latex = latex(expr)
+            steps.append(r"\text{3. 运算超时，未能得到结果}")
+    elif isinstance(expr, (Limit, TaylorSeries)):
+        # 极限与泰勒展开：先试代入、约分、展开等快速方法，步骤和结果一次得到；
+        # 结果已经是最简形式，不再化简 (见 limits.py)
+        name = "极限" if isinstance(expr, Limit) else "泰勒展开"
+        steps.append(r"\text{2. 识别为" + name + "，进行计算}")
+        try:
+            with run_stage("solve", emit, kind):
+                evaluation = evaluate_limit(expr) if isinstance(expr, Limit) else expand_series(expr)
+            if evaluation.steps:
+                steps.append(r"\text{--- " + name + "步骤 ---}")
+                steps.extend(evaluation.steps)
+                steps.append(r"\text{------------------}")
+            result_latex = evaluation.latex
+            steps.append(r"\text{3. 运算结果: } " + result_latex)
+        except StageTimeout as e:
+            timeout_stage = e.stage
+            result_latex = latex(expr)
+            steps.append(r"\text{3. 运算超时，未能得到结果}")
+    elif isinstance(expr, Eq):
+        # 如果是方程，则求解
+        steps.append(r"\text{2. 识别为方程，进行求解}")
+        
+        # 先求解：整理为多项式形式 (高次、大系数时构造 Poly 本身就很慢) 也计入 solve 阶段的预算，
+        # 整理结果随后给步骤生成复用；步骤仍然排在解集之前输出
+        form = None
+        try:
+            with run_stage("solve", emit, kind):
+                form = polynomial_form(expr)
+                # 多项式方程走快速路径，其余情况回退到 solve (见 equations.py)
+                solutions = solve_equation(expr, form)
+            # 将解集转换为 LaTeX
+            with metrics.timed("latex", kind):
+                result_latex = latex(solutions)
+            result_step = r"\text{3. 得到解集: } " + result_latex
+        except StageTimeout as e:
+            # 求解超时：返回整理后的方程本身
+            timeout_stage = e.stage
+            result_latex = latex(expr)
+            result_step = r"\text{3. 求解超时，未能得到解集}"
+
+        # --- 尝试生成方程求解步骤 ---
+        try:
+            with run_stage("steps", emit, kind):
+                eq_steps = generate_equation_steps(expr, form)
+        except StageTimeout as e:
+            timeout_stage = timeout_stage or e.stage
+            eq_steps = []
+        if eq_steps:
+            steps.append(r"\text{--- 方程求解步骤 ---}")
+            steps.extend(eq_steps)
+            steps.append(r"\text{------------------}")
+        # --------------------------
+        steps.append(result_step)
+    else:
+        # 3. 如果是表达式，执行核心运算
+        steps.append(r"\text{2. 识别为表达式，执行运算}")
+        
+        try:
+            with run_stage("steps", emit, kind):
+                # --- 尝试生成详细步骤 (针对积分) ---
+                if isinstance(expr, Integral):
+                    # 先查常见形式的模板表 (见 forms.py)，未命中时才计算规则树；
+                    # 规则树同时用于生成步骤和计算结果
+                    matched = lookup_integral(expr)
+                    if matched is not None:
+                        integral_details = matched.steps
+                    else:
+                        rule = integral_rule(expr)
+                        integral_details = generate_integral_steps(expr, rule)
+                    if integral_details:
+                        steps.append(r"\text{--- 积分步骤详解 ---}")
+                        steps.extend(integral_details)
+                        steps.append(r"\text{------------------}")
+                
+                # --- 尝试生成详细步骤 (针对求导) ---
+                elif isinstance(expr, Derivative):
+                    # 先查表，未命中时递归求导，步骤和导函数一次得到 (见 derivatives.py)
+                    matched = lookup_derivative(expr)
+                    if matched is not None:
+                        diff_details = matched.steps
+                    else:
+                        derivation = derive(expr)
+                        diff_details = derivation.steps if derivation is not None else []
+                    if diff_details:
+                        steps.append(r"\text{--- 求导步骤 ---}")
+                        steps.extend(diff_details)
+                        steps.append(r"\text{------------------}")
+                # --------------------------------
+        except StageTimeout as e:
+            timeout_stage = e.stage
+            steps.append(r"\text{(步骤生成超时，已跳过)}")
+        
+        try:
+            with run_stage("doit", emit, kind):
+                result = None
+                if matched is not None:
+                    # 查表命中：直接使用模板给出的原函数/导函数
+                    result = matched.result if isinstance(expr, Derivative) else apply_limits(expr, matched.result)
+                elif derivation is not None:
+                    result = derivation.result
+                elif isinstance(expr, Integral):
+                    # 规则树完整时直接由它得到原函数，不再重复积分
+                    result = evaluate_integral(expr, rule)
+                if result is None:
+                    # .doit() 会强制执行未计算的操作（如 Integral, Derivative, Limit）
+                    result = expr.doit()
+        except StageTimeout as e:
+            # 运算超时：返回未计算的表达式，定积分附带数值积分结果作为后备
+            timeout_stage = e.stage
+            result = expr
+            steps.append(r"\text{3. 运算超时，未能得到结果}")
+            numeric = numeric_fallback(expr, emit, kind)
+            if numeric is not None:
+                steps.append(r"\text{数值积分结果: } \approx " + numeric.pop("latex"))
+        else:
+            steps.append(r"\text{3. 运算结果: } " + latex(result))
+        
+        final_result = result
+        if timeout_stage != "doit":
+            try:
+                with run_stage("simplify", emit, kind):
+                    # 4. 可选：化简结果
+                    # 先尝试便宜的化简，必要时才使用完整的 simplify (见 simplifier.py)
+                    final_result, simplify_tier = tiered_simplify(result, stage_budget("simplify"))
+                if final_result != result:
+                    steps.append(r"\text{4. 化简结果: } " + latex(final_result))
+            except StageTimeout as e:
+                # 化简超时：返回未化简的 doit() 结果
+                timeout_stage = e.stage
+                final_result = result
+        
+        # 5. 将结果转换回 LaTeX
+        with metrics.timed("latex", kind):
+            result_latex = latex(final_result)
+
+    logger.debug("Calculated Result: %s", result_latex)
+    
+    response = {"result": result_latex, "steps": list(steps), "partial": timeout_stage is not None}
+    if timeout_stage is not None:
+        response["timeout_stage"] = timeout_stage
+    if simplify_tier is not None:
+        response["simplify_tier"] = simplify_tier
+    if numeric is not None:
+        response["numeric"] = numeric
+    return response
+
+
+def solve_numeric_expr(expr, x_range=None, samples=DEFAULT_SAMPLES):
+    """
+    工作进程任务：数值模式求解 (见 numeric.py)，在 numeric 阶段的时间预算内执行
+    """
+    try:
+        with run_stage("numeric", kind=metrics.expr_kind(expr)):
+            return solve_numeric(expr, x_range, samples)
+    except StageTimeout:
+        raise TimeoutError(f"Numeric evaluation exceeded {stage_budget('numeric')}s")
+
+
+def solve_latex(latex_str: str):
+    """
+    完整的求解流程：预处理、解析、求解，不经过缓存
+    """
+    logger.debug("Received LaTeX: %s", latex_str)
+    return solve_expr(parse_latex(preprocess_latex(latex_str)))
+
+
+def solve_expr_stream(expr, queue):
+    """
+    工作进程任务：求解，并把步骤和进度事件逐个放入队列 (multiprocessing.Manager 队列)
+    """
+    return solve_expr(expr, emit=queue.put)
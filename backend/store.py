@@ -0,0 +1,238 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from importlib import metadata
+
+from encoding import dumps
+
+# 持久化的结果存储。
+# 结果按内容寻址：键是解析后表达式 srepr 的哈希 (见 solver.expr_key) 加上求解流程的版本，
+# 值是结果 LaTeX 和完整响应 (步骤等)；另有规范化 LaTeX -> 表达式键的索引。
+# 存储是一个 SQLite 文件 (WAL 模式)，同一台机器上的多个服务进程 (uvicorn --workers) 共用，
+# 一个进程算出的结果其他进程和重启后的进程都能直接命中。
+# 求解流程的版本由参与解析、步骤生成和求解的模块源码及 SymPy/latex2sympy2 的版本计算得到，
+# 代码改动后旧版本的结果自动失效，打开存储时删除。
+# 每个结果记录被请求的次数，启动时把请求最多的 N 个结果预先载入内存 (见 cache.py)。
+# 持久化需要显式开启 (见 data_path)：默认不在当前目录下写任何文件。
+# 读取在调用方 (事件循环) 中直接执行；写入 (结果、LaTeX 索引、请求次数) 只放入内存队列，
+# 由后台线程用自己的连接执行，排队的写入合并为一次提交，提交和等待锁都不阻塞事件循环。
+
+DEFAULT_RESULTS_PATH = "feng_math_results.sqlite3"
+# 后台线程一次提交最多合并的写入数
+WRITE_BATCH = 256
+# 本地数据库 (结果存储、任务队列) 所在的目录
+DATA_DIR_ENV = "FENG_MATH_DATA_DIR"
+
+# 影响解析结果、步骤和答案的模块
+PIPELINE_MODULES = [
+    "parsing", "solver", "equations", "systems", "matrices",
+    "integrals", "forms", "derivatives", "limits", "simplifier",
+]
+PIPELINE_PACKAGES = ["sympy", "latex2sympy2"]
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger(__name__)
+
+
+def data_path(env_name, filename):
+    """
+    持久化文件的路径：环境变量 env_name 给出路径时直接使用；否则设置了 FENG_MATH_DATA_DIR 时
+    放在该目录下 (必要时创建)；都没有设置时返回 ":memory:"，不写入磁盘
+    """
+    path = os.environ.get(env_name)
+    if path:
+        return path
+    data_dir = os.environ.get(DATA_DIR_ENV)
+    if not data_dir:
+        return ":memory:"
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, filename)
+
+
+@lru_cache(maxsize=1)
+def pipeline_version():
+    """
+    求解流程的版本：PIPELINE_MODULES 的源码和 PIPELINE_PACKAGES 版本号的哈希
+    """
+    digest = hashlib.sha256()
+    for name in PIPELINE_MODULES:
+        with open(os.path.join(_BACKEND_DIR, name + ".py"), "rb") as handle:
+            digest.update(handle.read())
+    for package in PIPELINE_PACKAGES:
+        try:
+            digest.update(f"{package}=={metadata.version(package)}".encode("utf-8"))
+        except metadata.PackageNotFoundError:
+            digest.update(f"{package} missing".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class ResultStore:
+    """
+    SQLite 中的结果表和 LaTeX 索引，只读写当前版本的条目。
+    读取是同步的；put/put_key/add_hits 只把写入放入队列，由后台线程执行，close() 时写完队列中剩余的写入
+    """
+
+    def __init__(self, path, version=None):
+        self.path = path
+        self.version = version or pipeline_version()
+        # 其他进程正在写入时最多等待 timeout 秒
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # 缓存丢失最近的写入无关紧要，不必每次提交都等待落盘
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                body TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                last_used REAL,
+                PRIMARY KEY (key, version)
+            )
+            """
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS latex_keys (
+                latex TEXT NOT NULL,
+                version TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (latex, version)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_hits ON results (version, hits)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS latex_keys_key ON latex_keys (key, version)")
+        self._db.commit()
+        self.invalidated = self.purge_stale()
+        self._writes = queue.SimpleQueue()
+        # 第一次写入时才启动后台线程 (在此之前 fork 出的工作进程不会复制到线程)
+        self._writer = None
+
+    def purge_stale(self):
+        """
+        删除其他版本的条目，返回删除的结果数目
+        """
+        cursor = self._db.execute("DELETE FROM results WHERE version != ?", (self.version,))
+        self._db.execute("DELETE FROM latex_keys WHERE version != ?", (self.version,))
+        self._db.commit()
+        if cursor.rowcount:
+            logger.info("Invalidated %d stored results from other pipeline versions", cursor.rowcount)
+        return cursor.rowcount
+
+    def get(self, key):
+        row = self._db.execute(
+            "SELECT body FROM results WHERE key = ? AND version = ?", (key, self.version)
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def get_key(self, latex):
+        row = self._db.execute(
+            "SELECT key FROM latex_keys WHERE latex = ? AND version = ?", (latex, self.version)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, key, result):
+        # 在调用方序列化，之后对 result 的修改不影响写入的内容
+        self._enqueue(self._write_result, key, result["result"], dumps(result).decode("utf-8"), time.time())
+
+    def put_key(self, latex, key):
+        self._enqueue(self._write_key, latex, key)
+
+    def add_hits(self, hits):
+        """
+        累加请求次数，hits 为 {键: 次数}
+        """
+        self._enqueue(self._write_hits, dict(hits), time.time())
+
+    def _enqueue(self, method, *args):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="result-store-writer", daemon=True)
+            self._writer.start()
+        self._writes.put((method, args))
+
+    def _write_result(self, db, key, result, body, created):
+        # 另一个进程可能已经写入了同一个结果：只更新内容，保留请求次数
+        db.execute(
+            """
+            INSERT INTO results (key, version, result, body, created) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key, version) DO UPDATE SET result = excluded.result, body = excluded.body
+            """,
+            (key, self.version, result, body, created),
+        )
+
+    def _write_key(self, db, latex, key):
+        db.execute(
+            "INSERT OR REPLACE INTO latex_keys (latex, version, key) VALUES (?, ?, ?)",
+            (latex, self.version, key),
+        )
+
+    def _write_hits(self, db, hits, now):
+        db.executemany(
+            "UPDATE results SET hits = hits + ?, last_used = ? WHERE key = ? AND version = ?",
+            [(count, now, key, self.version) for key, count in hits.items()],
+        )
+
+    def _write_loop(self):
+        """
+        后台线程：取出排队的写入，合并为一次提交；收到 None 时写完之前的写入后退出
+        """
+        db = sqlite3.connect(self.path, timeout=5.0)
+        db.execute("PRAGMA synchronous=NORMAL")
+        running = True
+        while running:
+            batch = [self._writes.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for item in batch:
+                    if item is None:
+                        running = False
+                        continue
+                    method, args = item
+                    method(db, *args)
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning("Result store write error, dropped %d writes: %s", len(batch), e)
+                db.rollback()
+        db.close()
+
+    def top(self, limit):
+        """
+        请求次数最多的 limit 个结果，返回 [(键, 结果, [LaTeX 键...])]，按请求次数从多到少排列
+        """
+        rows = self._db.execute(
+            "SELECT key, body FROM results WHERE version = ? ORDER BY hits DESC LIMIT ?", (self.version, limit)
+        ).fetchall()
+        entries = []
+        for key, body in rows:
+            latex_keys = [
+                row[0] for row in self._db.execute(
+                    "SELECT latex FROM latex_keys WHERE key = ? AND version = ?", (key, self.version)
+                )
+            ]
+            entries.append((key, json.loads(body), latex_keys))
+        return entries
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM results WHERE version = ?", (self.version,)).fetchone()[0]
+
+    def close(self):
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        self._db.close()
@@ -0,0 +1,244 @@
+import logging
+from fractions import Fraction
+
+import numpy as np
+from sympy import latex, linsolve, solve, linear_eq_to_matrix, Eq, Tuple, Float, FiniteSet, S
+from sympy.solvers.solveset import NonlinearError
+
+# 方程组求解。
+# 多个方程以 sympy.Tuple 的形式从解析层传入 (见 parsing.split_system)。
+# 线性方程组：系数全是浮点数时用 NumPy 求解，否则用 linsolve 给出精确解 (含无穷多解的参数形式)；
+# 步骤由对增广矩阵的高斯消元生成，系数为有理数时用 Fraction 精确计算。
+# 只有非线性方程组才调用通用的 solve()。
+
+# 未知数不超过这个数目时，每消去一列都展示一次增广矩阵
+MAX_MATRIX_STEPS = 6
+
+logger = logging.getLogger(__name__)
+
+
+class LinearSystem:
+    """
+    线性方程组 A x = b：未知数、系数矩阵、常数列 (SymPy Matrix)
+    """
+    def __init__(self, symbols, A, b):
+        self.symbols = symbols
+        self.A = A
+        self.b = b
+
+    @property
+    def shape(self):
+        return self.A.shape
+
+    def is_float(self):
+        # 系数中含浮点数：精确求解没有意义，走 NumPy
+        return any(isinstance(v, Float) for v in list(self.A) + list(self.b))
+
+    def is_rational(self):
+        return all(v.is_Rational for v in list(self.A) + list(self.b))
+
+
+def is_system(expr):
+    return isinstance(expr, Tuple) and len(expr) > 0 and all(isinstance(eq, Eq) or eq in (S.true, S.false) for eq in expr)
+
+
+def system_latex(system):
+    return r"\begin{cases} " + r" \\ ".join(latex(eq) for eq in system) + r" \end{cases}"
+
+
+def system_symbols(equations):
+    return sorted(set().union(*(eq.free_symbols for eq in equations)), key=lambda s: s.name)
+
+
+def _equations(system):
+    # 恒成立的方程 (例如 1 = 1) 不提供约束
+    return [eq for eq in system if eq is not S.true]
+
+
+def linear_form(system):
+    """
+    尝试把方程组整理为 A x = b，不是线性方程组时返回 None
+    """
+    equations = _equations(system)
+    if any(eq is S.false for eq in equations):
+        return None
+    symbols = system_symbols(equations)
+    if not symbols:
+        return None
+    # latex2sympy2 对带下标的未知数会留下未求值的乘积 (例如 -1*3*x_2)，先求值再取系数
+    try:
+        A, b = linear_eq_to_matrix([(eq.lhs - eq.rhs).doit() for eq in equations], symbols)
+    except NonlinearError:
+        return None
+    return LinearSystem(symbols, A, b)
+
+
+def numeric_solution(form: LinearSystem):
+    """
+    NumPy 求解方阵满秩的线性方程组，返回 {未知数: 值}；不满足条件时返回 None
+    """
+    rows, cols = form.shape
+    if rows != cols:
+        return None
+    A = np.array(form.A.tolist(), dtype=float)
+    b = np.array(form.b.tolist(), dtype=float).ravel()
+    if np.linalg.matrix_rank(A) < cols:
+        return None
+    values = np.linalg.solve(A, b)
+    return {symbol: Float(value) for symbol, value in zip(form.symbols, values)}
+
+
+def solve_system(system, form=None, numeric=False):
+    """
+    求解方程组。线性方程组返回 {未知数: 值} 的列表 (无解时为空列表，无穷多解时含自由未知数)；
+    form 为 linear_form 的结果 (已经计算过时直接传入)
+    """
+    equations = _equations(system)
+    if any(eq is S.false for eq in equations):
+        return []
+    if form is None:
+        form = linear_form(system)
+    if form is None:
+        symbols = system_symbols(equations)
+        return solve(equations, symbols, dict=True)
+
+    if numeric or form.is_float():
+        found = numeric_solution(form)
+        if found is not None:
+            return [found]
+    solutions = linsolve((form.A, form.b), form.symbols)
+    if not isinstance(solutions, FiniteSet):
+        return []
+    return [dict(zip(form.symbols, values)) for values in solutions]
+
+
+def solution_latex(solutions, symbols=None):
+    """
+    解的 LaTeX：x = 1, \\; y = 2；多组解用“或”连接，自由未知数标为任意值，无解为空集
+    """
+    if not solutions:
+        return r"\emptyset"
+    groups = []
+    for solution in solutions:
+        keys = symbols if symbols is not None else list(solution)
+        parts = []
+        free = []
+        for symbol in keys:
+            if symbol not in solution:
+                continue
+            if solution[symbol] == symbol:
+                # 无穷多解时的自由未知数
+                free.append(latex(symbol))
+            else:
+                parts.append(latex(symbol) + " = " + latex(solution[symbol]))
+        if free:
+            parts.append(", ".join(free) + r" \text{ 为任意值}")
+        groups.append(r", \; ".join(parts))
+    return r" \quad \text{或} \quad ".join(groups)
+
+
+def format_number(value):
+    # 直接拼接 LaTeX，比逐个构造 Rational 再调用 latex() 快得多
+    if isinstance(value, Fraction):
+        if value.denominator == 1:
+            return str(value.numerator)
+        sign = "-" if value < 0 else ""
+        return f"{sign}\\frac{{{abs(value.numerator)}}}{{{value.denominator}}}"
+    if value == 0:
+        # 避免输出 -0
+        return "0"
+    text = f"{value:.6g}"
+    if "e" in text:
+        mantissa, exponent = text.split("e")
+        return f"{mantissa} \\cdot 10^{{{int(exponent)}}}"
+    return text
+
+
+def _matrix_latex(rows, n):
+    # 增广矩阵，竖线分隔常数列
+    body = r" \\ ".join(" & ".join(format_number(v) for v in row) for row in rows)
+    return r"\left[\begin{array}{" + "c" * n + "|c}" + body + r"\end{array}\right]"
+
+
+def _row_op(target, factor, source):
+    # R_i \to R_i - k R_j
+    sign = "-" if factor > 0 else "+"
+    magnitude = abs(factor)
+    coeff = "" if magnitude == 1 else format_number(magnitude)
+    return f"R_{{{target + 1}}} \\to R_{{{target + 1}}} {sign} {coeff}R_{{{source + 1}}}"
+
+
+def elimination_steps(form: LinearSystem):
+    """
+    高斯-约当消元的步骤：每消去一列记录一次行变换 (以及较小方程组的增广矩阵)
+    """
+    exact = form.is_rational()
+    convert = (lambda v: Fraction(int(v.p), int(v.q))) if exact else (lambda v: float(v))
+    rows, cols = form.shape
+    matrix = [[convert(form.A[i, j]) for j in range(cols)] + [convert(form.b[i])] for i in range(rows)]
+    show_matrix = cols <= MAX_MATRIX_STEPS
+    eps = 0 if exact else 1e-12
+
+    steps = [r"\text{写出增广矩阵 } [A|b] \text{，未知数顺序: } " + ", ".join(latex(s) for s in form.symbols)]
+    if show_matrix:
+        steps.append(r"\quad " + _matrix_latex(matrix, cols))
+
+    pivot_row = 0
+    for col in range(cols):
+        if pivot_row >= rows:
+            break
+        # 选主元：精确计算时取第一个非零元，浮点计算时取绝对值最大的元素
+        candidates = [r for r in range(pivot_row, rows) if abs(matrix[r][col]) > eps]
+        if not candidates:
+            continue
+        pivot = candidates[0] if exact else max(candidates, key=lambda r: abs(matrix[r][col]))
+        ops = []
+        if pivot != pivot_row:
+            matrix[pivot], matrix[pivot_row] = matrix[pivot_row], matrix[pivot]
+            ops.append(f"R_{{{pivot_row + 1}}} \\leftrightarrow R_{{{pivot + 1}}}")
+        lead = matrix[pivot_row][col]
+        if lead != 1:
+            matrix[pivot_row] = [v / lead for v in matrix[pivot_row]]
+            ops.append(f"R_{{{pivot_row + 1}}} \\to {format_number(1 / lead)} R_{{{pivot_row + 1}}}")
+        for r in range(rows):
+            factor = matrix[r][col]
+            if r == pivot_row or abs(factor) <= eps:
+                continue
+            matrix[r] = [v - factor * p for v, p in zip(matrix[r], matrix[pivot_row])]
+            ops.append(_row_op(r, factor, pivot_row))
+        if ops:
+            steps.append(r"\text{消去 } " + latex(form.symbols[col]) + r" \text{: } " + r", \; ".join(ops))
+            if show_matrix:
+                steps.append(r"\quad " + _matrix_latex(matrix, cols))
+        pivot_row += 1
+
+    # 出现 0 = c (c ≠ 0) 的行说明方程组无解
+    inconsistent = any(all(abs(v) <= eps for v in row[:-1]) and abs(row[-1]) > eps for row in matrix)
+    if inconsistent:
+        steps.append(r"\text{出现 } 0 = c \ (c \neq 0) \text{ 的行，方程组无解}")
+    elif pivot_row < cols:
+        steps.append(r"\text{系数矩阵的秩 } " + str(pivot_row) + r" \text{ 小于未知数个数 } " + str(cols)
+                     + r"\text{，方程组有无穷多解}")
+    else:
+        steps.append(r"\text{化为行最简形，直接读出解}")
+    return steps
+
+
+def generate_system_steps(system, form=None):
+    """
+    尝试生成方程组求解步骤
+    """
+    steps = []
+    try:
+        if form is None:
+            form = linear_form(system)
+        if form is None:
+            steps.append(r"\text{这是一个非线性方程组，使用代入/消元法求解}")
+            return steps
+        rows, cols = form.shape
+        steps.append(r"\text{这是一个 } " + str(rows) + r" \text{ 个方程、} " + str(cols)
+                     + r" \text{ 个未知数的线性方程组，使用高斯消元法}")
+        steps.extend(elimination_steps(form))
+    except Exception as e:
+        logger.warning("System step error: %s", e)
+    return steps
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 后端模块按扁平方式互相导入 (from budget import ...)，测试时把 backend 目录加入搜索路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+import time
+
+from sympy import CRootOf, sqrt, Symbol
+
+import solver
+
+from equations import polynomial_form, solve_equation
+from parsing import parse_input
+
+x = Symbol("x")
+
+
+def test_algebraic_coefficient():
+    # 系数含 sqrt(2) 时 Poly 的域为 EX，不支持 real_roots
+    eq = parse_input(r"x^5 - \sqrt{2} x - 1 = 0")
+    assert polynomial_form(eq).poly.domain.is_EX
+    solutions = solve_equation(eq)
+    assert len(solutions) == 5
+    for solution in solutions:
+        assert abs(complex((x**5 - sqrt(2)*x - 1).subs(x, solution))) < 1e-9
+    assert len([s for s in solutions if s.is_real]) == 1
+
+
+def test_rational_quintic_keeps_exact_real_roots():
+    solutions = solve_equation(parse_input(r"x^5 - x - 1 = 0"))
+    assert len(solutions) == 5
+    assert isinstance(solutions[0], CRootOf)
+
+
+def test_polynomial_form_counts_against_solve_budget(monkeypatch):
+    # 整理多项式形式很慢时应当在 solve 阶段超时，而不是不受预算限制
+    def slow_form(eq):
+        time.sleep(3)
+
+    monkeypatch.setenv("FENG_MATH_BUDGET_SOLVE", "1")
+    monkeypatch.setattr(solver, "polynomial_form", slow_form)
+    start = time.perf_counter()
+    response = solver.solve_expr(parse_input(r"x^2 - 1 = 0"))
+    assert time.perf_counter() - start < 2.5
+    assert response["partial"] and response["timeout_stage"] == "solve"
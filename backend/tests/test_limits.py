@@ -0,0 +1,40 @@
+from sympy import Limit, Rational, Symbol, cos, exp, log, nan, oo, sin, tan, zoo, AccumBounds
+
+from limits import _LimitSolver, evaluate_limit
+
+x = Symbol("x")
+
+
+def assert_defined(value):
+    assert value is None or not value.has(nan, zoo, AccumBounds)
+
+
+def test_oscillating_numerator_is_not_zero():
+    # tan x 在 x → ∞ 时振荡无界，首项系数是 AccumBounds，不能按 x^{-2} → 0 得出 0
+    for f in (tan(x) / x**2, (tan(x) - sin(x)) / x**3):
+        expr = Limit(f, x, oo)
+        assert _LimitSolver(expr).leading_term() == (False, None)
+        result = evaluate_limit(expr).result
+        assert result != 0
+        assert_defined(result)
+
+
+def test_one_to_infinity():
+    for direction in ("+-", "+"):
+        expr = Limit(cos(x)**(1 / x**2), x, 0, direction)
+        done, value = _LimitSolver(expr).leading_term()
+        assert not done or value == exp(Rational(-1, 2))
+        assert evaluate_limit(expr).result == exp(Rational(-1, 2))
+
+
+def test_log_cos():
+    expr = Limit(log(cos(x)) / x**2, x, 0, "+-")
+    done, value = _LimitSolver(expr).leading_term()
+    assert not done or value == Rational(-1, 2)
+    assert evaluate_limit(expr).result == Rational(-1, 2)
+
+
+def test_oscillation_does_not_exist():
+    result = evaluate_limit(Limit(sin(x), x, oo))
+    assert result.result is None
+    assert result.latex == r"\text{不存在}"
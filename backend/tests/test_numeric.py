@@ -0,0 +1,47 @@
+import pytest
+from sympy import Integral, Symbol, sqrt, tan, pi
+
+from numeric import numeric_integral
+from solver import numeric_fallback, parse_latex, preprocess_latex, solve_numeric_expr
+
+x = Symbol("x")
+
+
+@pytest.mark.parametrize("integral", [
+    Integral(1 / x, (x, -1, 1)),
+    Integral(1 / x, (x, 0, 1)),
+    Integral(tan(x), (x, 0, 3)),
+])
+def test_divergent_integrals_are_not_numbers(integral):
+    with pytest.raises(ValueError):
+        numeric_integral(integral)
+
+
+def test_integrable_endpoint_singularity():
+    value, error = numeric_integral(Integral(1 / sqrt(x), (x, 0, 1)))
+    assert abs(value - 2) < 1e-3
+    assert error < 1e-3
+
+
+def test_smooth_integral():
+    value, error = numeric_integral(Integral(x**2, (x, 0, 1)))
+    assert abs(value - 1 / 3) < 1e-12
+
+
+def test_double_integral():
+    response = solve_numeric_expr(parse_latex(preprocess_latex(r"\int_0^1\int_0^1 xy\,dx\,dy")))
+    assert response["value"] == pytest.approx(0.25)
+
+
+def test_complex_valued_integrand():
+    # sqrt(1-x) 在 (1, 2] 上取虚数值，积分为 2/3 + 2i/3
+    response = solve_numeric_expr(parse_latex(preprocess_latex(r"\int_0^2\sqrt{1-x}dx")))
+    assert response["value"] is None
+    assert response["complex"]["re"] == pytest.approx(2 / 3, abs=1e-8)
+    assert response["complex"]["im"] == pytest.approx(2 / 3, abs=1e-8)
+    assert "i" in response["result"]
+
+
+def test_complex_fallback():
+    found = numeric_fallback(Integral(sqrt(1 - x), (x, 0, 2)))
+    assert found["value"] is None and found["complex"]["im"] == pytest.approx(2 / 3, abs=1e-8)
@@ -0,0 +1,44 @@
+import pytest
+from sympy import log, simplify
+
+from benchmarks.corpus import all_problems
+from latex2sympy2 import latex2sympy
+from parsing import FastParseError, fast_parse, split_system
+from solver import preprocess_latex
+
+# 函数幂次和参数括号的各种写法，两条路径最容易不一致的地方
+EXTRA = [
+    r"\sin{x}^2", r"\sin(x)^2", r"\sin\left(x\right)^2", r"\sin x^2", r"\sin^2(x)", r"\sin^2{x}^3",
+    r"\cos{2x}^{3} + 1", r"\ln(x)^2", r"\tan^{3} x + \cos x", r"e^{2x} \sin x",
+]
+
+
+def pieces(latex_str):
+    """
+    送给 parse_cached 的子字符串：方程组拆成单个方程，方程再按 '=' 拆成左右两边
+    """
+    fixed = preprocess_latex(latex_str)
+    equations = split_system(fixed) or [fixed]
+    return [side.strip() for equation in equations for side in equation.split("=")]
+
+
+def inputs():
+    seen = []
+    for _, latex_str in all_problems():
+        seen.extend(piece for piece in pieces(latex_str) if piece not in seen)
+    return seen + EXTRA
+
+
+def same(fast, slow):
+    # latex2sympy 把 \ln 写成 log(x, E)，比较差值而不是结构
+    slow = slow.replace(lambda e: isinstance(e, log) and len(e.args) == 2, lambda e: log(e.args[0]) / log(e.args[1]))
+    return fast == slow or simplify(fast - slow) == 0
+
+
+@pytest.mark.parametrize("text", inputs())
+def test_fast_parser_agrees_with_latex2sympy(text):
+    try:
+        fast = fast_parse(text)
+    except FastParseError:
+        pytest.skip("not handled by the fast path")
+    assert same(fast, latex2sympy(text))
@@ -0,0 +1,41 @@
+import sqlite3
+import time
+
+from cache import ResultCache
+from store import ResultStore
+
+
+def test_writes_do_not_block_the_caller(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    store = ResultStore(path, version="test")
+    # 另一个连接持有写锁时，写入只是排队，调用方立即返回
+    other = sqlite3.connect(path)
+    other.execute("BEGIN IMMEDIATE")
+    start = time.perf_counter()
+    store.put("k", {"result": "1", "steps": []})
+    store.put_key("1 + 0", "k")
+    store.add_hits({"k": 3})
+    assert time.perf_counter() - start < 0.5
+    other.rollback()
+    other.close()
+    store.close()
+
+    store = ResultStore(path, version="test")
+    assert store.get("k") == {"result": "1", "steps": []}
+    assert store.get_key("1 + 0") == "k"
+    assert store.top(1)[0][0] == "k"
+    store.close()
+
+
+def test_cache_close_flushes_pending_writes(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    cache = ResultCache(1 << 20, ResultStore(path, version="test"))
+    cache.put("x^2", "k", {"result": "x^{2}", "steps": []})
+    assert cache.get_latex("x^2")["result"] == "x^{2}"
+    cache.close()
+
+    store = ResultStore(path, version="test")
+    assert store.get_key("x^2") == "k"
+    hits = store._db.execute("SELECT hits FROM results WHERE key = 'k'").fetchone()[0]
+    assert hits == 2
+    store.close()
@@ -0,0 +1,68 @@
+import random
+import time
+
+from sympy import Matrix, Rational, symbols
+
+from parsing import parse_input
+import solver
+from systems import linear_form, solve_system
+
+
+def subscripted_system(size, seed):
+    """
+    带下标未知数、含负系数的 size 元线性方程组，返回 (LaTeX, 系数矩阵, 常数列)
+    """
+    rng = random.Random(seed)
+    while True:
+        A = Matrix(size, size, lambda i, j: rng.choice([-9, -7, -5, -3, -2, -1, 1, 2, 3, 4, 6, 8]))
+        if A.det() != 0:
+            break
+    b = Matrix(size, 1, lambda i, j: rng.randint(-20, 20))
+    rows = []
+    for i in range(size):
+        terms = []
+        for j in range(size):
+            coefficient = A[i, j]
+            sign = "-" if coefficient < 0 else ("+" if terms else "")
+            terms.append(f"{sign} {abs(coefficient)}x_{{{j + 1}}}")
+        rows.append(" ".join(terms) + f" = {b[i]}")
+    return r"\begin{cases} " + r" \\ ".join(rows) + r" \end{cases}", A, b
+
+
+def check_system(latex_str, A, b):
+    system = parse_input(latex_str)
+    form = linear_form(system)
+    assert form is not None
+    assert form.is_rational()
+    assert form.A == A and form.b == b
+    [solution] = solve_system(system, form)
+    expected = A.LUsolve(b)
+    assert [solution[symbol] for symbol in form.symbols] == list(expected)
+
+
+def test_subscripted_negative_coefficients():
+    system = parse_input(r"\begin{cases} 2x_{1} - 3x_{2} = 1 \\ x_{1} + x_{2} = 2 \end{cases}")
+    x1, x2 = symbols("x_1 x_2")
+    assert solve_system(system) == [{x1: Rational(7, 5), x2: Rational(3, 5)}]
+
+
+def test_subscripted_2x2():
+    check_system(*subscripted_system(2, seed=1))
+
+
+def test_subscripted_10x10():
+    for seed in range(3):
+        check_system(*subscripted_system(10, seed=seed))
+
+
+def test_linear_form_counts_against_solve_budget(monkeypatch):
+    # 整理 A x = b 很慢时应当在 solve 阶段超时，而不是在任何预算之外执行
+    def slow_form(system):
+        time.sleep(3)
+
+    monkeypatch.setenv("FENG_MATH_BUDGET_SOLVE", "1")
+    monkeypatch.setattr(solver, "linear_form", slow_form)
+    start = time.perf_counter()
+    response = solver.solve_expr(parse_input(r"\begin{cases} x + y = 3 \\ x - y = 1 \end{cases}"))
+    assert time.perf_counter() - start < 2.5
+    assert response["partial"] and response["timeout_stage"] == "solve"
@@ -0,0 +1,97 @@
+import importlib
+import logging
+import os
+import threading
+import time
+
+# 启动预热。
+# 冷启动时最慢的是导入 sympy / latex2sympy2 (ANTLR) / manualintegrate，
+# 其次是第一个请求才触发的各种延迟初始化 (ANTLR 解析器、SymPy 内部缓存、simplify 等子模块的按需导入)。
+# 这里先计时导入这些模块，再用一小组内置题目把完整流程跑一遍，之后服务才报告就绪 (/ready)。
+# 工作进程由主进程 fork 出来，直接继承预热后的状态；非 fork 方式启动的工作进程会自己再预热一次。
+
+# 按依赖顺序导入，计时结果反映各自增加的耗时
+PRELOAD_MODULES = [
+    "sympy",
+    "sympy.integrals.manualintegrate",
+    "parsing",
+    "solver",
+]
+
+# 覆盖解析的两条路径 (快速路径和 latex2sympy)、方程求解、积分模板表和 integral_steps (\tan x 不在表中)、
+# 求导、极限和化简
+WARMUP_CORPUS = [
+    r"x^2 - 5x + 6 = 0",
+    r"\int x e^x dx",
+    r"\int \tan x dx",
+    r"\int_0^1 x^2 dx",
+    r"\frac{d}{dx} x^2 \sin x",
+    r"\lim_{x \to 0} \frac{\tan x - \sin x}{x^3}",
+    r"\sin^2 x + \cos^2 x",
+]
+
+logger = logging.getLogger(__name__)
+
+startup_stats = {"imports": {}, "warmup_seconds": None}
+_warm = False
+
+
+def warmup_enabled():
+    """
+    FENG_MATH_WARMUP=0 时跳过预热 (例如开发时频繁重启)
+    """
+    return os.environ.get("FENG_MATH_WARMUP", "1") not in ("0", "false", "no")
+
+
+def preload_imports():
+    """
+    依次导入重量级模块并记录每个模块的导入耗时 (秒)。已经导入的模块耗时接近 0
+    """
+    for name in PRELOAD_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        startup_stats["imports"][name] = time.perf_counter() - start
+    logger.info("Imports: %s", ", ".join(f"{name} {seconds:.2f}s" for name, seconds in startup_stats["imports"].items()))
+    return startup_stats["imports"]
+
+
+def warm_up():
+    """
+    在当前进程中把预热题目完整求解一遍。单个题目出错不影响其余题目
+    """
+    global _warm
+    # 在函数内导入，调用 preload_imports 之前导入本模块不会触发重量级导入
+    import metrics
+    from parsing import parse_input
+    from solver import preprocess_latex, solve_expr
+    from limits import preload_expansions
+
+    start = time.perf_counter()
+    for latex_str in WARMUP_CORPUS:
+        try:
+            solve_expr(parse_input(preprocess_latex(latex_str)))
+        except Exception as e:
+            logger.warning("Warm-up problem %r failed: %s", latex_str, e)
+    preload_expansions()
+    # 预热产生的阶段样本不计入指标
+    metrics.drain()
+    _warm = True
+    startup_stats["warmup_seconds"] = time.perf_counter() - start
+    logger.info("Warm-up finished in %.2fs", startup_stats["warmup_seconds"])
+    return startup_stats["warmup_seconds"]
+
+
+def warm_worker(barrier=None, wait=None):
+    """
+    工作进程任务：fork 出的进程已经继承了预热状态，直接返回；否则在本进程中预热。
+    barrier 为所有工作进程共用的屏障 (见 worker.warm_pool)：预热后在屏障处等待，
+    占住本进程，使其余预热任务只能交给其他工作进程。等待超过 wait 秒时不再等待
+    """
+    if not _warm:
+        warm_up()
+    if barrier is not None:
+        try:
+            barrier.wait(wait)
+        except threading.BrokenBarrierError:
+            logger.warning("Not all workers checked in within %ss", wait)
+    return os.getpid()
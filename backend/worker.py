@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+from logs import setup_logging
+from warmup import warm_worker
+
+# 工作进程池：SymPy 运算是纯 CPU 计算，放在事件循环里会阻塞所有其他请求。
+# 进程数默认等于 CPU 核心数，可通过环境变量 FENG_MATH_WORKERS 配置。
+DEFAULT_WORKERS = os.cpu_count() or 1
+# 估计代价高的题目 (见 complexity.py) 走重通道，最多同时占用这么大比例的工作进程，
+# 其余进程留给快速通道，少数"怪题"不会让普通题目排长队。可通过 FENG_MATH_HEAVY_WORKERS 配置进程数
+HEAVY_SHARE = 0.5
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+# 空闲工作进程的名额。任务拿到名额后才提交给进程池，
+# 这样看门狗计时从任务真正开始执行时算起，而不包括排队时间。
+_slots = None
+# 重通道的名额，拿到后再去拿 _slots
+_heavy_slots = None
+# 用于流式接口的跨进程事件队列由 Manager 进程提供
+_manager = None
+
+
+def pool_size():
+    """
+    读取配置的工作进程数
+    """
+    value = os.environ.get("FENG_MATH_WORKERS")
+    if not value:
+        return DEFAULT_WORKERS
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning("Invalid FENG_MATH_WORKERS=%r, using %d", value, DEFAULT_WORKERS)
+        return DEFAULT_WORKERS
+
+
+def heavy_lane_size():
+    """
+    重通道最多同时占用的工作进程数。只有一个工作进程时无法预留，重通道与快速通道共用
+    """
+    size = pool_size()
+    default = max(1, int(size * HEAVY_SHARE))
+    value = os.environ.get("FENG_MATH_HEAVY_WORKERS")
+    if not value:
+        return default
+    try:
+        return min(size, max(1, int(value)))
+    except ValueError:
+        logger.warning("Invalid FENG_MATH_HEAVY_WORKERS=%r, using %d", value, default)
+        return default
+
+
+def get_pool():
+    """
+    获取 (必要时创建) 全局进程池
+    """
+    global _pool
+    if _pool is None:
+        # 每个工作进程启动时配置自己的日志后台线程
+        _pool = ProcessPoolExecutor(max_workers=pool_size(), initializer=setup_logging)
+    return _pool
+
+
+def kill_pool():
+    """
+    强制终止所有工作进程并丢弃进程池 (看门狗的最后手段)，
+    下一次请求会重新创建进程池。正在该池中运行的其他任务会失败。
+    """
+    global _pool
+    if _pool is None:
+        return
+    for process in list((_pool._processes or {}).values()):
+        process.kill()
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    metrics.POOL_RESTARTS.inc()
+
+
+def _discard_broken(pool):
+    """
+    工作进程异常退出 (例如被 OOM killer 杀掉) 后进程池不再可用，丢弃它，下一次任务重新创建。
+    其他任务可能已经换上了新的进程池，此时不做任何事
+    """
+    global _pool
+    if _pool is not pool:
+        return
+    logger.error("Worker process died unexpectedly, restarting pool")
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    metrics.POOL_RESTARTS.inc()
+
+
+def shutdown_pool():
+    """
+    关闭进程池 (服务退出时调用)
+    """
+    global _pool, _manager
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+
+
+def _get_manager():
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.Manager()
+    return _manager
+
+
+def new_event_queue():
+    """
+    创建一个可以传给工作进程的事件队列
+    """
+    return _get_manager().Queue()
+
+
+def _run_instrumented(func, *args):
+    """
+    在工作进程中执行任务，返回 (返回值, 异常, 本次任务记录的阶段样本)。
+    异常作为返回值带回而不是直接抛出，这样出错和超时的阶段也能统计
+    (asyncio 会把 TimeoutError 重新构造一遍，附在异常上的数据会丢失)
+    """
+    metrics.drain()
+    try:
+        return func(*args), None, metrics.drain()
+    except Exception as e:
+        return None, e, metrics.drain()
+
+
+async def run_in_pool(func, *args, timeout=None, heavy=False):
+    """
+    在进程池中执行 func(*args)，异步等待结果，不阻塞事件循环。
+    heavy 为真时走重通道：先等重通道的名额，再等空闲的工作进程。
+    正常情况下各阶段的超时在工作进程内部处理 (见 budget.py)；
+    如果超过 timeout 仍未返回，说明工作进程无法被中断，直接杀掉进程池。
+    工作进程记录的阶段耗时在这里记入主进程的指标 (见 metrics.py)。
+    """
+    global _heavy_slots
+    if not heavy:
+        return await _run_in_slot(func, args, timeout)
+    if _heavy_slots is None:
+        _heavy_slots = asyncio.Semaphore(heavy_lane_size())
+    async with _heavy_slots:
+        return await _run_in_slot(func, args, timeout)
+
+
+async def _run_in_slot(func, args, timeout):
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(pool_size())
+    loop = asyncio.get_running_loop()
+    async with _slots:
+        pool = get_pool()
+        try:
+            future = loop.run_in_executor(pool, _run_instrumented, func, *args)
+        except BrokenProcessPool:
+            _discard_broken(pool)
+            raise
+        # 用 asyncio.wait 而不是 wait_for：任务自己抛出的 TimeoutError (例如解析超时)
+        # 与看门狗超时是同一个异常类型，不能据此杀掉进程池
+        try:
+            done, _ = await asyncio.wait({future}, timeout=timeout)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        if not done:
+            future.cancel()
+            logger.error("Worker did not respond within %ss, restarting pool", timeout)
+            kill_pool()
+            raise TimeoutError(f"Calculation exceeded {timeout}s")
+        try:
+            value, error, samples = future.result()
+        except BrokenProcessPool:
+            _discard_broken(pool)
+            raise
+    metrics.observe_samples(samples)
+    if error is not None:
+        raise error
+    return value
+
+
+async def warm_pool(timeout=None):
+    """
+    创建进程池，并让每个工作进程都启动并完成预热 (见 warmup.py)。
+    每个预热任务完成后在同一个屏障处等待，直到 pool_size() 个任务都到达，
+    因此这些任务分别落在不同的工作进程上，而不是被同一个空闲进程依次取走。
+    返回预热成功的工作进程数 (不同的进程号个数)
+    """
+    get_pool()
+    size = pool_size()
+    barrier = _get_manager().Barrier(size)
+    # 看门狗的时限包括预热本身和在屏障处的等待
+    watchdog = None if timeout is None else 2 * timeout
+    outcomes = await asyncio.gather(
+        *(run_in_pool(warm_worker, barrier, timeout, timeout=watchdog) for _ in range(size)),
+        return_exceptions=True,
+    )
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            logger.warning("Worker warm-up failed: %s", outcome)
+    return len({outcome for outcome in outcomes if not isinstance(outcome, BaseException)})
+
+
+async def stream_from_pool(func, *args, timeout=None, heavy=False):
+    """
+    在进程池中执行 func(*args, queue)，并在任务运行期间逐个产出它放入队列的事件。
+    任务结束后产出 ("result", 返回值)；事件以 ("event", 事件) 的形式产出。
+    """
+    loop = asyncio.get_running_loop()
+    events = new_event_queue()
+    task = asyncio.ensure_future(run_in_pool(func, *args, events, timeout=timeout, heavy=heavy))
+    try:
+        while True:
+            try:
+                event = await loop.run_in_executor(None, events.get, True, 0.05)
+            except queue.Empty:
+                if task.done():
+                    break
+                continue
+            yield "event", event
+        # 任务结束后把队列中剩余的事件取完
+        while True:
+            try:
+                yield "event", events.get_nowait()
+            except queue.Empty:
+                break
+        yield "result", task.result()
+    finally:
+        if not task.done():
+            task.cancel()
@@ -57,11 +57,12 @@ class _MathSolverPageState extends State<MathSolverPage> {
   bool _isLoading = false;
   String? _errorMessage;
 
+  // 使用流式接口：每个步骤产生后立即推送 (NDJSON，每行一个事件)
   String get _backendUrl {
     if (Platform.isAndroid) {
-      return 'http://10.0.2.2:8000/solve';
+      return 'http://10.0.2.2:8000/solve/stream';
     }
-    return 'http://127.0.0.1:8000/solve';
+    return 'http://127.0.0.1:8000/solve/stream';
   }
 
   Future<void> _solveMath() async {
@@ -82,30 +83,46 @@ class _MathSolverPageState extends State<MathSolverPage> {
       _steps = [];
     });
 
+    final client = http.Client();
     try {
       print('Sending LaTeX to $_backendUrl: $inputLatex');
       
-      final response = await http.post(
-        Uri.parse(_backendUrl),
-        headers: {'Content-Type': 'application/json'},
-        body: jsonEncode({'latex': inputLatex}),
-      );
+      final request = http.Request('POST', Uri.parse(_backendUrl))
+        ..headers['Content-Type'] = 'application/json'
+        ..body = jsonEncode({'latex': inputLatex});
+      final response = await client.send(request);
 
       print('Response status: ${response.statusCode}');
-      print('Response body: ${response.body}');
 
       if (response.statusCode == 200) {
-        final data = jsonDecode(response.body);
-        setState(() {
-          _resultLatex = data['result'];
-          if (data['steps'] != null) {
-            _steps = List<String>.from(data['steps']);
+        // 逐行读取事件：step 立即追加到步骤列表，result 为最终结果
+        final lines = response.stream
+            .transform(utf8.decoder)
+            .transform(const LineSplitter());
+        await for (final line in lines) {
+          if (line.trim().isEmpty) continue;
+          final event = jsonDecode(line);
+          switch (event['type']) {
+            case 'step':
+              setState(() {
+                _steps.add(event['step'] as String);
+              });
+            case 'result':
+              setState(() {
+                _resultLatex = event['result'];
+              });
+            case 'error':
+              setState(() {
+                _errorMessage = '计算错误: ${event['detail']}';
+              });
           }
-        });
+        }
       } else {
+        final body = await response.stream.bytesToString();
+        print('Response body: $body');
         setState(() {
           try {
-            final errorData = jsonDecode(response.body);
+            final errorData = jsonDecode(body);
             _errorMessage = '计算错误: ${errorData['detail']}';
           } catch (_) {
             _errorMessage = '服务器错误: ${response.statusCode}';
@@ -117,6 +134,7 @@ class _MathSolverPageState extends State<MathSolverPage> {
         _errorMessage = '连接失败: $e';
       });
     } finally {
+      client.close();
       setState(() {
         _isLoading = false;
       });
@@ -218,11 +236,11 @@ class _MathSolverPageState extends State<MathSolverPage> {
                       border: Border.all(color: Colors.grey.shade300),
                       borderRadius: BorderRadius.circular(8),
                     ),
-                    child: _isLoading
+                    child: _isLoading && _steps.isEmpty
                         ? const Center(
                             child: CircularProgressIndicator(),
                           )
-                        : _resultLatex.isEmpty
+                        : _resultLatex.isEmpty && _steps.isEmpty
                             ? const Center(
                                 child: Text(
                                   '等待输入...',
@@ -237,15 +255,19 @@ class _MathSolverPageState extends State<MathSolverPage> {
                                 style: TextStyle(fontSize: 16, fontWeight: FontWeight.bold, color: Colors.blue),
                               ),
                               const SizedBox(height: 10),
-                              Center(
-                                child: SingleChildScrollView(
-                                  scrollDirection: Axis.horizontal,
-                                  child: Math.tex(
-                                    _resultLatex,
-                                    textStyle: const TextStyle(fontSize: 24),
+                              // 结果到达前，先显示已经推送过来的步骤
+                              if (_resultLatex.isNotEmpty)
+                                Center(
+                                  child: SingleChildScrollView(
+                                    scrollDirection: Axis.horizontal,
+                                    child: Math.tex(
+                                      _resultLatex,
+                                      textStyle: const TextStyle(fontSize: 24),
+                                    ),
                                   ),
-                                ),
-                              ),
+                                )
+                              else if (_isLoading)
+                                const LinearProgressIndicator(),
                               if (_steps.isNotEmpty) ...[
                                 const SizedBox(height: 20),
                                 const Divider(),